@@ -2,17 +2,33 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 # SPDX-FileCopyrightText: 2020 grommunio GmbH
 
-from flask import Flask, jsonify, request, make_response
+from flask import Flask, g, jsonify, request, make_response
 from functools import wraps
 
+import random
+import re
+import threading
+import time
+
 from orm import DB
 from services import Service
 from tools.config import Config
+from tools.metrics import Metrics
 
-from . import apiSpec
+from . import apiSpec, BaseRoute
 
 
 class OpenApiCompat:
+    """Version independent wrapper around the openapi_core validators.
+
+    Instead of matching each request against the complete specification, a reduced specification containing only the
+    requested path, method and referenced components is compiled for each route on first use and cached.
+    """
+
+    _methods = {"get", "put", "post", "delete", "options", "head", "patch", "trace"}
+    _paramRe = re.compile(r"<[^>]*>|{[^}]*}")
+    _refRe = re.compile(r"^#/components/(\w+)/([^/]+)$")
+
     def __init__(self, apiSpec):
         import openapi_core
         self.version = [int(part) for part in openapi_core.__version__.split(".")]
@@ -24,18 +40,144 @@ class OpenApiCompat:
             from openapi_core import create_spec
         else:
             from openapi_core.spec.shortcuts import create_spec
-        self.spec = create_spec(apiSpec)
+        self.FlaskOpenAPIRequest, self.FlaskOpenAPIResponse = FlaskOpenAPIRequest, FlaskOpenAPIResponse
+        self.apiSpec = apiSpec
+        self.create_spec = create_spec
+        self.paths = {self._pathKey(path): path for path in apiSpec["paths"]}
+        self.routes = {}
+        self.lock = threading.Lock()
+        self.default = self._compile(apiSpec)
+
+    @classmethod
+    def _pathKey(cls, path):
+        """Normalize flask rule or OpenAPI path by stripping parameter names."""
+        return cls._paramRe.sub("{}", path)
+
+    @classmethod
+    def _collectRefs(cls, obj, refs):
+        """Collect all component references contained in obj."""
+        if isinstance(obj, dict):
+            for key, value in obj.items():
+                if key == "$ref" and isinstance(value, str):
+                    match = cls._refRe.match(value)
+                    if match is not None:
+                        refs.add(match.groups())
+                else:
+                    cls._collectRefs(value, refs)
+        elif isinstance(obj, list):
+            for value in obj:
+                cls._collectRefs(value, refs)
+
+    def _reduce(self, path, method):
+        """Create minimal specification for a single operation.
+
+        Parameters
+        ----------
+        path : str
+            OpenAPI path
+        method : str
+            HTTP method (lower case)
+
+        Returns
+        -------
+        dict
+            Specification containing only the operation and referenced components, or None if the operation is not defined
+        """
+        pathItem = self.apiSpec["paths"][path]
+        if method not in pathItem:
+            return None
+        reduced = {key: value for key, value in self.apiSpec.items() if key not in ("paths", "components")}
+        reduced["paths"] = {path: {key: value for key, value in pathItem.items()
+                                   if key == method or key not in self._methods}}
+        components = self.apiSpec.get("components", {})
+        needed, pending = set(), set()
+        self._collectRefs(reduced["paths"], pending)
+        while pending:
+            ref = pending.pop()
+            if ref in needed:
+                continue
+            needed.add(ref)
+            self._collectRefs(components.get(ref[0], {}).get(ref[1]), pending)
+        reduced["components"] = {}
+        for section, name in needed:
+            if name in components.get(section, {}):
+                reduced["components"].setdefault(section, {})[name] = components[section][name]
+        if "securitySchemes" in components:
+            reduced["components"]["securitySchemes"] = components["securitySchemes"]
+        return reduced
+
+    def _compile(self, specDict):
+        """Create validator functions for the given specification."""
+        spec = self.create_spec(specDict)
         if self.version < [0, 15, 0]:
             from openapi_core.shortcuts import RequestValidator, ResponseValidator
-            self.requestValidator = RequestValidator(self.spec)
-            self.responseValidator = ResponseValidator(self.spec)
-            self.validateRequest = lambda request: self.requestValidator.validate(FlaskOpenAPIRequest(request))
-            self.validateResponse = lambda request, response: \
-                self.responseValidator.validate(FlaskOpenAPIRequest(request), FlaskOpenAPIResponse(response)).errors
-        else:
-            self.FlaskOpenAPIRequest, self.FlaskOpenAPIResponse = FlaskOpenAPIRequest, FlaskOpenAPIResponse
-            self.validateRequest = self._validateRequest_15_0
-            self.validateResponse = self._validateResponse_15_0
+            reqval, resval = RequestValidator(spec), ResponseValidator(spec)
+            return (lambda request: reqval.validate(self.FlaskOpenAPIRequest(request)),
+                    lambda request, response: resval.validate(self.FlaskOpenAPIRequest(request),
+                                                               self.FlaskOpenAPIResponse(response)).errors)
+        from openapi_core.validation.request import openapi_request_validator as reqval
+        from openapi_core.validation.response import openapi_response_validator as resval
+        return (lambda request: reqval.validate(spec, self.FlaskOpenAPIRequest(request)),
+                lambda request, response: [error for error in resval.validate(spec, self.FlaskOpenAPIRequest(request),
+                                                                              self.FlaskOpenAPIResponse(response)).errors
+                                           if not self._suppressError(error)])
+
+    def route(self, rule, method):
+        """Get validators for a route.
+
+        Validators are compiled on first access and cached afterwards.
+        Falls back to the complete specification if the route cannot be mapped to a single operation.
+
+        Parameters
+        ----------
+        rule : str
+            Flask URL rule
+        method : str
+            HTTP method
+
+        Returns
+        -------
+        tuple
+            Request and response validation functions
+        """
+        key = (rule, method)
+        validators = self.routes.get(key)
+        if validators is not None:
+            return validators
+        with self.lock:
+            if key in self.routes:
+                return self.routes[key]
+            path = self.paths.get(self._pathKey(rule[len(BaseRoute):] if rule.startswith(BaseRoute) else rule))
+            reduced = self._reduce(path, method.lower()) if path is not None else None
+            try:
+                validators = self._compile(reduced) if reduced is not None else self.default
+            except Exception as err:
+                API.logger.warning("Failed to compile validator for {} {}: {}".format(method, rule, err))
+                validators = self.default
+            self.routes[key] = validators
+        return validators
+
+    def precompile(self, app):
+        """Compile validators for all routes registered at the app.
+
+        Parameters
+        ----------
+        app : flask.Flask
+            Flask application to load the routes from
+        """
+        for rule in app.url_map.iter_rules():
+            for method in rule.methods - {"HEAD", "OPTIONS"}:
+                self.route(rule.rule, method)
+
+    def _validators(self, request):
+        rule = getattr(request, "url_rule", None)
+        return self.default if rule is None else self.route(rule.rule, request.method)
+
+    def validateRequest(self, request):
+        return self._validators(request)[0](request)
+
+    def validateResponse(self, request, response):
+        return self._validators(request)[1](request, response)
 
     @staticmethod
     def _suppressError(exc):
@@ -47,16 +189,6 @@ class OpenApiCompat:
             return False
         return all(matchBuggedError(err) for err in exc.schema_errors)
 
-    def _validateRequest_15_0(self, request):
-        from openapi_core.validation.request import openapi_request_validator as reqval
-        result = reqval.validate(self.spec, self.FlaskOpenAPIRequest(request))
-        return result
-
-    def _validateResponse_15_0(self, request, response):
-        from openapi_core.validation.response import openapi_response_validator as resval
-        result = resval.validate(self.spec, self.FlaskOpenAPIRequest(request), self.FlaskOpenAPIResponse(response))
-        return [error for error in result.errors if not self._suppressError(error)]
-
 
 if "servers" in Config["openapi"]:
     apiSpec["servers"] += Config["openapi"]["servers"]
@@ -67,11 +199,16 @@ API = Flask("grommunio Admin API")  # Core API object
 API.config["JSON_SORT_KEYS"] = False  # Do not sort response fields. Crashes when returning lists...
 if DB is not None:
     DB.enableFlask(API)
+    if Metrics is not None:
+        DB.enableQueryStats()
 
 if not Config["openapi"]["validateRequest"]:
     API.logger.warning("Request validation is disabled!")
 if not Config["openapi"]["validateResponse"]:
     API.logger.warning("Response validation is disabled!")
+_responseSampleRate = Config["openapi"].get("responseSampleRate", 1)
+if _responseSampleRate < 1:
+    API.logger.info("Validating {:.1f}% of responses".format(100*_responseSampleRate))
 
 
 def validateRequest(flask_request):
@@ -126,10 +263,14 @@ def secure(requireDB=False, requireAuth=True, authLevel="basic", service=None, v
 
        Automatically validates the request using the OpenAPI specification and returns a HTTP 400 to the client if validation
        fails. Also validates the response generated by the endpoint and returns a HTTP 500 on error. This behavior can be
-       deactivated in the configuration.
+       deactivated in the configuration. Response validation can be restricted to a random sample of responses by setting
+       openapi.responseSampleRate.
 
        If an exception is raised during execution, a HTTP 500 message is returned to the client and a short description of the
        error is sent in the 'error' field of the response.
+
+       Request count, duration and database usage are recorded in the process metrics, unless disabled in the configuration.
+       With database instrumentation enabled, slow requests and repeated queries are logged.
        """
     from .security import getSecurityContext
 
@@ -142,7 +283,11 @@ def secure(requireDB=False, requireAuth=True, authLevel="basic", service=None, v
                         ret = func(*args, srv, **kwargs)
                 else:
                     ret = func(*args, **kwargs)
+                if _responseSampleRate < 1 and random.random() >= _responseSampleRate:
+                    return ret
                 response = make_response(ret)
+                if response.is_streamed:  # Validation would consume the stream
+                    return response
                 try:
                     result = validator.validateResponse(request, response)
                 except AttributeError:
@@ -155,6 +300,9 @@ def secure(requireDB=False, requireAuth=True, authLevel="basic", service=None, v
                         API.logger.warn("Response validation failed: "+str(result))
                 return ret
 
+            g.requestStart = time.perf_counter()
+            if DB is not None:
+                DB.resetQueryStats()
             if requireAuth:
                 checkCSRF = False if Config["security"].get("disableCSRF") else validateCSRF
                 error = getSecurityContext(authLevel, checkCSRF)
@@ -190,4 +338,19 @@ def noCache(response):
     return response
 
 
+@API.after_request
+def recordMetrics(response):
+    """Record metrics and check database usage of requests handled by secured endpoints"""
+    start = g.pop("requestStart", None)
+    if start is None or request.url_rule is None:
+        return response
+    duration = time.perf_counter()-start
+    if Metrics is not None:
+        Metrics.observeRequest(request.method, request.url_rule.rule, response.status_code, duration,
+                               DB.queryStats() if DB is not None else None)
+    if DB is not None:
+        DB.checkQueries("{} {}".format(request.method, request.url_rule.rule), duration)
+    return response
+
+
 from . import errors as _
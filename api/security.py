@@ -11,6 +11,7 @@ import jwt
 from base64 import b64encode
 from services import Service
 from tools.config import Config
+from tools.misc import TTLCache
 
 
 logger = logging.getLogger("security")
@@ -38,6 +39,45 @@ except Exception:
         logger.error("Failed to save JWT RSA keys, logins will not persist across API restarts")
 
 
+authCache = TTLCache(Config["security"].get("authCacheSize", 1024), Config["security"].get("authCacheTTL", 60))
+
+
+def _tokenKey(token):
+    """Generate cache key from JWT."""
+    return hashlib.sha256(token.encode("ascii")).digest()
+
+
+def invalidateAuth(username=None):
+    """Remove cached authentication data.
+
+    Parameters
+    ----------
+    username : str, optional
+        Only remove entries belonging to this user. If None, the whole cache is cleared. The default is None.
+    """
+    if username is None:
+        authCache.clear()
+    else:
+        authCache.discard(lambda key, entry: entry["claims"].get("usr") == username)
+
+
+class AuthContext(dict):
+    """Authentication data of the current request.
+
+    The `user` entry is loaded from the database on first access, so that endpoints can rely on it even if the
+    permission check was answered from the authentication cache.
+    """
+
+    def __missing__(self, key):
+        if key != "user":
+            raise KeyError(key)
+        error = getUser()
+        if error is not None:
+            from .errors import InsufficientPermissions
+            raise InsufficientPermissions(error)
+        return self["user"]
+
+
 def getUser():
     """Load currently logged in user from database.
 
@@ -58,6 +98,9 @@ def getUser():
         return "Failed to get user information from database"
     if user is None:
         return "Invalid user"
+    entry = request.auth.get("cache")
+    if entry is not None and entry.get("permissions") is not None:
+        user._permissions = entry["permissions"]
     request.auth["user"] = user
 
 
@@ -75,7 +118,7 @@ def getSecurityContext(authLevel, validateCSRF=None):
         Error message or None if successful
 
     """
-    request.auth = {}
+    request.auth = AuthContext()
     cookie = request.cookies.get("grommunioAuthJwt")
     if cookie is None:
         return "No token provided"
@@ -86,6 +129,7 @@ def getSecurityContext(authLevel, validateCSRF=None):
     if validateCSRF and not checkCSRF(cookie):
         return "Invalid or missing CSRF token"
     request.auth["claims"] = val
+    request.auth["cache"] = authCache.get(_tokenKey(cookie))
     if authLevel == "user":
         return getUser()
 
@@ -138,6 +182,9 @@ def checkCSRF(token):
 def checkToken(token):
     """Check jwt validity.
 
+    Successfully decoded tokens are cached (see security.authCacheTTL), skipping signature verification on subsequent
+    checks.
+
     Parameters
     ----------
     token : str
@@ -150,6 +197,13 @@ def checkToken(token):
     dict / str
         Dict containing the JWT claims if successful, error message otherwise
     """
+    key = _tokenKey(token)
+    entry = authCache.get(key)
+    if entry is not None:
+        if entry["claims"].get("exp", float("inf")) > time.time():
+            return True, entry["claims"]
+        authCache.pop(key)
+        return False, "Token has expired"
     try:
         claims = jwt.decode(token, jwtPubkey, algorithms=["RS256"])
     except jwt.ExpiredSignatureError:
@@ -158,6 +212,7 @@ def checkToken(token):
         return False, "Invalid token signature"
     except Exception:
         return False, "invalid token"
+    authCache.put(key, {"claims": claims, "permissions": None, "active": None})
     return True, claims
 
 
@@ -241,12 +296,19 @@ def checkPermissions(*requested):
     None.
     """
     from .errors import InsufficientPermissions
-    error = getUser()
-    if error is not None:
-        raise InsufficientPermissions(error)
-    user = request.auth["user"]
-    if user.ID != 0 and user.addressStatus != 0:
+    entry = request.auth.get("cache") if hasattr(request, "auth") else None
+    if entry is not None and entry["permissions"] is not None and "user" not in request.auth:
+        active, permissions = entry["active"], entry["permissions"]
+    else:
+        error = getUser()
+        if error is not None:
+            raise InsufficientPermissions(error)
+        user = request.auth["user"]
+        active = user.ID == 0 or user.addressStatus == 0
+        permissions = user.permissions()
+        if entry is not None:
+            entry["active"], entry["permissions"] = active, permissions
+    if not active:
         raise InsufficientPermissions("Account deactivated")
-    permissions = user.permissions()
     if not all(permission in permissions for permission in requested):
         raise InsufficientPermissions()
@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: 2026 grommunio GmbH
+
+"""Benchmark core API endpoints.
+
+Runs the API in-process using the Flask test client against a seeded SQLite database and measures throughput and
+latency of the most frequently used endpoints. Results are written as JSON and can be compared against a previous run.
+Optionally, all cases are repeated with configuration variants (e.g. without request validation or authentication
+cache) to show the overhead of the respective component.
+
+Usage: python3 -m bench.api [-o results.json] [-c baseline.json] [-V VARIANT ...]
+"""
+
+import json
+import platform
+import sys
+import tempfile
+import time
+
+from argparse import ArgumentParser
+from contextlib import contextmanager
+from datetime import datetime
+
+from . import common
+
+
+def _cases(seeded):
+    """Create benchmark cases.
+
+    Parameters
+    ----------
+    seeded : dict
+        Result of `common.seed`
+
+    Returns
+    -------
+    list of tuple
+        Name, method, path(s) and form data of each case
+    """
+    from api import BaseRoute
+    domainID = seeded["domains"][0][0]
+    users = [user for user in seeded["users"] if user[1] == domainID]
+    return [("login", "POST", BaseRoute+"/login", {"user": "admin", "pass": common.adminPass}),
+            ("user list", "GET", BaseRoute+"/domains/{}/users?limit=50".format(domainID), None),
+            ("user list (properties)", "GET",
+             BaseRoute+"/domains/{}/users?limit=50&properties=displayname,storagequotalimit".format(domainID), None),
+            ("user detail", "GET", [BaseRoute+"/domains/{}/users/{}".format(domainID, user[0]) for user in users], None),
+            ("sync policy", "GET", [BaseRoute+"/service/syncPolicy/"+user[2] for user in users], None),
+            ("dashboard", "GET", BaseRoute+"/system/dashboard", None)]
+
+
+def _authCases(app, client, headers, seeded):
+    """Create benchmark cases for the authentication and permission checks alone.
+
+    Runs the checks performed before a domain endpoint is executed, once for the system administrator and once for a
+    domain administrator, whose permissions are loaded from the role tables.
+    Additionally creates domains, as an endpoint that accesses the current user after a permission check answered by
+    the authentication cache.
+
+    Parameters
+    ----------
+    app : flask.Flask
+        API application
+    client : flask.testing.FlaskClient
+        Test client
+    headers : dict
+        Authentication headers of the system administrator
+    seeded : dict
+        Result of `common.seed`
+
+    Returns
+    -------
+    list of tuple
+        Cases in the format of `_cases`
+    """
+    import itertools
+    from api import BaseRoute
+    from api.errors import InsufficientPermissions
+    from api.security import checkPermissions, getSecurityContext
+    from orm import DB
+    from orm.roles import AdminRoles, AdminRolePermissionRelation, AdminUserRoleRelation
+    from tools.permissions import DomainAdminROPermission
+    domainID = seeded["domains"][0][0]
+    userID, _, username = next(user for user in seeded["users"] if user[1] == domainID)
+    role = AdminRoles({"name": "Benchmark domain admin"})
+    AdminRolePermissionRelation({"permission": "DomainAdmin", "params": domainID}, role)
+    DB.session.add(role)
+    DB.session.add(AdminUserRoleRelation(userID, role))
+    DB.session.commit()
+
+    def check(username, password):
+        response = client.post(BaseRoute+"/login", data={"user": username, "pass": password})
+        if response.status_code != 200:
+            raise RuntimeError("Login failed: {}".format(response.get_json()))
+        cookie = "grommunioAuthJwt="+response.get_json()["grommunioAuthJwt"]
+        path = BaseRoute+"/domains/{}/users".format(domainID)
+
+        def inner(_):
+            with app.test_request_context(path, headers={"Cookie": cookie}):
+                if getSecurityContext("basic") is not None:
+                    return 401
+                try:
+                    checkPermissions(DomainAdminROPermission(domainID))
+                except InsufficientPermissions:
+                    return 403
+                return 200
+        return inner
+
+    counter = itertools.count()
+
+    def createDomain(_):
+        data = {"domainname": "bench{}.test".format(next(counter)), "maxUser": 10, "endDay": "3333-03-03"}
+        return client.post(BaseRoute+"/system/domains", json=data, headers=headers).status_code
+    return [("auth check", None, check("admin", common.adminPass), None),
+            ("auth check (domain admin)", None, check(username, common.userPass), None),
+            ("domain create", None, createDomain, None)]
+
+
+@contextmanager
+def _patched(*patches):
+    """Temporarily replace attributes.
+
+    Parameters
+    ----------
+    patches : tuple
+        Tuples of (object, attribute name, value)
+    """
+    missing = object()
+    saved = [(obj, attr, vars(obj).get(attr, missing)) for obj, attr, _ in patches]
+    try:
+        for obj, attr, value in patches:
+            setattr(obj, attr, value)
+        yield
+    finally:
+        for obj, attr, value in reversed(saved):
+            if value is missing:
+                delattr(obj, attr)
+            else:
+                setattr(obj, attr, value)
+
+
+def _variants():
+    """Create configuration variants.
+
+    Each variant is a function returning a context manager that applies the configuration change to the running API.
+
+    Returns
+    -------
+    dict
+        Mapping of variant names to context manager factories
+    """
+    from collections import OrderedDict
+    from types import SimpleNamespace
+    from api import core, security
+    validator = core.validator
+    valid = SimpleNamespace(errors=[])
+    return {"no validation": lambda: _patched((validator, "validateRequest", lambda request: valid),
+                                              (validator, "validateResponse", lambda request, response: None)),
+            "full spec validation": lambda: _patched((validator, "route", lambda rule, method: validator.default)),
+            "sampled responses": lambda: _patched((core, "_responseSampleRate", 0.1)),
+            "no auth cache": lambda: _patched((security.authCache, "ttl", 0),
+                                              (security.authCache, "_data", OrderedDict()))}
+
+
+def run(client, headers, method, path, data, iterations, warmup):
+    """Benchmark a single endpoint.
+
+    Parameters
+    ----------
+    client : flask.testing.FlaskClient
+        Test client
+    headers : dict
+        Authentication headers
+    method : str
+        HTTP method
+    path : str, list of str or callable
+        Request path. If a list is given, paths are used round-robin. A callable is invoked with the iteration number
+        instead of sending a request and must return a status code.
+    data : dict
+        Form data to send
+    iterations : int
+        Number of measured requests
+    warmup : int
+        Number of unmeasured requests sent before the measurement
+
+    Returns
+    -------
+    dict
+        Latency summary (see `common.summarize`) with additional `status` code counts
+    """
+    if callable(path):
+        send = path
+    else:
+        paths = path if isinstance(path, list) else [path]
+        send = (lambda i: client.open(paths[i % len(paths)], method=method, headers=headers, data=data).status_code)
+    latencies, errors, status = [], 0, {}
+    for i in range(warmup):
+        send(i)
+    start = time.perf_counter()
+    for i in range(iterations):
+        reqStart = time.perf_counter()
+        code = send(i)
+        latencies.append(time.perf_counter()-reqStart)
+        status[code] = status.get(code, 0)+1
+        errors += code >= 400
+    result = common.summarize(latencies, errors, time.perf_counter()-start)
+    result["status"] = {str(code): count for code, count in sorted(status.items())}
+    return result
+
+
+def compare(results, baseline):
+    """Print comparison of two benchmark runs.
+
+    Parameters
+    ----------
+    results : dict
+        Current results
+    baseline : dict
+        Previous results
+    """
+    width = max([len(name) for name in results["endpoints"]]+[8])
+    line = "{:<"+str(width)+"} {:>12} {:>12} {:>8}   {:>12} {:>12} {:>8}"
+    print(line.format("endpoint", "p50 base", "p50 now", "change", "p95 base", "p95 now", "change"))
+    change = (lambda old, new: "{:+.1f}%".format((new-old)/old*100) if old and new is not None else "-")
+    for name, current in results["endpoints"].items():
+        old = baseline.get("endpoints", {}).get(name)
+        if old is None:
+            continue
+        print(line.format(name, old["p50"], current["p50"], change(old["p50"], current["p50"]),
+                      old["p95"], current["p95"], change(old["p95"], current["p95"])))
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Benchmark core API endpoints")
+    parser.add_argument("-d", "--domains", type=int, default=10, help="Number of domains to create")
+    parser.add_argument("-u", "--users", type=int, default=100, help="Number of users per domain")
+    parser.add_argument("-p", "--properties", type=int, default=10, help="Number of properties per user")
+    parser.add_argument("-n", "--iterations", type=int, default=200, help="Number of requests per endpoint")
+    parser.add_argument("-w", "--warmup", type=int, default=10, help="Number of unmeasured requests per endpoint")
+    parser.add_argument("-e", "--endpoint", action="append", help="Only run selected endpoints")
+    parser.add_argument("-V", "--variant", action="append", default=[],
+                        choices=("no validation", "full spec validation", "sampled responses", "no auth cache"),
+                        help="Repeat all cases with a configuration variant")
+    parser.add_argument("-o", "--output", help="Write results to file")
+    parser.add_argument("-c", "--compare", help="Compare results with previous run")
+    parser.add_argument("--workdir", help="Directory for runtime files. Defaults to a temporary directory.")
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir
+    if workdir is None:
+        import atexit
+        import shutil
+        workdir = tempfile.mkdtemp(prefix="grommunio-bench-")
+        atexit.register(shutil.rmtree, workdir, True)  # Registered first to run after the final metrics flush
+    common.setup(workdir)
+    seeded = common.seed(args.domains, args.users, args.properties)
+    API = common.loadApp()
+    API.logger.setLevel("ERROR")
+    client = API.test_client()
+    headers = common.login(client)
+
+    results = {"meta": {"date": datetime.now().isoformat(timespec="seconds"),
+                        "python": platform.python_version(),
+                        "platform": platform.platform(),
+                        "domains": args.domains,
+                        "users": args.users,
+                        "properties": args.properties,
+                        "iterations": args.iterations,
+                        "variants": args.variant,
+                        "seedTime": seeded["seedTime"]},
+               "endpoints": {}}
+    cases = _cases(seeded)+_authCases(API, client, headers, seeded)
+    variants = _variants()
+    for variant in [None]+args.variant:
+        with variants[variant]() if variant else _patched():
+            for name, method, path, data in cases:
+                if args.endpoint and name not in args.endpoint:
+                    continue
+                name = name if variant is None else "{} [{}]".format(name, variant)
+                result = run(client, headers, method, path, data, args.iterations, args.warmup)
+                results["endpoints"][name] = result
+                print("{:<46} {:>8.2f} req/s  p50 {:>8.3f} ms  p95 {:>8.3f} ms  p99 {:>8.3f} ms  errors {}"
+                      .format(name, result["throughput"], result["p50"], result["p95"], result["p99"],
+                              result["errors"]), file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    if args.compare:
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
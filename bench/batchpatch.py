@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: 2026 grommunio GmbH
+
+"""Compare batch PATCH with per-object PATCH requests.
+
+Changes the storage quota of all users of a domain, once with one PATCH request per user and once with batch PATCH
+requests using different chunk sizes. External services are replaced by in-process fakes (see `bench.fakes`).
+
+Usage: python3 -m bench.batchpatch [-u USERS] [-o results.json]
+"""
+
+import json
+import platform
+import sys
+import tempfile
+import time
+
+from argparse import ArgumentParser
+from datetime import datetime
+
+from . import common
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Compare batch PATCH with per-object PATCH requests")
+    parser.add_argument("-u", "--users", type=int, default=3000, help="Number of users to update")
+    parser.add_argument("-s", "--chunk-sizes", default="0,100,1000", help="Comma separated list of chunk sizes to test "
+                        "(0 for a single transaction)")
+    parser.add_argument("-n", "--iterations", type=int, default=3, help="Number of measured runs per mode")
+    parser.add_argument("-o", "--output", help="Write results to file")
+    parser.add_argument("-c", "--compare", help="Compare results with previous run")
+    parser.add_argument("--workdir", help="Directory for runtime files. Defaults to a temporary directory.")
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir
+    if workdir is None:
+        import atexit
+        import shutil
+        workdir = tempfile.mkdtemp(prefix="grommunio-bench-")
+        atexit.register(shutil.rmtree, workdir, True)  # Registered first to run after the final metrics flush
+    common.setup(workdir)
+    from . import fakes
+    fakes.install()
+    seeded = common.seed(1, args.users, 3)
+    API = common.loadApp()
+    API.logger.setLevel("ERROR")
+    client = API.test_client()
+    headers = common.login(client)
+
+    from api import BaseRoute
+    from orm.users import UserProperties
+    from tools.constants import PropTags
+    userIDs = [user[0] for user in seeded["users"]]
+    modes = [("single", None)]+[("batch, chunk size {}".format(size), int(size)) for size in args.chunk_sizes.split(",")]
+    results = {"meta": {"date": datetime.now().isoformat(timespec="seconds"),
+                        "python": platform.python_version(),
+                        "platform": platform.platform(),
+                        "users": args.users,
+                        "iterations": args.iterations,
+                        "seedTime": seeded["seedTime"]},
+               "endpoints": {}}
+    quota = 1048576
+    for name, chunkSize in modes:
+        durations, errors = [], 0
+        for _ in range(args.iterations):
+            quota += 1
+            patch = {"properties": {"storagequotalimit": quota}}
+            start = time.perf_counter()
+            if chunkSize is None:
+                for ID in userIDs:
+                    response = client.patch(BaseRoute+"/domains/1/users/{}".format(ID), json=patch, headers=headers)
+                    errors += response.status_code != 200
+            else:
+                response = client.patch(BaseRoute+"/domains/1/users?chunkSize={}".format(chunkSize),
+                                        json=[{"ID": ID, "patch": patch} for ID in userIDs], headers=headers)
+                errors += response.get_json().get("failed", len(userIDs)) if response.status_code == 200 else len(userIDs)
+            durations.append(time.perf_counter()-start)
+            loaded = UserProperties.load(userIDs, (PropTags.STORAGEQUOTALIMIT,))
+            errors += sum(props.get("storagequotalimit") != quota for props in loaded.values())
+        result = common.summarize(durations, errors)
+        result["objects"] = len(userIDs)
+        results["endpoints"][name] = result
+        print("{:<28} {:>6} users  p50 {:>10.3f} ms  {:>9.1f} users/s  errors {}"
+              .format(name, len(userIDs), result["p50"], len(userIDs)/(result["p50"]/1000), errors), file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    if args.compare:
+        from .api import compare
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
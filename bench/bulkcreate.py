@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: 2026 grommunio GmbH
+
+"""Compare sequential and bulk user creation.
+
+Creates the same number of users once by calling `Users.create` for each user and once with `Users.createBulk`, for
+both ways of creating private stores: from the bundled schema or template (no `gromox-mkprivate` available) and by
+running `gromox-mkprivate` and `gromox-mkmidb`, which are replaced by stub scripts simulating the process runtime.
+Each combination creates its users in a separate domain.
+
+Usage: python3 -m bench.bulkcreate [-u USERS] [-o results.json]
+"""
+
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from argparse import ArgumentParser
+from datetime import datetime
+
+from . import common, fakes
+
+stub = """import sys
+import time
+
+time.sleep({latency})
+"""
+
+
+def install(workdir, latency):
+    """Create stub `gromox-mkprivate` and `gromox-mkmidb` commands.
+
+    Parameters
+    ----------
+    workdir : str
+        Directory for the stubs
+    latency : float
+        Additional runtime (in seconds) of each call
+
+    Returns
+    -------
+    str
+        Directory containing the stubs
+    """
+    bindir = os.path.join(workdir, "bin")
+    os.makedirs(bindir, exist_ok=True)
+    for command in ("gromox-mkprivate", "gromox-mkmidb"):
+        path = os.path.join(bindir, command)
+        with open(path, "w") as file:
+            file.write("#!{}\n{}".format(sys.executable, stub.format(latency=latency)))
+        os.chmod(path, 0o755)
+    return bindir
+
+
+def records(domainID, domainname, count):
+    """Generate user records.
+
+    Parameters
+    ----------
+    domainID : int
+        ID of the domain
+    domainname : str
+        Name of the domain
+    count : int
+        Number of records
+
+    Returns
+    -------
+    list of dict
+        User data as accepted by `Users.create`
+    """
+    return [{"username": "bulk{}@{}".format(index, domainname), "domainID": domainID, "password": common.userPass,
+             "properties": {"displayname": "Bulk user {}".format(index), "storagequotalimit": 1048576}}
+            for index in range(count)]
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Compare sequential and bulk user creation")
+    parser.add_argument("-u", "--users", type=int, default=1000, help="Number of users to create per mode")
+    parser.add_argument("-j", "--workers", type=int, default=4, help="Number of parallel store setups in bulk mode")
+    parser.add_argument("-b", "--batch-size", type=int, default=100, help="Number of users per commit in bulk mode")
+    parser.add_argument("-l", "--latency", type=float, default=20,
+                        help="Additional runtime of each gromox-mkprivate/gromox-mkmidb call (ms)")
+    parser.add_argument("--no-sync", action="store_true", help="Do not write user properties to the stores")
+    parser.add_argument("-o", "--output", help="Write results to file")
+    parser.add_argument("--workdir", help="Directory for runtime files. Defaults to a temporary directory.")
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir
+    if workdir is None:
+        import atexit
+        import shutil
+        workdir = tempfile.mkdtemp(prefix="grommunio-bench-")
+        atexit.register(shutil.rmtree, workdir, True)
+    common.setup(workdir)
+    seeded = common.seed(4, 0, 3)
+    fakes.install()
+    common.loadApp()
+    from orm import DB
+    from orm.users import Users
+    from tools.license import getLicense
+    DB.session.execute("UPDATE domains SET max_user=:count", {"count": args.users})
+    DB.session.commit()
+    getLicense().users = 4*args.users+1
+    bindir = install(workdir, args.latency/1000)
+    path = os.environ.get("PATH", "")
+
+    def sequential(data):
+        status = []
+        for props in data:
+            result, code = Users.create(props, sync=not args.no_sync)
+            status.append(code)
+            DB.session.remove()
+        return status
+
+    def bulk(data):
+        return [entry["code"] for entry in Users.createBulk(data, not args.no_sync, args.batch_size, args.workers)]
+
+    results = {"meta": {"date": datetime.now().isoformat(timespec="seconds"),
+                        "python": platform.python_version(),
+                        "platform": platform.platform(),
+                        "cpus": os.cpu_count(),
+                        "users": args.users,
+                        "workers": args.workers,
+                        "batchSize": args.batch_size,
+                        "latency": args.latency,
+                        "sync": not args.no_sync},
+               "endpoints": {}}
+    domains = iter(seeded["domains"])
+    for store, env in (("template", path), ("gromox-mkprivate", bindir+os.pathsep+path)):
+        os.environ["PATH"] = env
+        for mode, create in (("sequential", sequential), ("bulk", bulk)):
+            domainID, domainname = next(domains)
+            data = records(domainID, domainname, args.users)
+            start = time.perf_counter()
+            status = create(data)
+            duration = time.perf_counter()-start
+            errors = sum(1 for code in status if code != 201)
+            name = "{} ({})".format(mode, store)
+            results["endpoints"][name] = result = {"users": len(status), "errors": errors,
+                                                   "duration": round(duration, 3),
+                                                   "perUser": round(duration/len(status)*1000, 3),
+                                                   "throughput": round(len(status)/duration, 2)}
+            print("{:<30} {:>6} users in {:>8.2f}s  {:>8.3f} ms/user  errors {}"
+                  .format(name, len(status), duration, result["perUser"], errors), file=sys.stderr)
+    os.environ["PATH"] = path
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    return 1 if any(result["errors"] for result in results["endpoints"].values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
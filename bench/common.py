@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: 2026 grommunio GmbH
+
+"""Shared setup for benchmarks and load tests.
+
+Creates a self-contained API instance backed by a temporary SQLite database
+seeded with synthetic domains, users and user properties.
+
+`setup` must be called before any other module of the API is imported, as the configuration is patched in place.
+"""
+
+import os
+import sys
+import time
+
+rootDir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+adminPass = "benchmark"
+userPass = "benchmark"
+
+
+def percentile(values, q):
+    """Calculate percentile of a sorted list using linear interpolation.
+
+    Parameters
+    ----------
+    values : list of float
+        Sorted values
+    q : float
+        Percentile (0-100)
+
+    Returns
+    -------
+    float
+        The percentile or None if `values` is empty
+    """
+    if not values:
+        return None
+    pos = (len(values)-1)*q/100
+    lower = int(pos)
+    upper = min(lower+1, len(values)-1)
+    return values[lower]+(values[upper]-values[lower])*(pos-lower)
+
+
+def summarize(latencies, errors=0, duration=None):
+    """Create latency summary.
+
+    Parameters
+    ----------
+    latencies : list of float
+        Request latencies in seconds
+    errors : int, optional
+        Number of failed requests. The default is 0.
+    duration : float, optional
+        Wall clock time of the run, used to calculate the throughput. Defaults to the sum of latencies.
+
+    Returns
+    -------
+    dict
+        Number of requests and errors, throughput (requests per second) and latency statistics in milliseconds
+    """
+    values = sorted(latencies)
+    duration = sum(values) if duration is None else duration
+    ms = (lambda value: None if value is None else round(value*1000, 3))
+    return {"requests": len(values),
+            "errors": errors,
+            "errorRate": round(errors/len(values), 4) if values else None,
+            "throughput": round(len(values)/duration, 2) if duration else None,
+            "mean": ms(sum(values)/len(values)) if values else None,
+            "min": ms(values[0]) if values else None,
+            "p50": ms(percentile(values, 50)),
+            "p95": ms(percentile(values, 95)),
+            "p99": ms(percentile(values, 99)),
+            "max": ms(values[-1]) if values else None}
+
+
+def _sqliteCompat():
+    """Register SQLite type mappings for MySQL specific column types."""
+    from sqlalchemy.ext.compiler import compiles
+    from sqlalchemy.dialects.mysql import ENUM, TINYINT
+
+    @compiles(TINYINT, "sqlite")
+    def compileTinyint(type_, compiler, **kwargs):
+        return "INTEGER"
+
+    @compiles(ENUM, "sqlite")
+    def compileEnum(type_, compiler, **kwargs):
+        return "VARCHAR"
+
+    from datetime import date
+    from sqlalchemy.dialects.sqlite import DATE
+    bindProcessor = DATE.bind_processor
+
+    def dateProcessor(self, dialect):  # MariaDB accepts ISO date strings, which are used as column defaults
+        process = bindProcessor(self, dialect)
+        return lambda value: process(date.fromisoformat(value) if isinstance(value, str) else value)
+
+    DATE.bind_processor = dateProcessor
+
+
+def _sqliteTransactions(engine):
+    """Let SQLAlchemy control transactions, so that savepoints work as on MariaDB.
+
+    Without this, pysqlite does not begin a transaction before a SAVEPOINT, which then commits on release.
+    WAL mode is enabled so that open read transactions do not block writers.
+    """
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "connect")
+    def connect(dbapiConnection, connectionRecord):
+        dbapiConnection.isolation_level = None
+        dbapiConnection.execute("PRAGMA journal_mode=WAL")
+
+    @event.listens_for(engine, "begin")
+    def begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    engine.dispose()
+
+
+def setup(workdir, schemaVersion=109, create=True):
+    """Configure the API to run against a SQLite database in `workdir`.
+
+    Parameters
+    ----------
+    workdir : str
+        Directory for the database, keys and other runtime files
+    schemaVersion : int, optional
+        Database schema version to emulate. The default is 109.
+    create : bool, optional
+        Whether to create a new database. If False, the database of a previous run is used. The default is True.
+
+    Returns
+    -------
+    str
+        Path to the database file
+    """
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(rootDir)
+    if rootDir not in sys.path:
+        sys.path.insert(0, rootDir)
+    dbPath = os.path.join(workdir, "grommunio.sqlite3")
+    if create and os.path.exists(dbPath):
+        os.remove(dbPath)
+    from tools.config import Config
+    Config["DB"]["uri"] = "sqlite:///"+dbPath
+    Config["options"]["disableDB"] = False
+    Config["options"]["usageIndexPath"] = os.path.join(workdir, "usage.sqlite3")
+    Config["options"].update(domainPrefix=os.path.join(workdir, "domain/"), userPrefix=os.path.join(workdir, "user/"))
+    Config["security"].update(jwtPrivateKeyFile=os.path.join(workdir, "jwt-privkey.pem"),
+                              jwtPublicKeyFile=os.path.join(workdir, "jwt-pubkey.pem"),
+                              rsaKeySize=2048)
+    Config["metrics"]["path"] = os.path.join(workdir, "metrics")
+    Config["tasq"]["disabled"] = True
+    _sqliteCompat()
+    if create:
+        import sqlite3
+        with sqlite3.connect(dbPath) as conn:
+            conn.execute("CREATE TABLE options (`key` VARCHAR(32) PRIMARY KEY, `value` VARCHAR(255))")
+            conn.execute("INSERT INTO options VALUES ('schemaversion', ?)", (str(schemaVersion),))
+    from orm import DB
+    _sqliteTransactions(DB.engine)
+    DB.initVersion()
+    DB.session.remove()
+    from orm import classes, domains, misc, mlists, roles, users
+    if create:
+        from sqlalchemy import text
+        for column in (misc.TasQ.__table__.c.created, misc.TasQ.__table__.c.updated):  # No now() in SQLite
+            column.server_default.arg = text("CURRENT_TIMESTAMP")
+        DB.Base.metadata.create_all(DB.engine)
+    return dbPath
+
+
+def seed(domains=10, users=100, properties=10, mlists=0):
+    """Fill the database with synthetic data.
+
+    Creates the system administrator (`admin`), `domains` domains with `users` users each,
+    `properties` user properties per user and `mlists` mailing lists per domain.
+    The password of all users is `userPass`.
+
+    Parameters
+    ----------
+    domains : int, optional
+        Number of domains. The default is 10.
+    users : int, optional
+        Number of users per domain. The default is 100.
+    properties : int, optional
+        Number of user properties per user (at least 3). The default is 10.
+    mlists : int, optional
+        Number of mailing lists per domain. The default is 0.
+
+    Returns
+    -------
+    dict
+        Seeding statistics and sample objects (`domains`, `users` as lists of (ID, name) tuples)
+    """
+    import crypt
+    from datetime import date, datetime
+    from orm import DB
+    from orm.domains import Domains
+    from orm.mlists import MLists
+    from orm.users import Users, UserProperties
+    from tools.constants import PropTags
+    start = time.perf_counter()
+    password = crypt.crypt(userPass, crypt.mksalt(crypt.METHOD_SHA512))
+    adminPassword = crypt.crypt(adminPass, crypt.mksalt(crypt.METHOD_SHA512))
+    now = int(datetime.now().timestamp())
+    domainRows, userRows, propRows, listRows = [], [], [], []
+    baseProps = [PropTags.DISPLAYTYPEEX, PropTags.STORAGEQUOTALIMIT, PropTags.MESSAGESIZEEXTENDED]
+    extraProps = [PropTags.PROHIBITRECEIVEQUOTA, PropTags.PROHIBITSENDQUOTA, PropTags.CREATIONTIME]
+    userRows.append(dict(id=0, username="admin", password=adminPassword, domain_id=0, maildir="", address_status=0,
+                         privilege_bits=0, lang="", max_size=0, group_id=0))
+    userID = 1
+    for domainID in range(1, domains+1):
+        domainname = "domain{}.test".format(domainID)
+        domainRows.append(dict(id=domainID, org_id=0, domainname=domainname, homedir="/tmp/d/{}".format(domainID),
+                               max_user=users*2, title="Domain {}".format(domainID), end_day=date(3333, 3, 3),
+                               domain_status=0))
+        for index in range(users):
+            userRows.append(dict(id=userID, username="user{}@{}".format(index, domainname), password=password,
+                                 domain_id=domainID, maildir="/tmp/u/{}".format(userID), address_status=0,
+                                 privilege_bits=0, lang="en_US", max_size=0, group_id=0))
+            values = [0, 1048576*(1+index % 5), 4096*index]
+            for propIndex in range(max(3, properties)):
+                if propIndex < 3:
+                    tag, value = baseProps[propIndex], values[propIndex]
+                elif propIndex-3 < len(extraProps):
+                    tag = extraProps[propIndex-3]
+                    value = now if tag == PropTags.CREATIONTIME else 1048576
+                else:
+                    tag, value = 0x80000000+propIndex*0x10000+0x001F, "value {}".format(propIndex)
+                propRows.append(dict(user_id=userID, proptag=tag, order_id=1, propval_str=str(value)))
+            userRows[-1]["_display"] = "User {} of domain {}".format(index, domainID)
+            propRows.append(dict(user_id=userID, proptag=PropTags.DISPLAYNAME, order_id=1,
+                                 propval_str=userRows[-1].pop("_display")))
+            userID += 1
+        listRows += [dict(listname="list{}@{}".format(index, domainname), domain_id=domainID, list_type=0,
+                          list_privilege=index % 5) for index in range(mlists)]
+    with DB.engine.begin() as conn:
+        conn.execute(Domains.__table__.insert(), domainRows)
+        conn.execute(Users.__table__.insert(), userRows)
+        if propRows:
+            conn.execute(UserProperties.__table__.insert(), propRows)
+        if listRows:
+            conn.execute(MLists.__table__.insert(), listRows)
+    return {"domains": [(row["id"], row["domainname"]) for row in domainRows],
+            "users": [(row["id"], row["domain_id"], row["username"]) for row in userRows if row["id"] != 0],
+            "properties": len(propRows),
+            "mlists": len(listRows),
+            "seedTime": round(time.perf_counter()-start, 3)}
+
+
+def loadApp():
+    """Import the API application and register all endpoints.
+
+    Endpoint modules that cannot be imported due to missing dependencies are skipped with a warning.
+
+    Returns
+    -------
+    flask.Flask
+        The API object
+    """
+    import importlib
+    import endpoints
+    from api.core import API
+    for module in endpoints.__all__:
+        try:
+            importlib.import_module("endpoints."+module)
+        except ImportError as err:
+            print("Skipping endpoints.{}: {}".format(module, err), file=sys.stderr)
+    return API
+
+
+def login(client, username="admin", password=adminPass):
+    """Log in and store the authentication cookie in the client.
+
+    Parameters
+    ----------
+    client : flask.testing.FlaskClient
+        Test client
+    username : str, optional
+        User to log in. The default is "admin".
+    password : str, optional
+        Password of the user. The default is `adminPass`.
+
+    Returns
+    -------
+    dict
+        Request headers containing the CSRF token
+    """
+    from api import BaseRoute
+    response = client.post(BaseRoute+"/login", data={"user": username, "pass": password})
+    if response.status_code != 200:
+        raise RuntimeError("Login failed: {}".format(response.get_json()))
+    data = response.get_json()
+    import inspect
+    if "server_name" in inspect.signature(client.set_cookie).parameters:  # Werkzeug < 2.3
+        client.set_cookie("localhost", "grommunioAuthJwt", data["grommunioAuthJwt"])
+    else:
+        client.set_cookie("grommunioAuthJwt", data["grommunioAuthJwt"])
+    return {"X-Csrf-Token": data["csrf"]}
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: 2026 grommunio GmbH
+
+"""Compare offset and cursor (keyset) pagination.
+
+Requests a page of the system user list at several depths, once with `offset` and once with a `cursor` obtained by
+walking the list page by page up to that depth. Also measures the cost of the total count, which is skipped in cursor
+mode unless requested with `count=true`, and the time needed to walk the complete list with either method.
+
+Usage: python3 -m bench.cursor [-u USERS] [-D DEPTHS] [-o results.json]
+"""
+
+import json
+import platform
+import sys
+import tempfile
+import time
+
+from argparse import ArgumentParser
+from datetime import datetime
+
+from . import common
+from .api import run
+
+
+def walk(client, headers, path, limit, depths=()):
+    """Walk the list with cursors.
+
+    Parameters
+    ----------
+    client : flask.testing.FlaskClient
+        Test client
+    headers : dict
+        Authentication headers
+    path : str
+        List path including query parameters
+    limit : int
+        Page size
+    depths : Collection, optional
+        Offsets to record cursors for. The default is ().
+
+    Returns
+    -------
+    tuple
+        Number of elements, number of requests and dict mapping depth -> cursor
+    """
+    cursor, elements, requests, cursors = "", 0, 0, {}
+    while True:
+        if elements in depths:
+            cursors[elements] = cursor
+        response = client.get(path+"&limit={}&cursor={}".format(limit, cursor), headers=headers)
+        requests += 1
+        if response.status_code != 200:
+            raise RuntimeError("Request failed: {}".format(response.get_data(as_text=True)))
+        data = response.get_json()
+        elements += len(data["data"])
+        cursor = data.get("next")
+        if len(data["data"]) < limit or not cursor:
+            return elements, requests, cursors
+
+
+def paged(client, headers, path, limit):
+    """Walk the list with offsets.
+
+    Returns
+    -------
+    tuple
+        Number of elements and number of requests
+    """
+    elements, requests = 0, 0
+    while True:
+        response = client.get(path+"&limit={}&offset={}".format(limit, elements), headers=headers)
+        requests += 1
+        if response.status_code != 200:
+            raise RuntimeError("Request failed: {}".format(response.get_data(as_text=True)))
+        data = response.get_json()["data"]
+        elements += len(data)
+        if len(data) < limit:
+            return elements, requests
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Compare offset and cursor pagination")
+    parser.add_argument("-d", "--domains", type=int, default=10, help="Number of domains to create")
+    parser.add_argument("-u", "--users", type=int, default=10000, help="Number of users per domain")
+    parser.add_argument("-l", "--limit", type=int, default=50, help="Page size")
+    parser.add_argument("-D", "--depths", default="0,1000,10000,50000,90000",
+                        help="Comma separated list of offsets to request pages at")
+    parser.add_argument("-n", "--iterations", type=int, default=20, help="Number of requests per case")
+    parser.add_argument("-w", "--warmup", type=int, default=2, help="Number of unmeasured requests per case")
+    parser.add_argument("--walk", action="store_true", help="Also measure walking the complete list")
+    parser.add_argument("-o", "--output", help="Write results to file")
+    parser.add_argument("-c", "--compare", help="Compare results with previous run")
+    parser.add_argument("--workdir", help="Directory for runtime files. Defaults to a temporary directory.")
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir
+    if workdir is None:
+        import atexit
+        import shutil
+        workdir = tempfile.mkdtemp(prefix="grommunio-bench-")
+        atexit.register(shutil.rmtree, workdir, True)
+    common.setup(workdir)
+    seeded = common.seed(args.domains, args.users, 3)
+    API = common.loadApp()
+    API.logger.setLevel("ERROR")
+    client = API.test_client()
+    headers = common.login(client)
+    from api import BaseRoute
+
+    total = len(seeded["users"])
+    depths = [depth for depth in map(int, args.depths.split(",")) if depth < total]
+    path = BaseRoute+"/system/users?stream=false"
+    start = time.perf_counter()
+    elements, requests, cursors = walk(client, headers, path, args.limit, {d-d % args.limit for d in depths})
+    walked = time.perf_counter()-start
+    cases = []
+    for depth in depths:
+        depth -= depth % args.limit
+        cases.append(("offset {}".format(depth), path+"&limit={}&offset={}".format(args.limit, depth)))
+        cases.append(("cursor {}".format(depth), path+"&limit={}&cursor={}".format(args.limit, cursors[depth])))
+    cases.append(("offset 0 (count)", path+"&limit={}".format(args.limit)))
+    cases.append(("cursor 0 (count)", path+"&limit={}&cursor=&count=true".format(args.limit)))
+
+    results = {"meta": {"date": datetime.now().isoformat(timespec="seconds"),
+                        "python": platform.python_version(),
+                        "platform": platform.platform(),
+                        "domains": args.domains,
+                        "users": args.users,
+                        "limit": args.limit,
+                        "iterations": args.iterations,
+                        "seedTime": seeded["seedTime"]},
+               "endpoints": {},
+               "walk": {}}
+    for name, casePath in cases:
+        result = run(client, headers, "GET", casePath, None, args.iterations, args.warmup)
+        results["endpoints"][name] = result
+        print("{:<20} {:>8.2f} req/s  p50 {:>9.3f} ms  p95 {:>9.3f} ms  errors {}"
+              .format(name, result["throughput"], result["p50"], result["p95"], result["errors"]), file=sys.stderr)
+    results["walk"]["cursor"] = {"elements": elements, "requests": requests, "duration": round(walked, 3)}
+    if args.walk:
+        start = time.perf_counter()
+        pagedElements, pagedRequests = paged(client, headers, path, args.limit)
+        results["walk"]["offset"] = {"elements": pagedElements, "requests": pagedRequests,
+                                     "duration": round(time.perf_counter()-start, 3)}
+    for mode, walkResult in results["walk"].items():
+        print("{:<20} {elements} users in {requests} requests, {duration} s".format("walk ({})".format(mode),
+                                                                                   **walkResult), file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    if args.compare:
+        from .api import compare
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+    return 1 if any(result["errors"] for result in results["endpoints"].values()) or \
+        any(walkResult["elements"] != total for walkResult in results["walk"].values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
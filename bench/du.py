@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: 2026 grommunio GmbH
+
+"""Compare disk usage scans of a storage partition.
+
+Generates a directory tree resembling a user storage partition (see options.userStorageLevels) and measures the time to
+calculate the usage of every mailbox, once with the previous serial `os.walk` implementation and once with
+`tools.diskusage` for each given number of threads. The totals of all runs are checked for equality.
+
+An existing directory (e.g. on a network file system) can be scanned instead of a generated tree with `--path`.
+
+Usage: python3 -m bench.du [-m MAILBOXES] [-j JOBS ...] [-o results.json]
+"""
+
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from argparse import ArgumentParser
+from datetime import datetime
+
+from . import common
+
+
+def walkSize(path):
+    """Calculate number of files and total size of a directory tree using `os.walk`.
+
+    Previous implementation of `fs du`, used as reference.
+    """
+    files, size = 0, os.path.getsize(path)
+    for pathname, dirnames, filenames in os.walk(path):
+        for filename in dirnames+filenames:
+            file = os.path.join(pathname, filename)
+            if not os.path.islink(file):
+                files += os.path.isfile(file)
+                size += os.path.getsize(file)
+    return files, size
+
+
+def generate(root, mailboxes, files, levels=2):
+    """Generate a storage partition.
+
+    Mailbox directories are placed like user home directories (see `tools.storage.createPath`).
+
+    Parameters
+    ----------
+    root : str
+        Root directory of the partition
+    mailboxes : int
+        Number of mailbox directories
+    files : int
+        Number of content files per mailbox
+    levels : int, optional
+        Number of directory levels of the partition (see options.userStorageLevels). The default is 2.
+
+    Returns
+    -------
+    int
+        Number of created files
+    """
+    from tools.storage import genPath
+    created = 0
+    for index in range(mailboxes):
+        mailbox = os.path.join(root, *["{:X}".format(i) for i in genPath(index+1, levels)])
+        for subdir in ("cid", "eml", "exmdb", "config", "tmp/imap.rfc822"):
+            os.makedirs(os.path.join(mailbox, subdir))
+        content = [os.path.join(mailbox, "exmdb", "exchange.sqlite3"), os.path.join(mailbox, "exmdb", "midb.sqlite3")]
+        content += [os.path.join(mailbox, "cid", "{}.{}".format(1000+fileIndex, index)) for fileIndex in range(files)]
+        for fileIndex, path in enumerate(content):
+            with open(path, "wb") as file:
+                file.truncate(4096*(1+(index+fileIndex) % 32))
+        created += len(content)
+    return created
+
+
+def _dropCaches():
+    """Drop the page, dentry and inode caches. Requires root privileges."""
+    os.sync()
+    with open("/proc/sys/vm/drop_caches", "w") as file:
+        file.write("3")
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Compare disk usage scans of a storage partition")
+    parser.add_argument("-m", "--mailboxes", type=int, default=2000, help="Number of mailboxes to generate")
+    parser.add_argument("-f", "--files", type=int, default=50, help="Number of content files per mailbox")
+    parser.add_argument("-j", "--jobs", type=int, action="append", help="Number of scan threads (repeatable)")
+    parser.add_argument("-n", "--iterations", type=int, default=3, help="Number of measured runs per mode")
+    parser.add_argument("-p", "--path", help="Scan existing directory instead of generating a tree")
+    parser.add_argument("-L", "--levels", type=int, default=2, help="Number of storage levels of the partition")
+    parser.add_argument("--drop-caches", action="store_true", help="Drop file system caches before each run")
+    parser.add_argument("-o", "--output", help="Write results to file")
+    parser.add_argument("-c", "--compare", help="Compare results with previous run")
+    parser.add_argument("--workdir", help="Directory for the generated tree. Defaults to a temporary directory.")
+    args = parser.parse_args(argv)
+
+    if common.rootDir not in sys.path:
+        sys.path.insert(0, common.rootDir)
+    from tools.diskusage import splitTree, usage
+    root = args.path
+    if root is None:
+        workdir = args.workdir
+        if workdir is None:
+            import atexit
+            import shutil
+            workdir = tempfile.mkdtemp(prefix="grommunio-bench-")
+            atexit.register(shutil.rmtree, workdir, True)
+        root = os.path.join(workdir, "user")
+        start = time.perf_counter()
+        created = generate(root, args.mailboxes, args.files, args.levels)
+        print("Generated {} mailboxes with {} files in {:.2f}s".format(args.mailboxes, created,
+                                                                        time.perf_counter()-start), file=sys.stderr)
+
+    def walk():
+        dirs, files, size = splitTree(root, args.levels)
+        for path in dirs:
+            f, s = walkSize(path)
+            files += f
+            size += s
+        return len(dirs), files, size
+
+    def scan(jobs):
+        dirs, files, size = splitTree(root, args.levels)
+        for path, f, s in usage(dirs, jobs):
+            files += f
+            size += s
+        return len(dirs), files, size
+
+    modes = [("os.walk", walk)]+[("scandir ({} threads)".format(jobs), lambda jobs=jobs: scan(jobs))
+                                 for jobs in args.jobs or (1, 4, 16)]
+    results = {"meta": {"date": datetime.now().isoformat(timespec="seconds"),
+                        "python": platform.python_version(),
+                        "platform": platform.platform(),
+                        "path": args.path,
+                        "mailboxes": args.mailboxes,
+                        "files": args.files,
+                        "levels": args.levels,
+                        "dropCaches": args.drop_caches,
+                        "iterations": args.iterations},
+               "endpoints": {}}
+    reference = None
+    for name, mode in modes:
+        durations, errors = [], 0
+        for _ in range(args.iterations):
+            if args.drop_caches:
+                _dropCaches()
+            start = time.perf_counter()
+            totals = mode()
+            durations.append(time.perf_counter()-start)
+            reference = reference or totals
+            errors += totals != reference
+        result = common.summarize(durations, errors)
+        results["endpoints"][name] = result
+        print("{:<22} {:>6} directories  {:>9} files  {:>14,} bytes  p50 {:>10.3f} ms  errors {}"
+              .format(name, totals[0], totals[1], totals[2], result["p50"], errors), file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    if args.compare:
+        from .api import compare
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+    return 1 if any(result["errors"] for result in results["endpoints"].values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: 2026 grommunio GmbH
+
+"""Measure exmdb connection reuse.
+
+Runs endpoints using exmdb against a local fake exmdb socket server (see `fakes.FakeExmdbServer`) once with the
+connection pool of the exmdb service and once with pooling disabled, so that every request opens new connections.
+Reports latency and the number of connections opened per request.
+
+Usage: python3 -m bench.exmdb [-l LATENCY] [-o results.json]
+"""
+
+import json
+import platform
+import sys
+import tempfile
+
+from argparse import ArgumentParser
+from datetime import datetime
+
+from . import common, fakes
+from .api import run
+
+
+def _cases(seeded):
+    """Create benchmark cases.
+
+    Parameters
+    ----------
+    seeded : dict
+        Result of `common.seed`
+
+    Returns
+    -------
+    list of tuple
+        Name, method, path(s) and form data of each case
+    """
+    from api import BaseRoute
+    domainID = seeded["domains"][0][0]
+    users = [user for user in seeded["users"] if user[1] == domainID]
+    return [("store properties", "GET",
+             [BaseRoute+"/domains/{}/users/{}/storeProps?properties=messagesizeextended,storagequotalimit"
+              .format(domainID, user[0]) for user in users], None),
+            ("store access", "GET", [BaseRoute+"/domains/{}/users/{}/storeAccess".format(domainID, user[0])
+                                     for user in users], None),
+            ("public folders", "GET", BaseRoute+"/domains/{}/folders".format(domainID), None)]
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Measure exmdb connection reuse")
+    parser.add_argument("-u", "--users", type=int, default=10,
+                        help="Number of users to request store data of. Should not exceed options.exmdbPoolSize.")
+    parser.add_argument("-l", "--latency", type=float, default=0.2,
+                        help="Simulated exmdb round trip time in milliseconds")
+    parser.add_argument("-n", "--iterations", type=int, default=500, help="Number of requests per endpoint")
+    parser.add_argument("-w", "--warmup", type=int, default=20, help="Number of unmeasured requests per endpoint")
+    parser.add_argument("-o", "--output", help="Write results to file")
+    parser.add_argument("-c", "--compare", help="Compare results with previous run")
+    parser.add_argument("--workdir", help="Directory for runtime files. Defaults to a temporary directory.")
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir
+    if workdir is None:
+        import atexit
+        import shutil
+        workdir = tempfile.mkdtemp(prefix="grommunio-bench-")
+        atexit.register(shutil.rmtree, workdir, True)  # Registered first to run after the final metrics flush
+    common.setup(workdir)
+    seeded = common.seed(1, args.users, 3)
+    server = fakes.FakeExmdbServer(args.latency/1000)
+    fakes.install(exmdbServer=server)
+    API = common.loadApp()
+    API.logger.setLevel("ERROR")
+    client = API.test_client()
+    headers = common.login(client)
+    from services import Service
+    with Service("exmdb") as exmdb:
+        pool = exmdb.pool
+
+    results = {"meta": {"date": datetime.now().isoformat(timespec="seconds"),
+                        "python": platform.python_version(),
+                        "platform": platform.platform(),
+                        "users": args.users,
+                        "latency": args.latency,
+                        "iterations": args.iterations},
+               "endpoints": {},
+               "connections": {}}
+    for mode, idleTimeout in (("pooled", pool.idleTimeout), ("unpooled", 0)):
+        pool.clear()
+        pool.idleTimeout = idleTimeout
+        before = pool.stats()
+        for name, method, path, data in _cases(seeded):
+            name = "{} ({})".format(name, mode)
+            connections, requests = server.connections, server.requests
+            result = run(client, headers, method, path, data, args.iterations, args.warmup)
+            total = args.iterations+args.warmup
+            result["connections"] = round((server.connections-connections)/total, 3)
+            result["exmdbRequests"] = round((server.requests-requests)/total, 3)
+            results["endpoints"][name] = result
+            print("{:<28} {:>8.2f} req/s  p50 {:>8.3f} ms  p95 {:>8.3f} ms  {:>6.2f} connections/request  errors {}"
+                  .format(name, result["throughput"], result["p50"], result["p95"], result["connections"],
+                          result["errors"]), file=sys.stderr)
+        results["connections"][mode] = {key: value-before[key] if key in ("created", "reused", "evicted", "broken")
+                                        else value for key, value in pool.stats().items()}
+    server.close()
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    if args.compare:
+        from .api import compare
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: 2026 grommunio GmbH
+
+"""Compare paged user lists with the user export endpoint.
+
+Retrieves all users including a set of properties once page by page through the system user list and once through the
+CSV and JSONL export, and reports total time, number of requests and peak RSS growth (see `bench.stream`) per mode.
+
+Usage: python3 -m bench.export [-u USERS] [-o results.json]
+"""
+
+import gc
+import json
+import platform
+import sys
+import tempfile
+import time
+
+from argparse import ArgumentParser
+from datetime import datetime
+
+from . import common
+from .stream import _resetPeak, _status
+
+propnames = ("displayname", "storagequotalimit", "messagesizeextended")
+
+
+def paged(client, headers, path, limit):
+    """Retrieve all users page by page.
+
+    Returns
+    -------
+    tuple
+        Number of users and number of requests
+    """
+    from api import BaseRoute
+    users, requests = 0, 0
+    while True:
+        response = client.get(BaseRoute+path+"&limit={}&offset={}".format(limit, users), headers=headers)
+        requests += 1
+        if response.status_code != 200:
+            raise RuntimeError("Request failed: {}".format(response.get_data(as_text=True)))
+        data = response.get_json()["data"]
+        users += len(data)
+        if len(data) < limit:
+            return users, requests
+
+
+def exported(client, headers, path, fmt):
+    """Retrieve all users through the export endpoint.
+
+    Returns
+    -------
+    tuple
+        Number of users and number of requests
+    """
+    from api import BaseRoute
+    response = client.get(BaseRoute+path+"&format="+fmt, headers=headers, buffered=False)
+    if response.status_code != 200:
+        raise RuntimeError("Request failed: {}".format(response.get_data(as_text=True)))
+    lines = sum(chunk.count(b"\n") if isinstance(chunk, bytes) else chunk.count("\n") for chunk in response.response)
+    response.close()
+    return lines-(fmt == "csv"), 1
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Compare paged user lists with the user export endpoint")
+    parser.add_argument("-d", "--domains", type=int, default=10, help="Number of domains to create")
+    parser.add_argument("-u", "--users", type=int, default=5000, help="Number of users per domain")
+    parser.add_argument("-l", "--limit", type=int, default=500, help="Page size of the paged list")
+    parser.add_argument("-n", "--iterations", type=int, default=3, help="Number of measured runs per mode")
+    parser.add_argument("-o", "--output", help="Write results to file")
+    parser.add_argument("-c", "--compare", help="Compare results with previous run")
+    parser.add_argument("--workdir", help="Directory for runtime files. Defaults to a temporary directory.")
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir
+    if workdir is None:
+        import atexit
+        import shutil
+        workdir = tempfile.mkdtemp(prefix="grommunio-bench-")
+        atexit.register(shutil.rmtree, workdir, True)  # Registered first to run after the final metrics flush
+    common.setup(workdir)
+    seeded = common.seed(args.domains, args.users, 3)
+    API = common.loadApp()
+    API.logger.setLevel("ERROR")
+    client = API.test_client()
+    headers = common.login(client)
+
+    properties = ",".join(propnames)
+    modes = (("paged (limit {})".format(args.limit),
+              lambda: paged(client, headers, "/system/users?stream=false&properties="+properties, args.limit)),
+             ("export (csv)", lambda: exported(client, headers, "/system/users/export?properties="+properties, "csv")),
+             ("export (jsonl)", lambda: exported(client, headers, "/system/users/export?properties="+properties,
+                                                 "jsonl")))
+    results = {"meta": {"date": datetime.now().isoformat(timespec="seconds"),
+                        "python": platform.python_version(),
+                        "platform": platform.platform(),
+                        "domains": args.domains,
+                        "users": args.users,
+                        "limit": args.limit,
+                        "iterations": args.iterations,
+                        "seedTime": seeded["seedTime"]},
+               "endpoints": {},
+               "memory": {}}
+    for name, mode in modes:
+        durations, growth, errors = [], 0, 0
+        for _ in range(args.iterations):
+            gc.collect()
+            resetOk = _resetPeak()
+            rss = _status("VmRSS")
+            start = time.perf_counter()
+            users, requests = mode()
+            durations.append(time.perf_counter()-start)
+            errors += users != len(seeded["users"])
+            if resetOk:
+                growth = max(growth, _status("VmHWM")-rss)
+        result = common.summarize(durations, errors)
+        result["requests"] = requests
+        results["endpoints"][name] = result
+        results["memory"][name] = {"peakRss": growth if resetOk else None, "elements": users}
+        print("{:<20} {:>7} users  {:>5} requests  p50 {:>10.3f} ms  peak RSS +{} KiB  errors {}"
+              .format(name, users, requests, result["p50"], growth if resetOk else "?", errors), file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    if args.compare:
+        from .api import compare
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,530 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: 2026 grommunio GmbH
+
+"""In-process replacements for external services.
+
+Allows running benchmarks and load tests without exmdb, LDAP or redis servers and without journald.
+
+The exmdb replacement is installed as `pyexmdb` module, so that the regular exmdb service including its connection pool
+is used. Optionally, exmdb clients connect to a local socket server (`FakeExmdbServer`), so that the cost of
+connection setup and request round trips is included. LDAP and redis are replaced at service level, journald by a fake
+`systemd.journal` module.
+
+All service fakes can simulate network latency by sleeping for a configurable time on each call.
+"""
+
+import sys
+import threading
+import time
+import types
+
+
+class _Latency:
+    """Simulated round trip time in seconds."""
+    value = 0
+
+    @classmethod
+    def wait(cls):
+        if cls.value > 0:
+            time.sleep(cls.value)
+
+
+class ExmdbError(RuntimeError):
+    pass
+
+
+class ExmdbProtocolError(ExmdbError):
+    pass
+
+
+class SerializationError(ExmdbError):
+    pass
+
+
+class ConnectionError(ExmdbError):
+    pass
+
+
+class GUID:
+    PSETID_GROMOX = "PSETID_GROMOX"
+
+
+class PropertyName:
+    def __init__(self, guid, name):
+        self.guid, self.name = guid, name
+
+
+class Restriction:
+    FL_FULLSTRING = 0
+    FL_SUBSTRING = 1
+    FL_PREFIX = 2
+    FL_IGNORECASE = 0x10000
+
+    def __init__(self, kind, *args):
+        self.kind, self.args = kind, args
+
+    @classmethod
+    def _factory(cls, kind):
+        return classmethod(lambda cls_, *args: cls_(kind, *args))
+
+
+for _kind in ("NULL", "AND", "OR", "NOT", "CONTENT", "PROPERTY", "EXIST", "BITMASK", "SIZE", "SUBOBJ", "COMMENT",
+              "COUNT"):
+    setattr(Restriction, _kind, Restriction._factory(_kind))
+
+
+class TaggedPropval:
+    def __init__(self, tag, val=None):
+        self.tag, self.val = tag, val
+
+    def toString(self):
+        return str(self.val)
+
+
+class Folder:
+    def __init__(self, data, syncToMobile=None):
+        self.folderId = data["folderId"]
+        self.parentId = data.get("parentId", 0)
+        self.displayName = data.get("displayName", "")
+        self.comment = data.get("comment", "")
+        self.creationTime = data.get("creationTime", 0)
+        self.container = data.get("container", "IPF.Note")
+        self.syncToMobile = data.get("syncToMobile", False) if syncToMobile is not None else None
+
+
+def FolderList(data, syncToMobile=None):
+    return types.SimpleNamespace(folders=[Folder(folder, syncToMobile) for folder in data])
+
+
+def FolderMemberList(data):
+    return types.SimpleNamespace(members=[types.SimpleNamespace(**member) for member in data])
+
+
+class ExmdbQueries:
+    """Fake exmdb client returning synthetic data.
+
+    Store properties and folders are kept in memory per home directory. Calls not explicitly implemented return None.
+    """
+
+    ADD = 0
+    REMOVE = 1
+    defaultFolderProps = [0x3001001F, 0x3004001F, 0x30070040, 0x3613001F]
+
+    _stores = {}
+    _folders = {}
+    _lock = threading.Lock()
+
+    def __init__(self, host, port, homedir, isPrivate):
+        _Latency.wait()
+        self.homedir = homedir
+
+    def _folderList(self, homedir):
+        with self._lock:
+            if homedir not in self._folders:
+                self._folders[homedir] = {
+                    ID: {"folderId": ID, "parentId": 1, "displayName": "Folder {}".format(ID), "comment": "",
+                         "creationTime": 132000000000000000, "container": "IPF.Note"} for ID in range(0x100, 0x10A)}
+            return self._folders[homedir]
+
+    def getStoreProperties(self, homedir, cpid, tags):
+        _Latency.wait()
+        store = self._stores.get(homedir, {})
+        return [TaggedPropval(tag, store.get(tag, 0)) for tag in tags]
+
+    def setStoreProperties(self, homedir, cpid, propvals):
+        _Latency.wait()
+        with self._lock:
+            self._stores.setdefault(homedir, {}).update((propval.tag, propval.val) for propval in propvals)
+        return []
+
+    def removeStoreProperties(self, homedir, tags):
+        _Latency.wait()
+        with self._lock:
+            for tag in tags:
+                self._stores.get(homedir, {}).pop(tag, None)
+
+    def resolveNamedProperties(self, homedir, create, names):
+        _Latency.wait()
+        return [0x8000+index for index in range(len(names))]
+
+    def getFolderProperties(self, homedir, cpid, folderId, tags=None):
+        _Latency.wait()
+        return self._folderList(homedir).get(folderId, {"folderId": folderId, "displayName": "IPM_SUBTREE"})
+
+    def listFolders(self, homedir, folderId, recursive=False, proptags=None, offset=0, limit=None, restriction=None):
+        _Latency.wait()
+        folders = list(self._folderList(homedir).values())
+        return folders[offset:] if limit is None else folders[offset:offset+limit]
+
+    def createFolder(self, homedir, domainID, name, container, comment, parentID=1):
+        _Latency.wait()
+        folders = self._folderList(homedir)
+        with self._lock:
+            ID = max(folders, default=0x100)+1
+            folders[ID] = {"folderId": ID, "parentId": parentID, "displayName": name, "comment": comment,
+                           "creationTime": 132000000000000000, "container": container}
+        return ID
+
+    def setFolderProperties(self, homedir, cpid, folderId, propvals):
+        _Latency.wait()
+        return []
+
+    def getFolderMemberList(self, homedir, folderId):
+        _Latency.wait()
+        return [{"id": 1, "name": "Default", "mail": "default", "rights": 0, "special": True}]
+
+    def getSyncData(self, homedir, folder):
+        _Latency.wait()
+        return {}
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+
+        def call(*args, **kwargs):
+            _Latency.wait()
+        return call
+
+
+class SocketExmdbQueries(ExmdbQueries):
+    """Fake exmdb client connected to a `FakeExmdbServer`.
+
+    Opens a TCP connection and performs a connect request on creation, like the real client does, and sends one request
+    per method call before returning the synthetic data of `ExmdbQueries`.
+    """
+
+    def __init__(self, host, port, homedir, isPrivate):
+        import socket
+        ExmdbQueries.__init__(self, host, port, homedir, isPrivate)
+        try:
+            self._sock = socket.create_connection((host, int(port)))
+            self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError as err:
+            raise ConnectionError("Failed to connect to exmdb server: "+str(err))
+        self._rpc(b"connect "+homedir.encode())
+
+    def __del__(self):
+        sock = self.__dict__.get("_sock")
+        if sock is not None:
+            sock.close()
+
+    def _rpc(self, request):
+        try:
+            self._sock.sendall(len(request).to_bytes(4, "big")+request)
+            if not FakeExmdbServer.receive(self._sock):
+                raise ConnectionError("Connection closed by server")
+        except OSError as err:
+            raise ConnectionError(str(err))
+
+    def __getattribute__(self, name):
+        attr = object.__getattribute__(self, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            self._rpc(name.encode())
+            return attr(*args, **kwargs)
+        return call
+
+
+class FakeExmdbServer:
+    """Local TCP server answering every request of a `SocketExmdbQueries` client with an empty response.
+
+    Each connection is handled by its own thread.
+    """
+
+    def __init__(self, latency=0):
+        """Start server on a random port of the loopback interface.
+
+        Parameters
+        ----------
+        latency : float, optional
+            Time (in seconds) to wait before answering a request, simulating the network round trip. The default is 0.
+        """
+        import socket
+        self.latency = latency
+        self.connections = self.requests = 0
+        self._sock = socket.create_server(("127.0.0.1", 0))
+        self.host, self.port = self._sock.getsockname()[:2]
+        threading.Thread(target=self._accept, name="Fake exmdb server", daemon=True).start()
+
+    @staticmethod
+    def receive(sock):
+        """Receive a length prefixed message.
+
+        Returns
+        -------
+        bytes
+            The message or None if the connection was closed
+        """
+        data = b""
+        length = None
+        while length is None or len(data) < length+4:
+            chunk = sock.recv(65536)
+            if not chunk:
+                return None
+            data += chunk
+            if length is None and len(data) >= 4:
+                length = int.from_bytes(data[:4], "big")
+        return data[4:]
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        import socket
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with conn:
+            while self.receive(conn) is not None:
+                self.requests += 1
+                if self.latency:
+                    time.sleep(self.latency)
+                conn.sendall(b"\x00\x00\x00\x01\x00")
+
+    def close(self):
+        self._sock.close()
+
+
+class FakeRedis:
+    """Minimal in-memory redis replacement supporting strings and hashes."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        _Latency.wait()
+        return self._data.get(key)
+
+    def set(self, key, value, *args, **kwargs):
+        _Latency.wait()
+        with self._lock:
+            self._data[key] = str(value)
+        return True
+
+    def delete(self, *keys):
+        _Latency.wait()
+        with self._lock:
+            return sum(self._data.pop(key, None) is not None for key in keys)
+
+    def hget(self, key, field):
+        _Latency.wait()
+        return self._data.get(key, {}).get(field)
+
+    def hgetall(self, key):
+        _Latency.wait()
+        return dict(self._data.get(key, {}))
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        _Latency.wait()
+        with self._lock:
+            data = self._data.setdefault(key, {})
+            if field is not None:
+                data[field] = str(value)
+            data.update((k, str(v)) for k, v in (mapping or {}).items())
+        return 1
+
+    def hdel(self, key, *fields):
+        _Latency.wait()
+        with self._lock:
+            data = self._data.get(key, {})
+            return sum(data.pop(field, None) is not None for field in fields)
+
+
+class FakeLdap:
+    """LDAP replacement without any users.
+
+    Authentication of any LDAP user fails and searches return no results.
+    """
+
+    def __init__(self, orgID=None):
+        _Latency.wait()
+
+    def authUser(self, ID, password):
+        _Latency.wait()
+        return "Invalid credentials"
+
+    def downsyncUser(self, ID, props=None):
+        _Latency.wait()
+
+    def dumpUser(self, ID):
+        _Latency.wait()
+
+    def getUserInfo(self, ID):
+        _Latency.wait()
+
+    def searchUsers(self, query=None, domains=None, limit=None, pageSize=1000, filterIncomplete=True):
+        _Latency.wait()
+        return []
+
+    @staticmethod
+    def unescapeFilterChars(text):
+        from services.ldap import LdapService
+        return LdapService.unescapeFilterChars(text)
+
+
+def _fakeDirectory():
+    """Create the `FakeDirectory` class.
+
+    Deferred, as `services.ldap` must not be imported before `common.setup`.
+    """
+    from services.ldap import LdapService, SearchResult
+
+    class FakeDirectory(LdapService):
+        """LDAP replacement resolving every object ID to a synthetic user.
+
+        The external ID of a user is expected to be its e-mail address. Returned objects carry the attributes of the
+        `common` template, so that synchronization runs the regular attribute conversion. Changing `generation` changes
+        all attribute values, making the next synchronization update every user.
+        """
+        generation = 0
+
+        def __init__(self, orgID=None):
+            self.init()
+            self._config = {"baseDn": "dc=bench,dc=test", "objectID": "entryUUID", "connection": {"server": "fake"},
+                            "users": {"username": "mail", "displayName": "displayName", "searchAttributes": ["mail"],
+                                      "templates": ["common"]}}
+            self._userAttributes = self._checkConfig(self._config)
+            self.lock = threading.Lock()
+            self._defaultProps = {}
+            _Latency.wait()
+
+        def _entry(self, ID):
+            from datetime import datetime, timezone
+            name, gen = ID.decode(), self.generation
+            local = name.split("@")[0]
+            attributes = {"mail": [name], "displayName": "{} ({})".format(local, gen), "givenName": local,
+                          "sn": "Generation {}".format(gen), "title": "Title {}".format(gen),
+                          "l": "City {}".format(gen), "company": "Company {}".format(gen),
+                          "description": ["Synchronized", "user", str(gen)],
+                          "telephoneNumber": "+43 1 {:07d}".format(gen),
+                          "physicalDeliveryOfficeName": "Room {}".format(gen),
+                          "modifyTimestamp": [datetime.now(timezone.utc)]}
+            return {"dn": "cn={},dc=bench,dc=test".format(local), "raw_attributes": {"entryUUID": [ID]},
+                    "attributes": attributes}
+
+        def growPool(self, size):
+            return size
+
+        def getAll(self, IDs, attributes=None):
+            _Latency.wait()
+            return [SearchResult(self, "user", self._entry(ID)) for ID in IDs]
+
+        def getUserInfo(self, ID):
+            return self.getAll([ID])[0]
+
+        def searchUsers(self, query=None, domains=None, limit=None, pageSize=1000, filterIncomplete=True):
+            _Latency.wait()
+            return []
+
+    return FakeDirectory
+
+
+class FakeJournal:
+    """Minimal `systemd.journal.Reader` replacement.
+
+    All readers share the class wide list of entries, which can be extended with `append`. Matches are ignored.
+    """
+    entries = []
+
+    class Monotonic:
+        def __init__(self, timestamp):
+            self.timestamp = timestamp
+
+    def __init__(self):
+        self._pos = 0
+
+    @classmethod
+    def append(cls, count):
+        """Append `count` synthetic entries."""
+        from datetime import datetime, timedelta
+        now, start = datetime.now(), len(cls.entries)
+        cls.entries.extend({"__CURSOR": "c{}".format(index),
+                            "PRIORITY": 6,
+                            "MESSAGE": "Synthetic log message #{}".format(index),
+                            "__REALTIME_TIMESTAMP": now+timedelta(microseconds=index),
+                            "__MONOTONIC_TIMESTAMP": cls.Monotonic(timedelta(microseconds=index))}
+                           for index in range(start, start+count))
+
+    def add_match(self, **kwargs):
+        pass
+
+    def seek_tail(self):
+        self._pos = len(self.entries)
+
+    def seek_cursor(self, cursor):
+        try:
+            index = int(cursor[1:]) if cursor.startswith("c") else -1
+        except ValueError:
+            index = -1
+        if not 0 <= index < len(self.entries):
+            raise ValueError("Invalid cursor")
+        self._pos = index
+
+    def get_previous(self, skip=1):
+        self._pos -= skip
+        if self._pos < 0:
+            self._pos = 0
+            return {}
+        return self.entries[self._pos]
+
+    def get_next(self, skip=1):
+        self._pos += skip-1
+        if self._pos >= len(self.entries):
+            return {}
+        self._pos += 1
+        return self.entries[self._pos-1]
+
+    def wait(self, timeout):
+        pass
+
+
+def install(latency=0, directory=False, exmdbServer=None):
+    """Replace external services with fakes.
+
+    Must be called before the first use of the exmdb, LDAP or redis service or the journald log reader.
+
+    Parameters
+    ----------
+    latency : float, optional
+        Simulated round trip time (in seconds) of each service call. The default is 0.
+    directory : bool, optional
+        Replace LDAP with a directory of synthetic users (see `_fakeDirectory`) instead of an empty one.
+        The default is False.
+    exmdbServer : FakeExmdbServer, optional
+        Connect exmdb clients to this server (see `SocketExmdbQueries`). The server address is written to the
+        configuration. The default is None.
+
+    Returns
+    -------
+    type
+        The class registered as LDAP service
+    """
+    _Latency.value = latency
+    module = types.ModuleType("pyexmdb", "Fake exmdb client")
+    for name in ("ConnectionError", "ExmdbError", "ExmdbProtocolError", "SerializationError", "ExmdbQueries", "Folder",
+                 "GUID", "PropertyName", "Restriction", "TaggedPropval", "FolderList", "FolderMemberList"):
+        setattr(module, name, globals()[name])
+    if exmdbServer is not None:
+        from tools.config import Config
+        module.ExmdbQueries = SocketExmdbQueries
+        Config["options"].update(exmdbHost=exmdbServer.host, exmdbPort=str(exmdbServer.port))
+    sys.modules["pyexmdb"] = module
+    journal = types.ModuleType("systemd.journal", "Fake journal reader")
+    journal.Reader = FakeJournal
+    sys.modules["systemd.journal"] = journal
+    if "tools.logs" in sys.modules:
+        sys.modules["tools.logs"].Reader = FakeJournal
+    from services import ServiceHub
+    ServiceHub.register("redis", maxfailures=5)(FakeRedis)
+    ldap = _fakeDirectory() if directory else FakeLdap
+    ServiceHub.register("ldap", argspec=((), (int,)))(ldap)
+    ServiceHub._instances.clear()
+    return ldap
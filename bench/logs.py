@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: 2026 grommunio GmbH
+
+"""Compare log polling strategies.
+
+Simulates a log viewer polling a busy unit: Between two polls, a number of new entries is appended to a fake journal
+(see `bench.fakes.FakeJournal`). Each poll is performed either by rereading the tail (`n` lines, previous behavior), by
+requesting all lines after the time of the last entry, or by following the cursor returned by the previous poll.
+Reports CPU time and latency per poll.
+
+The fake journal has no decompression or file access overhead, so the results only reflect the work of the API, which
+grows with the number of entries read per poll.
+
+Usage: python3 -m bench.logs [-e ENTRIES] [-o results.json]
+"""
+
+import json
+import platform
+import sys
+import tempfile
+import time
+
+from argparse import ArgumentParser
+from datetime import datetime
+
+from . import common
+
+
+def poll(client, headers, mode, state, n):
+    """Perform a single poll.
+
+    Parameters
+    ----------
+    mode : str
+        Polling strategy (`tail`, `after` or `cursor`)
+    state : dict
+        Position of the previous poll, updated in place
+    n : int
+        Number of lines of a tail request, maximum number of lines of a cursor request
+
+    Returns
+    -------
+    int
+        Number of returned entries
+    """
+    from api import BaseRoute
+    path = BaseRoute+"/system/logs/bench"
+    if mode == "tail":
+        query = {"n": n}
+    elif mode == "after":
+        query = {"after": state["time"]} if "time" in state else {"n": n}
+    else:
+        query = {"cursor": state["cursor"], "n": n} if "cursor" in state else {"n": n}
+    response = client.get(path, query_string=query, headers=headers)
+    if response.status_code != 200:
+        raise RuntimeError("Request failed: {}".format(response.get_data(as_text=True)))
+    data = response.get_json()
+    if data["data"]:
+        state["time"] = data["data"][-1]["time"]
+    state["cursor"] = data["cursor"]
+    return len(data["data"])
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Compare log polling strategies")
+    parser.add_argument("-e", "--entries", type=int, default=100000, help="Number of initial journal entries")
+    parser.add_argument("-a", "--append", type=int, default=20, help="Number of entries appended between polls")
+    parser.add_argument("-t", "--tail", type=int, default=1000, help="Number of lines of tail requests")
+    parser.add_argument("-n", "--iterations", type=int, default=200, help="Number of measured polls per mode")
+    parser.add_argument("-w", "--warmup", type=int, default=5, help="Number of unmeasured polls per mode")
+    parser.add_argument("-o", "--output", help="Write results to file")
+    parser.add_argument("-c", "--compare", help="Compare results with previous run")
+    parser.add_argument("--workdir", help="Directory for runtime files. Defaults to a temporary directory.")
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir
+    if workdir is None:
+        import atexit
+        import shutil
+        workdir = tempfile.mkdtemp(prefix="grommunio-bench-")
+        atexit.register(shutil.rmtree, workdir, True)  # Registered first to run after the final metrics flush
+    common.setup(workdir)
+    from . import fakes
+    fakes.install()
+    seeded = common.seed(1, 1, 1)
+    API = common.loadApp()
+    API.logger.setLevel("ERROR")
+    client = API.test_client()
+    headers = common.login(client)
+
+    from tools.config import Config
+    Config["logs"]["bench"] = {"source": "bench.service"}
+    fakes.FakeJournal.append(args.entries)
+    results = {"meta": {"date": datetime.now().isoformat(timespec="seconds"),
+                        "python": platform.python_version(),
+                        "platform": platform.platform(),
+                        "entries": args.entries,
+                        "append": args.append,
+                        "tail": args.tail,
+                        "iterations": args.iterations,
+                        "seedTime": seeded["seedTime"]},
+               "endpoints": {}}
+    for mode in ("tail", "after", "cursor"):
+        state, latencies, cpu, returned = {}, [], 0, 0
+        for iteration in range(args.warmup+args.iterations):
+            fakes.FakeJournal.append(args.append)
+            start, startCpu = time.perf_counter(), time.process_time()
+            count = poll(client, headers, mode, state, args.tail)
+            if iteration >= args.warmup:
+                latencies.append(time.perf_counter()-start)
+                cpu += time.process_time()-startCpu
+                returned += count
+        result = common.summarize(latencies)
+        result["cpuPerPoll"] = cpu/args.iterations*1000
+        result["entriesPerPoll"] = returned/args.iterations
+        results["endpoints"]["poll ({})".format(mode)] = result
+        print("{:<14} {:>8.1f} entries/poll  cpu {:>8.3f} ms/poll  p50 {:>8.3f} ms  p95 {:>8.3f} ms"
+              .format("poll ({})".format(mode), result["entriesPerPoll"], result["cpuPerPoll"], result["p50"],
+                      result["p95"]), file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    if args.compare:
+        from .api import compare
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
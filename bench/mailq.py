@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: 2026 grommunio GmbH
+
+"""Measure the mail queue snapshot cache.
+
+Replaces `mailq`, `gromox-mailq` and `postqueue` with a stub script emitting a large synthetic queue, in which a number
+of messages is delivered and replaced by new ones every second, and runs the mail queue endpoints with and without the
+snapshot cache (`tools.mailqueue.SnapshotCache`). Also checks that concurrent requests for an expired snapshot are
+coalesced into a single set of subprocess calls.
+
+Usage: python3 -m bench.mailq [-m MESSAGES] [-o results.json]
+"""
+
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+
+from argparse import ArgumentParser
+from datetime import datetime
+
+from . import common
+from .api import run
+
+stub = """import json
+import os
+import sys
+import time
+
+command = os.path.basename(sys.argv[0])
+with open(os.environ["BENCH_MAILQ_CALLS"], "a") as file:
+    file.write(command+"\\n")
+messages, churn = int(os.environ["BENCH_MAILQ_MESSAGES"]), int(os.environ["BENCH_MAILQ_CHURN"])
+start = int(time.time())*churn
+queues = ("active", "deferred", "deferred", "deferred", "hold")
+out = sys.stdout
+for index in range(start, start+messages):
+    ID = "{:010X}".format(index)
+    sender = "sender{}@domain{}.test".format(index % 97, index % 7)
+    recipients = ["rcpt{}@remote{}.test".format(index % 1009+i, index % 13) for i in range(1+index % 3)]
+    if command == "postqueue":
+        reason = "connect to remote{}.test[192.0.2.1]:25: Connection timed out".format(index % 13)
+        out.write(json.dumps({"queue_name": queues[index % len(queues)], "queue_id": ID, "arrival_time": index,
+                              "message_size": 4096+index % 65536, "forced_expire": False, "sender": sender,
+                              "recipients": [{"address": rcpt, "delay_reason": reason} for rcpt in recipients]})+"\\n")
+    elif command == "mailq":
+        out.write("{}  {:>6} Thu Jan  1 00:00:00  {}\\n(connection timed out)\\n{}\\n\\n"
+                  .format(ID, 4096+index % 65536, sender, "\\n".join(recipients)))
+    else:
+        out.write("{} {} -> {}\\n".format(ID, sender, ",".join(recipients)))
+"""
+
+
+def install(workdir, messages, churn):
+    """Install the stub commands in front of the real ones.
+
+    Parameters
+    ----------
+    workdir : str
+        Directory for the stub and its call log
+    messages : int
+        Number of queued messages
+    churn : int
+        Number of messages replaced per second
+
+    Returns
+    -------
+    str
+        Path of the call log, containing one line per call
+    """
+    bindir = os.path.join(workdir, "bin")
+    os.makedirs(bindir, exist_ok=True)
+    path = os.path.join(bindir, "mailq-stub")
+    with open(path, "w") as file:
+        file.write("#!{}\n{}".format(sys.executable, stub))
+    os.chmod(path, 0o755)
+    for command in ("mailq", "gromox-mailq", "postqueue"):
+        os.symlink(path, os.path.join(bindir, command))
+    calls = os.path.join(workdir, "mailq.log")
+    open(calls, "w").close()
+    os.environ.update(PATH=bindir+os.pathsep+os.environ.get("PATH", ""), BENCH_MAILQ_CALLS=calls,
+                      BENCH_MAILQ_MESSAGES=str(messages), BENCH_MAILQ_CHURN=str(churn))
+    return calls
+
+
+def _calls(path):
+    with open(path) as file:
+        return sum(1 for _ in file)
+
+
+def coalesce(cache, calls, threads):
+    """Request an expired snapshot from multiple threads at once.
+
+    Parameters
+    ----------
+    cache : tools.mailqueue.SnapshotCache
+        Snapshot cache
+    calls : str
+        Path of the stub call log
+    threads : int
+        Number of concurrent requests
+
+    Returns
+    -------
+    dict
+        Duration (in milliseconds), number of subprocess calls and distinct snapshots returned
+    """
+    cache.invalidate()
+    barrier = threading.Barrier(threads)
+    snapshots = []
+
+    def request():
+        barrier.wait()
+        snapshots.append(cache.get().ID)
+
+    workers = [threading.Thread(target=request) for _ in range(threads)]
+    before = _calls(calls)
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return {"duration": round((time.perf_counter()-start)*1000, 3), "calls": _calls(calls)-before,
+            "snapshots": len(set(snapshots))}
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Measure the mail queue snapshot cache")
+    parser.add_argument("-m", "--messages", type=int, default=20000, help="Number of queued messages")
+    parser.add_argument("-r", "--churn", type=int, default=100, help="Number of messages replaced per second")
+    parser.add_argument("-t", "--ttl", type=float, default=5, help="Snapshot cache TTL (in seconds)")
+    parser.add_argument("-j", "--threads", type=int, default=8, help="Number of concurrent requests")
+    parser.add_argument("-n", "--iterations", type=int, default=20, help="Number of requests per endpoint")
+    parser.add_argument("-w", "--warmup", type=int, default=2, help="Number of unmeasured requests per endpoint")
+    parser.add_argument("-o", "--output", help="Write results to file")
+    parser.add_argument("-c", "--compare", help="Compare results with previous run")
+    parser.add_argument("--workdir", help="Directory for runtime files. Defaults to a temporary directory.")
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir
+    if workdir is None:
+        import atexit
+        import shutil
+        workdir = tempfile.mkdtemp(prefix="grommunio-bench-")
+        atexit.register(shutil.rmtree, workdir, True)
+    common.setup(workdir)
+    common.seed(1, 1, 3)
+    calls = install(workdir, args.messages, args.churn)
+    API = common.loadApp()
+    API.logger.setLevel("ERROR")
+    client = API.test_client()
+    headers = common.login(client)
+    from api import BaseRoute
+    from tools.mailqueue import Snapshots
+
+    cases = [("queue", BaseRoute+"/system/mailq"),
+             ("entries", BaseRoute+"/system/mailq/entries?limit=50"),
+             ("entries (filtered)", BaseRoute+"/system/mailq/entries?queue=deferred&recipient=rcpt1@&limit=50")]
+
+    results = {"meta": {"date": datetime.now().isoformat(timespec="seconds"),
+                        "python": platform.python_version(),
+                        "platform": platform.platform(),
+                        "messages": args.messages,
+                        "churn": args.churn,
+                        "ttl": args.ttl,
+                        "iterations": args.iterations},
+               "endpoints": {},
+               "coalescing": {}}
+    for mode, ttl in (("uncached", 0), ("cached", args.ttl)):
+        Snapshots.ttl = ttl
+        Snapshots.invalidate()
+        for name, path in cases:
+            name = "{} ({})".format(name, mode)
+            before = _calls(calls)
+            result = run(client, headers, "GET", path, None, args.iterations, args.warmup)
+            result["subprocessCalls"] = round((_calls(calls)-before)/(args.iterations+args.warmup), 3)
+            results["endpoints"][name] = result
+            print("{:<30} {:>8.2f} req/s  p50 {:>9.3f} ms  p95 {:>9.3f} ms  {:>6.3f} calls/request  errors {}"
+                  .format(name, result["throughput"], result["p50"], result["p95"], result["subprocessCalls"],
+                          result["errors"]), file=sys.stderr)
+    Snapshots.ttl = args.ttl
+    since = client.get(BaseRoute+"/system/mailq/entries?limit=0", headers=headers).get_json()["snapshot"]
+    time.sleep(2)  # Let the queue change
+    Snapshots.invalidate()
+    response = client.get(BaseRoute+"/system/mailq/delta?since={}".format(since), headers=headers).get_json()
+    expected = min(args.churn*round((response["snapshot"]-since)/1000), args.messages)
+    result = run(client, headers, "GET", BaseRoute+"/system/mailq/delta?since={}".format(since), None,
+                 args.iterations, args.warmup)
+    result.update(added=len(response["added"]), removed=len(response["removed"]), expected=expected)
+    results["endpoints"]["delta (cached)"] = result
+    print("{:<30} {:>8.2f} req/s  p50 {:>9.3f} ms  p95 {:>9.3f} ms  {} added, {} removed, ~{} expected  errors {}"
+          .format("delta (cached)", result["throughput"], result["p50"], result["p95"], result["added"],
+                  result["removed"], expected, result["errors"]), file=sys.stderr)
+    results["coalescing"] = coalesce(Snapshots, calls, args.threads)
+    print("{:<30} {calls} subprocess calls, {snapshots} snapshot(s) in {duration} ms"
+          .format("{} concurrent requests".format(args.threads), **results["coalescing"]), file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    if args.compare:
+        from .api import compare
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+    return 1 if any(result["errors"] for result in results["endpoints"].values()) or \
+        results["coalescing"]["snapshots"] != 1 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: 2026 grommunio GmbH
+
+"""Replay recorded request traces against an in-process API instance.
+
+Traces are JSON lines files, each line describing one request:
+
+    {"method": "GET", "path": "/domains/{domainID}/users", "query": {"limit": 50}, "at": 0.25}
+
+Supported fields:
+- `path` (required): Request path, relative to the API base route unless it already starts with it
+- `method`: HTTP method, defaults to `GET`
+- `query`, `json`, `form`: Query parameters, JSON body and form data
+- `auth`: Whether to send the request authenticated as system administrator, defaults to true
+- `at`: Offset (in seconds) from the start of the trace, used for pacing if no fixed rate is set
+
+Paths and query values may contain the placeholders `{domainID}`, `{domainname}`, `{userID}` and `{username}`, which
+are replaced by a randomly selected seeded user for each request.
+Lines without a `path` (e.g. other JSON lines content) are ignored.
+
+External services (exmdb, LDAP, redis) are replaced by in-process fakes (see `bench.fakes`).
+
+Usage: python3 -m bench.replay [trace.jsonl] [-c CONCURRENCY] [-r RATE] [-o results.json]
+"""
+
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from argparse import ArgumentParser
+from datetime import datetime
+
+from . import common
+
+# Synthetic workload used with --generate, as (weight, trace entry)
+mix = ((5, {"method": "POST", "path": "/login", "form": {"user": "admin", "pass": common.adminPass}, "auth": False}),
+       (25, {"path": "/domains/{domainID}/users", "query": {"limit": 50}}),
+       (5, {"path": "/domains/{domainID}/users", "query": {"limit": 50, "properties": "displayname,storagequotalimit"}}),
+       (20, {"path": "/domains/{domainID}/users/{userID}"}),
+       (10, {"path": "/domains/{domainID}/users/{userID}/storeProps", "query": {"properties": "messagesizeextended"}}),
+       (15, {"path": "/service/syncPolicy/{username}"}),
+       (5, {"path": "/domains/{domainID}/folders"}),
+       (5, {"path": "/system/domains/{domainID}"}),
+       (5, {"path": "/system/dashboard"}),
+       (5, {"path": "/system/sync/top"}))
+
+
+def load(path):
+    """Load replayable entries from a trace file.
+
+    Parameters
+    ----------
+    path : str
+        Path to the JSON lines file
+
+    Returns
+    -------
+    entries : list of dict
+        Request descriptions
+    skipped : int
+        Number of lines that do not describe a request
+    """
+    entries, skipped = [], 0
+    with open(path) as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                skipped += 1
+                continue
+            if isinstance(entry, dict) and isinstance(entry.get("path"), str):
+                entries.append(entry)
+            else:
+                skipped += 1
+    return entries, skipped
+
+
+def generate(count, seed=None):
+    """Generate synthetic trace from the default workload mix.
+
+    Parameters
+    ----------
+    count : int
+        Number of requests
+    seed : int, optional
+        Random seed. The default is None.
+
+    Returns
+    -------
+    list of dict
+        Request descriptions
+    """
+    rand = random.Random(seed)
+    return [dict(entry) for entry in rand.choices([entry for _, entry in mix], [weight for weight, _ in mix], k=count)]
+
+
+class Replayer:
+    """Concurrent trace replay.
+
+    Each worker thread uses its own test client. Requests are distributed in trace order and paced either at a fixed
+    rate or according to the `at` offsets of the trace.
+    """
+
+    def __init__(self, API, users, concurrency=4, rate=None, speed=1, seed=None):
+        """Initialize replayer.
+
+        Parameters
+        ----------
+        API : flask.Flask
+            API application
+        users : list of tuple
+            (ID, domainID, username) tuples to fill path placeholders with
+        concurrency : int, optional
+            Number of worker threads. The default is 4.
+        rate : float, optional
+            Target request rate (per second) or None to use trace timing. The default is None.
+        speed : float, optional
+            Factor applied to the trace timing. The default is 1.
+        seed : int, optional
+            Random seed for placeholder selection. The default is None.
+        """
+        from api import BaseRoute
+        self.API = API
+        self.base = BaseRoute
+        self.users = users
+        self.concurrency = max(1, concurrency)
+        self.rate = rate
+        self.speed = speed
+        self.random = random.Random(seed)
+        self._adapter = API.url_map.bind("localhost")
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def _route(self, method, path):
+        key = (method, path)
+        if key not in self._routes:
+            try:
+                rule, _ = self._adapter.match(path, method, return_rule=True)
+                self._routes[key] = method+" "+rule.rule
+            except Exception:
+                self._routes[key] = method+" <unmatched>"
+        return self._routes[key]
+
+    def _prepare(self, entry):
+        ID, domainID, username = self.random.choice(self.users)
+        values = {"userID": ID, "domainID": domainID, "username": username, "domainname": username.split("@", 1)[1]}
+        fill = (lambda value: value.format_map(values) if isinstance(value, str) else value)
+        path = fill(entry["path"])
+        path = path if path.startswith(self.base) else self.base+path
+        method = entry.get("method", "GET").upper()
+        return {"method": method, "path": path, "route": self._route(method, path),
+                "query_string": {key: fill(value) for key, value in entry.get("query", {}).items()},
+                "json": entry.get("json"), "data": entry.get("form"), "auth": entry.get("auth", True)}
+
+    def _schedule(self, index, entry):
+        if self.rate:
+            return index/self.rate
+        return entry.get("at", 0)/self.speed if self.speed else 0
+
+    def _worker(self, queue, start, results):
+        client = self.API.test_client()
+        headers = common.login(client)
+        anonymous = self.API.test_client()
+        while True:
+            with self._lock:
+                if not queue:
+                    return
+                index, entry = queue.pop()
+                request = self._prepare(entry)
+            delay = start+self._schedule(index, entry)-time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            lag = max(0, -delay)
+            kwargs = {"method": request["method"], "query_string": request["query_string"]}
+            if request["json"] is not None:
+                kwargs["json"] = request["json"]
+            elif request["data"] is not None:
+                kwargs["data"] = request["data"]
+            reqStart = time.perf_counter()
+            try:
+                if request["auth"]:
+                    status = client.open(request["path"], headers=headers, **kwargs).status_code
+                else:
+                    status = anonymous.open(request["path"], **kwargs).status_code
+            except Exception:
+                status = None
+            latency = time.perf_counter()-reqStart
+            with self._lock:
+                results.append((request["route"], status, latency, lag))
+
+    def run(self, entries):
+        """Replay trace.
+
+        Parameters
+        ----------
+        entries : list of dict
+            Request descriptions
+
+        Returns
+        -------
+        dict
+            Overall and per route summaries (see `common.summarize`) with additional status counts and pacing lag
+        """
+        queue = list(reversed(list(enumerate(entries))))
+        results = []
+        start = time.perf_counter()+0.5  # Leave time for the workers to log in
+        workers = [threading.Thread(target=self._worker, args=(queue, start, results), name="replay-{}".format(i))
+                   for i in range(self.concurrency)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        duration = time.perf_counter()-start
+        routes = {}
+        for route, status, latency, lag in results:
+            routes.setdefault(route, []).append((status, latency, lag))
+        summary = {"total": self._summarize([result[1:] for result in results], duration),
+                   "endpoints": {route: self._summarize(values, duration) for route, values in sorted(routes.items())}}
+        return summary
+
+    @staticmethod
+    def _summarize(values, duration):
+        errors = sum(status is None or status >= 400 for status, _, _ in values)
+        result = common.summarize([latency for _, latency, _ in values], errors, duration)
+        status = {}
+        for code, _, _ in values:
+            status[str(code)] = status.get(str(code), 0)+1
+        result["status"] = dict(sorted(status.items()))
+        result["maxLag"] = round(max((lag for _, _, lag in values), default=0)*1000, 3)
+        return result
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Replay request traces against an in-process API instance")
+    parser.add_argument("trace", nargs="?", default=os.path.join(common.rootDir, "requests.jsonl"),
+                        help="JSON lines trace file. Defaults to requests.jsonl in the repository root.")
+    parser.add_argument("-g", "--generate", type=int, metavar="N", help="Replay N requests of a synthetic workload mix "
+                        "instead of reading a trace file")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="Number of concurrent clients")
+    parser.add_argument("-r", "--rate", type=float, help="Target request rate (per second). If omitted, the trace "
+                        "timing is used, or requests are sent as fast as possible if the trace has no timing.")
+    parser.add_argument("--speed", type=float, default=1, help="Speed up factor for the trace timing")
+    parser.add_argument("--repeat", type=int, default=1, help="Replay the trace multiple times")
+    parser.add_argument("-l", "--latency", type=float, default=0, help="Simulated latency (in milliseconds) of "
+                        "external services")
+    parser.add_argument("-d", "--domains", type=int, default=10, help="Number of domains to create")
+    parser.add_argument("-u", "--users", type=int, default=100, help="Number of users per domain")
+    parser.add_argument("-p", "--properties", type=int, default=10, help="Number of properties per user")
+    parser.add_argument("-s", "--seed", type=int, help="Random seed")
+    parser.add_argument("-o", "--output", help="Write results to file")
+    parser.add_argument("--compare", help="Compare results with previous run")
+    parser.add_argument("--save", help="Save the replayed trace to file")
+    parser.add_argument("--workdir", help="Directory for runtime files. Defaults to a temporary directory.")
+    args = parser.parse_args(argv)
+
+    if args.generate:
+        entries, skipped, source = generate(args.generate, seed=args.seed), 0, "generated"
+    else:
+        entries, skipped = load(args.trace)
+        source = os.path.abspath(args.trace)
+    if not entries:
+        print("No replayable requests found in '{}' ({} lines skipped). Use --generate to create a synthetic workload."
+              .format(args.trace, skipped), file=sys.stderr)
+        return 1
+    entries = entries*max(1, args.repeat)
+    if args.save:
+        with open(args.save, "w") as file:
+            file.writelines(json.dumps(entry)+"\n" for entry in entries)
+
+    workdir = args.workdir
+    if workdir is None:
+        import atexit
+        import shutil
+        workdir = tempfile.mkdtemp(prefix="grommunio-replay-")
+        atexit.register(shutil.rmtree, workdir, True)  # Registered first to run after the final metrics flush
+    common.setup(workdir)
+    from . import fakes
+    fakes.install(args.latency/1000)
+    seeded = common.seed(args.domains, args.users, args.properties)
+    API = common.loadApp()
+    API.logger.setLevel("ERROR")
+
+    replayer = Replayer(API, seeded["users"], args.concurrency, args.rate, args.speed, args.seed)
+    results = replayer.run(entries)
+    results["meta"] = {"date": datetime.now().isoformat(timespec="seconds"),
+                       "python": platform.python_version(),
+                       "platform": platform.platform(),
+                       "trace": source,
+                       "requests": len(entries),
+                       "skipped": skipped,
+                       "concurrency": args.concurrency,
+                       "rate": args.rate,
+                       "latency": args.latency,
+                       "domains": args.domains,
+                       "users": args.users,
+                       "properties": args.properties}
+    for name, result in [("total", results["total"])]+list(results["endpoints"].items()):
+        print("{:<64} {:>6} req  p50 {:>8.3f} ms  p95 {:>8.3f} ms  p99 {:>8.3f} ms  errors {:>6.2%}"
+              .format(name, result["requests"], result["p50"], result["p95"], result["p99"], result["errorRate"]),
+              file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    if args.compare:
+        from .api import compare
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: 2026 grommunio GmbH
+
+"""Compare search engines for user and domain list matching.
+
+Seeds a large number of users and domains and measures `match` requests on the user and domain list endpoints using
+the default substring matching (`like`) and the trigram index (`index`).
+
+Usage: python3 -m bench.search [-u USERS] [-d DOMAINS] [-o results.json]
+"""
+
+import json
+import platform
+import sys
+import tempfile
+import time
+
+from argparse import ArgumentParser
+from datetime import datetime
+
+from . import common
+from .api import run
+
+# Search terms as (name, expression). Placeholders are filled with the number of seeded users.
+terms = (("exact", "user{last}@domain1.test"),
+         ("selective", "user{mid}@"),
+         ("prefix", "user{prefix}"),
+         ("no match", "nonexistent"),
+         ("unspecific", "domain1"))
+
+# Domain search terms. Placeholders are filled with the number of seeded domains.
+domainTerms = (("domain exact", "bench{last}.test"),
+               ("domain selective", "bench{mid}."),
+               ("domain unspecific", "bench"))
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Compare search engines for user and domain list matching")
+    parser.add_argument("-u", "--users", type=int, default=100000, help="Number of users to create")
+    parser.add_argument("-d", "--domains", type=int, default=10000, help="Number of additional domains to create")
+    parser.add_argument("-n", "--iterations", type=int, default=50, help="Number of requests per search term")
+    parser.add_argument("-w", "--warmup", type=int, default=3, help="Number of unmeasured requests per search term")
+    parser.add_argument("-l", "--limit", type=int, default=50, help="Page size")
+    parser.add_argument("-o", "--output", help="Write results to file")
+    parser.add_argument("-c", "--compare", help="Compare results with previous run")
+    parser.add_argument("--workdir", help="Directory for runtime files. Defaults to a temporary directory.")
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir
+    if workdir is None:
+        import atexit
+        import shutil
+        workdir = tempfile.mkdtemp(prefix="grommunio-bench-")
+        atexit.register(shutil.rmtree, workdir, True)  # Registered first to run after the final metrics flush
+    common.setup(workdir)
+    import os
+    from tools.config import Config
+    search = Config["options"]["search"]
+    search["indexPath"] = os.path.join(workdir, "search.sqlite3")
+    seeded = common.seed(1, args.users, 3)
+    from datetime import date
+    from orm import DB
+    from orm.domains import Domains
+    with DB.engine.begin() as conn:
+        conn.execute(Domains.__table__.insert(), [dict(id=2+index, org_id=0, domainname="bench{}.test".format(index),
+                                                       homedir="", max_user=0, title="", end_day=date(3333, 3, 3))
+                                                  for index in range(args.domains)])
+    API = common.loadApp()
+    API.logger.setLevel("ERROR")
+    client = API.test_client()
+    headers = common.login(client)
+
+    from tools.search import SearchIndex
+    start = time.perf_counter()
+    with SearchIndex() as index:
+        index.rebuild("users")
+        index.rebuild("domains")
+    buildTime = time.perf_counter()-start
+    print("Indexed {} users and {} domains in {:.2f}s".format(args.users, args.domains+1, buildTime), file=sys.stderr)
+
+    from api import BaseRoute
+    values = {"last": args.users-1, "mid": args.users//2, "prefix": str(args.users//3)[:3]}
+    domainValues = {"last": args.domains-1, "mid": args.domains//2}
+    cases = [(name, BaseRoute+"/domains/1/users?limit={}&match={}".format(args.limit, term.format(**values)))
+             for name, term in terms]
+    cases += [(name, BaseRoute+"/system/domains?limit={}&match={}".format(args.limit, term.format(**domainValues)))
+              for name, term in domainTerms]
+    results = {"meta": {"date": datetime.now().isoformat(timespec="seconds"),
+                        "python": platform.python_version(),
+                        "platform": platform.platform(),
+                        "users": args.users,
+                        "domains": args.domains,
+                        "iterations": args.iterations,
+                        "limit": args.limit,
+                        "candidates": search["candidates"],
+                        "seedTime": seeded["seedTime"],
+                        "indexTime": round(buildTime, 3)},
+               "endpoints": {}}
+    for engine in ("like", "index"):
+        search["engine"] = engine
+        for name, path in cases:
+            result = run(client, headers, "GET", path, None, args.iterations, args.warmup)
+            result["count"] = client.get(path, headers=headers).get_json().get("count")
+            results["endpoints"]["{} ({})".format(name, engine)] = result
+            print("{:<24} {:>8} {:>8.2f} req/s  p50 {:>9.3f} ms  p95 {:>9.3f} ms  matches {}"
+                  .format(name, engine, result["throughput"], result["p50"], result["p95"], result["count"]),
+                  file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    if args.compare:
+        from .api import compare
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: 2026 grommunio GmbH
+
+"""Compare compiled and interpreted DataModel serialization.
+
+Measures `todict` on loaded Users, Domains and MLists objects directly and through the corresponding list endpoints,
+once with the compiled serializers and once with the previous, interpreted implementation.
+
+Usage: python3 -m bench.serialize [-u USERS] [-o results.json]
+"""
+
+import json
+import platform
+import sys
+import tempfile
+import time
+
+from argparse import ArgumentParser
+from datetime import datetime
+
+from . import common
+from .api import run
+
+
+def interpreted(self, spec, exclude=set()):
+    """Reference implementation walking the props on every call."""
+    self._init()
+    if isinstance(spec, int):
+        propsel = lambda prop: "hidden" not in prop.flags and prop.attr not in exclude and prop.proxy is None
+    else:
+        sspec = set(spec)
+        propsel = lambda prop: prop.attr in sspec and prop.attr not in exclude and prop.proxy is None
+        spec = None
+    return {prop.key: prop.value(self) for prop in self._meta.props(spec, propsel)}
+
+
+def measure(objects, level, iterations):
+    """Measure serialization of a list of objects.
+
+    Parameters
+    ----------
+    objects : list
+        DataModel objects
+    level : int
+        Verbosity level
+    iterations : int
+        Number of repetitions
+
+    Returns
+    -------
+    dict
+        Timing summary (see `common.summarize`)
+    """
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        for obj in objects:
+            obj.todict(level)
+        latencies.append(time.perf_counter()-start)
+    return common.summarize(latencies)
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Compare compiled and interpreted DataModel serialization")
+    parser.add_argument("-d", "--domains", type=int, default=50, help="Number of domains to create")
+    parser.add_argument("-u", "--users", type=int, default=1000, help="Number of users per domain")
+    parser.add_argument("-m", "--mlists", type=int, default=1000, help="Number of mailing lists per domain")
+    parser.add_argument("-n", "--iterations", type=int, default=20, help="Number of measured repetitions")
+    parser.add_argument("-w", "--warmup", type=int, default=2, help="Number of unmeasured repetitions")
+    parser.add_argument("-l", "--limit", type=int, default=1000, help="Page size of list requests")
+    parser.add_argument("-o", "--output", help="Write results to file")
+    parser.add_argument("-c", "--compare", help="Compare results with previous run")
+    parser.add_argument("--workdir", help="Directory for runtime files. Defaults to a temporary directory.")
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir
+    if workdir is None:
+        import atexit
+        import shutil
+        workdir = tempfile.mkdtemp(prefix="grommunio-bench-")
+        atexit.register(shutil.rmtree, workdir, True)  # Registered first to run after the final metrics flush
+    common.setup(workdir)
+    seeded = common.seed(args.domains, args.users, 3, args.mlists)
+    API = common.loadApp()
+    API.logger.setLevel("ERROR")
+    client = API.test_client()
+    headers = common.login(client)
+
+    from api import BaseRoute
+    from orm import DB
+    from orm.domains import Domains
+    from orm.mlists import MLists
+    from orm.users import Users
+    from tools.DataModel import DataModel
+    compiled = DataModel.todict
+    models = (("users", Users, Users.domainID == 1), ("domains", Domains, True), ("mlists", MLists, MLists.domainID == 1))
+    lists = (("user list", BaseRoute+"/domains/1/users?limit={}".format(args.limit)),
+             ("domain list", BaseRoute+"/system/domains?limit={}".format(args.limit)),
+             ("mlist list", BaseRoute+"/domains/1/mlists?limit={}".format(args.limit)))
+    results = {"meta": {"date": datetime.now().isoformat(timespec="seconds"),
+                        "python": platform.python_version(),
+                        "platform": platform.platform(),
+                        "domains": args.domains,
+                        "users": args.users,
+                        "mlists": args.mlists,
+                        "iterations": args.iterations,
+                        "limit": args.limit,
+                        "seedTime": seeded["seedTime"]},
+               "endpoints": {}}
+    for name, Model, condition in models:
+        for level in (0, 1, 2):
+            objects = Model.optimized_query(level).filter(condition).limit(args.limit).all()
+            for spec in (level, [prop.attr for prop in Model._meta.props(level)][::2]):  # Level and attribute selection
+                if any(compiled(obj, spec) != interpreted(obj, spec) for obj in objects):
+                    print("Serialization mismatch for {} {}".format(name, spec), file=sys.stderr)
+                    return 1
+            for mode, todict in (("interpreted", interpreted), ("compiled", compiled)):
+                DataModel.todict = todict
+                measure(objects, level, args.warmup)
+                result = measure(objects, level, args.iterations)
+                result["objects"] = len(objects)
+                results["endpoints"]["{} level {} ({})".format(name, level, mode)] = result
+                print("{:<32} {:>8} objects  p50 {:>9.3f} ms  p95 {:>9.3f} ms"
+                      .format("{} level {} ({})".format(name, level, mode), len(objects), result["p50"], result["p95"]),
+                      file=sys.stderr)
+            DB.session.remove()
+    for mode, todict in (("interpreted", interpreted), ("compiled", compiled)):
+        DataModel.todict = todict
+        for name, path in lists:
+            result = run(client, headers, "GET", path, None, args.iterations, args.warmup)
+            results["endpoints"]["{} ({})".format(name, mode)] = result
+            print("{:<32} {:>8.2f} req/s  p50 {:>9.3f} ms  p95 {:>9.3f} ms  errors {}"
+                  .format("{} ({})".format(name, mode), result["throughput"], result["p50"], result["p95"],
+                          result["errors"]),
+                  file=sys.stderr)
+    DataModel.todict = compiled
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    if args.compare:
+        from .api import compare
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
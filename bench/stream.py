@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: 2026 grommunio GmbH
+
+"""Compare streamed and buffered list responses.
+
+Requests complete user lists (empty `limit`) and measures time to first byte, total time and
+peak RSS growth of the process. Each mode is measured in a separate process working on the same database, so that
+memory retained by one run does not affect the other.
+
+Peak RSS is taken from the `VmHWM` value after resetting it through `/proc/self/clear_refs` (Linux only).
+
+Before measuring, the streamed response is checked against the buffered one with queries issued while streaming (see
+`verify`).
+
+Usage: python3 -m bench.stream [-u USERS] [-o results.json]
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from argparse import ArgumentParser, SUPPRESS
+from datetime import datetime
+
+from . import common
+
+modes = ("buffered", "streamed")
+
+
+def _status(field):
+    """Get memory value (in KiB) from /proc/self/status."""
+    with open("/proc/self/status") as file:
+        for line in file:
+            if line.startswith(field+":"):
+                return int(line.split()[1])
+
+
+def _resetPeak():
+    """Reset peak RSS to the current RSS."""
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def measure(args):
+    """Measure a single mode. Runs in a child process.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Command line arguments
+
+    Returns
+    -------
+    dict
+        Timing summaries (see `common.summarize`) for `ttfb` and `total`, peak RSS growth in KiB and number of elements
+    """
+    import gc
+    common.setup(args.workdir, create=False)
+    API = common.loadApp()
+    API.logger.setLevel("ERROR")
+    client = API.test_client()
+    headers = common.login(client)
+    from api import BaseRoute
+    path = BaseRoute+"/system/users?limit=&level={}&stream={}".format(args.level, str(args.mode == "streamed").lower())
+    ttfb, total, growth, count = [], [], 0, None
+    for iteration in range(args.warmup+args.iterations):
+        gc.collect()
+        resetOk = _resetPeak()
+        rss = _status("VmRSS")
+        start = time.perf_counter()
+        response = client.get(path, headers=headers, buffered=False)
+        chunks = iter(response.response)
+        body = [next(chunks, b"")]
+        first = time.perf_counter()
+        body.extend(chunks)
+        end = time.perf_counter()
+        response.close()
+        if iteration < args.warmup:
+            continue
+        ttfb.append(first-start)
+        total.append(end-start)
+        if resetOk:
+            growth = max(growth, _status("VmHWM")-rss)
+        data = json.loads(b"".join(chunk if isinstance(chunk, bytes) else chunk.encode() for chunk in body))
+        if "data" not in data:
+            raise RuntimeError("Request failed: {}".format(data))
+        count = len(data["data"])
+        del body, data
+    return {"ttfb": common.summarize(ttfb), "total": common.summarize(total),
+            "peakRss": growth if resetOk else None, "elements": count}
+
+
+def verify(batchSize=100):
+    """Check streamed list responses with further queries issued while streaming.
+
+    Requests the system user list with properties at level 2 (eager loading references and loading properties for each
+    batch) streamed and buffered, and checks that both responses are equal and that no other statement is executed on
+    the connection of the server-side cursor, as MySQL does not allow this.
+
+    Parameters
+    ----------
+    batchSize : int, optional
+        Streaming batch size to use. The default is 100.
+
+    Returns
+    -------
+    str
+        Error message or None if the check passed
+    """
+    from sqlalchemy import event
+    from api import BaseRoute
+    from orm import DB
+    from tools.config import Config
+    API = common.loadApp()
+    API.logger.setLevel("ERROR")
+    client = API.test_client()
+    headers = common.login(client)
+    statements = {}
+
+    def track(conn, cursor, statement, parameters, context, executemany):
+        if statement != "BEGIN":
+            streamed = bool(context is not None and context.execution_options.get("stream_results"))
+            statements.setdefault(id(conn.connection.dbapi_connection), []).append(streamed)
+    Config["options"]["streaming"]["batchSize"], previous = batchSize, Config["options"]["streaming"]["batchSize"]
+    event.listen(DB.engine, "before_cursor_execute", track)
+    try:
+        path = BaseRoute+"/system/users?limit=&level=2&properties=displayname,storagequotalimit&stream="
+        streamed = client.get(path+"true", headers=headers)
+        data = json.loads(streamed.get_data())
+        buffered = client.get(path+"false", headers=headers).get_json()
+    finally:
+        event.remove(DB.engine, "before_cursor_execute", track)
+        Config["options"]["streaming"]["batchSize"] = previous
+    if data != buffered:
+        return "Streamed and buffered responses differ"
+    if len(data["data"]) <= batchSize:
+        return "Not enough users to test batches (need more than {})".format(batchSize)
+    cursors = [executed for executed in statements.values() if any(executed)]
+    if not cursors:
+        return "No server-side cursor used"
+    if any(not all(executed) for executed in cursors):
+        return "Statements executed on the connection of an open server-side cursor"
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Compare streamed and buffered list responses")
+    parser.add_argument("-d", "--domains", type=int, default=10, help="Number of domains to create")
+    parser.add_argument("-u", "--users", type=int, default=10000, help="Number of users per domain")
+    parser.add_argument("-n", "--iterations", type=int, default=5, help="Number of measured requests per mode")
+    parser.add_argument("-w", "--warmup", type=int, default=1, help="Number of unmeasured requests per mode")
+    parser.add_argument("-l", "--level", type=int, default=1, help="Detail level of the requested list")
+    parser.add_argument("-o", "--output", help="Write results to file")
+    parser.add_argument("-c", "--compare", help="Compare results with previous run")
+    parser.add_argument("--workdir", help="Directory for runtime files. Defaults to a temporary directory.")
+    parser.add_argument("--mode", choices=modes, help=SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.mode:
+        print(json.dumps(measure(args)))
+        return 0
+
+    if args.workdir is None:
+        import atexit
+        import shutil
+        args.workdir = tempfile.mkdtemp(prefix="grommunio-bench-")
+        atexit.register(shutil.rmtree, args.workdir, True)
+    common.setup(args.workdir)
+    seeded = common.seed(args.domains, args.users, 3)
+    print("Seeded {} users in {:.2f}s".format(len(seeded["users"]), seeded["seedTime"]), file=sys.stderr)
+    error = verify()
+    if error:
+        print("Verification failed: "+error, file=sys.stderr)
+        return 1
+    results = {"meta": {"date": datetime.now().isoformat(timespec="seconds"),
+                        "python": platform.python_version(),
+                        "platform": platform.platform(),
+                        "domains": args.domains,
+                        "users": args.users,
+                        "level": args.level,
+                        "iterations": args.iterations},
+               "endpoints": {},
+               "memory": {}}
+    for mode in modes:
+        command = [sys.executable, "-m", "bench.stream", "--mode", mode, "--workdir", args.workdir,
+                   "-n", str(args.iterations), "-w", str(args.warmup), "-l", str(args.level)]
+        child = subprocess.run(command, cwd=common.rootDir, stdout=subprocess.PIPE, env=os.environ)
+        if child.returncode != 0:
+            print("Measurement of {} mode failed".format(mode), file=sys.stderr)
+            return 1
+        result = json.loads(child.stdout.decode().strip().splitlines()[-1])
+        for metric in ("ttfb", "total"):
+            results["endpoints"]["{} ({})".format(metric, mode)] = result[metric]
+        results["memory"][mode] = {"peakRss": result["peakRss"], "elements": result["elements"]}
+        print("{:<10} {:>8} elements  ttfb p50 {:>9.3f} ms  total p50 {:>9.3f} ms  peak RSS +{} KiB"
+              .format(mode, result["elements"], result["ttfb"]["p50"], result["total"]["p50"],
+                      "?" if result["peakRss"] is None else result["peakRss"]),
+              file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    if args.compare:
+        from .api import compare
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
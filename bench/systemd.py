@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: 2026 grommunio GmbH
+
+"""Measure the systemd unit state cache.
+
+Replaces `systemctl` with a stub script reporting synthetic units, one of which changes its state periodically, and
+runs the dashboard service endpoints without cache, with cache and with the background watcher
+(`options.systemdWatch`). Reports latency, `systemctl` calls per request and the number of state transitions recorded
+while no requests are made.
+
+Usage: python3 -m bench.systemd [-s SERVICES] [-t TTL] [-o results.json]
+"""
+
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from argparse import ArgumentParser
+from datetime import datetime
+
+from . import common
+from .api import run
+
+stub = """import os
+import sys
+import time
+
+with open(os.environ["BENCH_SYSTEMCTL_CALLS"], "a") as file:
+    file.write(" ".join(sys.argv[1:])+"\\n")
+time.sleep(float(os.environ.get("BENCH_SYSTEMCTL_LATENCY", 0)))
+if "show" not in sys.argv:
+    sys.exit(0)
+flap = int(time.time()/float(os.environ["BENCH_SYSTEMCTL_FLAP"])) % 2
+now = int(time.clock_gettime(time.CLOCK_MONOTONIC)*1000000)
+units = [arg for arg in sys.argv[sys.argv.index("show")+1:] if not arg.startswith("-")]
+print("\\n\\n".join("\\n".join(("Names={} alias-{}".format(unit, unit),
+                              "Description=Benchmark unit {}".format(index),
+                              "ActiveState=" + ("failed" if index == 0 and flap else "active"),
+                              "SubState=" + ("failed" if index == 0 and flap else "running"),
+                              "UnitFileState=enabled",
+                              "ActiveEnterTimestampMonotonic={}".format(now-60000000),
+                              "InactiveEnterTimestampMonotonic=0"))
+                    for index, unit in enumerate(units)))
+"""
+
+
+def install(workdir, latency, flap):
+    """Install the stub `systemctl` in front of the real one.
+
+    Parameters
+    ----------
+    workdir : str
+        Directory for the stub and its call log
+    latency : float
+        Additional delay (in seconds) of each call
+    flap : float
+        Time (in seconds) after which the first unit changes its state
+
+    Returns
+    -------
+    str
+        Path of the call log, containing one line per call
+    """
+    bindir = os.path.join(workdir, "bin")
+    os.makedirs(bindir, exist_ok=True)
+    path = os.path.join(bindir, "systemctl")
+    with open(path, "w") as file:
+        file.write("#!{}\n{}".format(sys.executable, stub))
+    os.chmod(path, 0o755)
+    calls = os.path.join(workdir, "systemctl.log")
+    open(calls, "w").close()
+    os.environ.update(PATH=bindir+os.pathsep+os.environ.get("PATH", ""), BENCH_SYSTEMCTL_CALLS=calls,
+                      BENCH_SYSTEMCTL_LATENCY=str(latency), BENCH_SYSTEMCTL_FLAP=str(flap))
+    return calls
+
+
+def _calls(path):
+    with open(path) as file:
+        return sum(1 for _ in file)
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Measure the systemd unit state cache")
+    parser.add_argument("-s", "--services", type=int, default=20, help="Number of dashboard services")
+    parser.add_argument("-t", "--ttl", type=float, default=1, help="Cache TTL (in seconds)")
+    parser.add_argument("-f", "--flap", type=float, default=2, help="Time (in seconds) between state changes")
+    parser.add_argument("-l", "--latency", type=float, default=0, help="Additional delay of each systemctl call (ms)")
+    parser.add_argument("-i", "--idle", type=float, default=10, help="Time (in seconds) without requests per mode")
+    parser.add_argument("-n", "--iterations", type=int, default=200, help="Number of requests per endpoint")
+    parser.add_argument("-w", "--warmup", type=int, default=5, help="Number of unmeasured requests per endpoint")
+    parser.add_argument("-o", "--output", help="Write results to file")
+    parser.add_argument("-c", "--compare", help="Compare results with previous run")
+    parser.add_argument("--workdir", help="Directory for runtime files. Defaults to a temporary directory.")
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir
+    if workdir is None:
+        import atexit
+        import shutil
+        workdir = tempfile.mkdtemp(prefix="grommunio-bench-")
+        atexit.register(shutil.rmtree, workdir, True)
+    common.setup(workdir)
+    common.seed(1, 1, 3)
+    calls = install(workdir, args.latency/1000, args.flap)
+    from tools.config import Config
+    units = ["bench{}.service".format(index) for index in range(args.services)]
+    Config["options"]["dashboard"]["services"] = [{"unit": unit} for unit in units]
+    API = common.loadApp()
+    API.logger.setLevel("ERROR")
+    client = API.test_client()
+    headers = common.login(client)
+    from api import BaseRoute
+    from services import Service
+    with Service("systemd") as sysd:
+        pass
+    cases = [("services", BaseRoute+"/system/dashboard/services"),
+             ("service", [BaseRoute+"/system/dashboard/services/"+unit for unit in units]),
+             ("transitions", BaseRoute+"/system/dashboard/transitions")]
+
+    results = {"meta": {"date": datetime.now().isoformat(timespec="seconds"),
+                        "python": platform.python_version(),
+                        "platform": platform.platform(),
+                        "services": args.services,
+                        "ttl": args.ttl,
+                        "flap": args.flap,
+                        "latency": args.latency,
+                        "idle": args.idle,
+                        "iterations": args.iterations},
+               "endpoints": {},
+               "idleTransitions": {}}
+    for mode, ttl, watch in (("uncached", 0, False), ("cached", args.ttl, False), ("watched", args.ttl, True)):
+        sysd.cacheTTL, sysd.watch = ttl, watch
+        sysd.invalidate()
+        for name, path in cases:
+            name = "{} ({})".format(name, mode)
+            before = _calls(calls)
+            result = run(client, headers, "GET", path, None, args.iterations, args.warmup)
+            result["systemctlCalls"] = round((_calls(calls)-before)/(args.iterations+args.warmup), 3)
+            results["endpoints"][name] = result
+            print("{:<26} {:>8.2f} req/s  p50 {:>8.3f} ms  p95 {:>8.3f} ms  {:>6.3f} calls/request  errors {}"
+                  .format(name, result["throughput"], result["p50"], result["p95"], result["systemctlCalls"],
+                          result["errors"]), file=sys.stderr)
+        sysd.transitions.clear()
+        time.sleep(args.idle)
+        transitions = client.get(BaseRoute+"/system/dashboard/transitions", headers=headers).get_json()["data"]
+        results["idleTransitions"][mode] = len(transitions)
+        print("{:<26} {} of {} state changes recorded while idle".format(mode, len(transitions),
+                                                                        int(args.idle/args.flap)), file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    if args.compare:
+        from .api import compare
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+    return 1 if any(result["errors"] for result in results["endpoints"].values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: 2026 grommunio GmbH
+
+"""Measure API latency during a background LDAP synchronization.
+
+Links all seeded users to a fake directory (see `fakes._fakeDirectory`) and sends user detail requests while an
+`ldapSync` task updates every user, once without background task and once for each TasQ backend (`tasq.backend`).
+Each mode runs in a separate process working on the same database.
+
+Usage: python3 -m bench.tasq [-u USERS] [-o results.json]
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from argparse import ArgumentParser, SUPPRESS
+from datetime import datetime
+
+from . import common, fakes
+
+modes = ("idle", "thread", "process")
+
+
+def measure(args):
+    """Measure a single mode. Runs in a child process.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Command line arguments
+
+    Returns
+    -------
+    dict
+        Latency summary (see `common.summarize`), synchronization duration and final task message
+    """
+    from tools.config import Config
+    common.setup(args.workdir, create=False)
+    Config["tasq"].update(disabled=False, backend=args.mode, workers=1)
+    directory = fakes.install(directory=True)
+    directory.generation = args.generation
+    API = common.loadApp()
+    API.logger.setLevel("ERROR")
+    client = API.test_client()
+    headers = common.login(client)
+    from api import BaseRoute
+    from orm import DB
+    from orm.misc import TasQ
+    from orm.users import Users
+    from tools.tasq import Task, TasQServer
+    paths = [BaseRoute+"/domains/{}/users/{}".format(domainID, ID)
+             for ID, domainID in Users.query.filter(Users.ID != 0).with_entities(Users.ID, Users.domainID)]
+    DB.session.remove()
+    for i in range(args.warmup):
+        client.get(paths[i % len(paths)], headers=headers)
+    done = threading.Event()
+    if args.mode == "idle":
+        task = None
+        threading.Timer(args.duration, done.set).start()
+    else:
+        TasQServer.start()
+        # Progress updates are written by the clerk thread, which SQLite does not allow during the sync transaction
+        task = TasQServer.create("ldapSync", {"domainID": 1, "batchSize": args.batch_size, "updateInterval": 3600})
+        threading.Thread(target=lambda: (TasQServer.wait(task.ID), done.set()), daemon=True).start()
+    latencies, errors, i = [], 0, 0
+    start = time.perf_counter()
+    while not done.is_set():
+        reqStart = time.perf_counter()
+        response = client.get(paths[i % len(paths)], headers=headers)
+        latencies.append(time.perf_counter()-reqStart)
+        errors += response.status_code >= 400
+        i += 1
+    duration = time.perf_counter()-start
+    message = None
+    if task is not None:
+        TasQServer.stop()
+        DB.session.remove()
+        dbtask = TasQ.query.filter(TasQ.ID == task.ID).first()
+        message = dbtask.message if dbtask.state == Task.COMPLETED else "Failed: "+dbtask.message
+    return {"latency": common.summarize(latencies, errors, duration), "duration": round(duration, 3),
+            "message": message}
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Measure API latency during a background LDAP synchronization")
+    parser.add_argument("-u", "--users", type=int, default=5000, help="Number of users to synchronize")
+    parser.add_argument("-b", "--batch-size", type=int, default=100, help="Synchronization batch size")
+    parser.add_argument("-t", "--duration", type=float, default=5, help="Duration (in seconds) of the idle measurement")
+    parser.add_argument("-w", "--warmup", type=int, default=20, help="Number of unmeasured requests per mode")
+    parser.add_argument("-o", "--output", help="Write results to file")
+    parser.add_argument("-c", "--compare", help="Compare results with previous run")
+    parser.add_argument("--workdir", help="Directory for runtime files. Defaults to a temporary directory.")
+    parser.add_argument("--mode", choices=modes, help=SUPPRESS)
+    parser.add_argument("--generation", type=int, default=0, help=SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.mode:
+        print(json.dumps(measure(args)))
+        return 0
+
+    if args.workdir is None:
+        import atexit
+        import shutil
+        args.workdir = tempfile.mkdtemp(prefix="grommunio-bench-")
+        atexit.register(shutil.rmtree, args.workdir, True)
+    common.setup(args.workdir)
+    seeded = common.seed(1, args.users, 10)
+    from orm import DB
+    DB.session.execute("UPDATE users SET externid = CAST(username AS BLOB) WHERE id != 0")
+    DB.session.commit()
+    print("Seeded {} users in {:.2f}s".format(len(seeded["users"]), seeded["seedTime"]), file=sys.stderr)
+    results = {"meta": {"date": datetime.now().isoformat(timespec="seconds"),
+                        "python": platform.python_version(),
+                        "platform": platform.platform(),
+                        "cpus": os.cpu_count(),
+                        "users": args.users,
+                        "batchSize": args.batch_size},
+               "endpoints": {},
+               "sync": {}}
+    for generation, mode in enumerate(modes):
+        command = [sys.executable, "-m", "bench.tasq", "--mode", mode, "--workdir", args.workdir,
+                   "--generation", str(generation), "-b", str(args.batch_size), "-t", str(args.duration),
+                   "-w", str(args.warmup)]
+        child = subprocess.run(command, cwd=common.rootDir, stdout=subprocess.PIPE, env=os.environ)
+        if child.returncode != 0:
+            print("Measurement of {} mode failed".format(mode), file=sys.stderr)
+            return 1
+        result = json.loads(child.stdout.decode().strip().splitlines()[-1])
+        latency = result["latency"]
+        results["endpoints"]["user detail ({})".format(mode)] = latency
+        if result["message"] is not None:
+            results["sync"][mode] = {"duration": result["duration"], "message": result["message"]}
+        print("{:<8} {:>6} requests  p50 {:>8.3f} ms  p95 {:>8.3f} ms  p99 {:>8.3f} ms  errors {}  {}"
+              .format(mode, latency["requests"], latency["p50"], latency["p95"], latency["p99"], latency["errors"],
+                      "" if result["message"] is None else "sync: "+result["message"]), file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    if args.compare:
+        from .api import compare
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: 2026 grommunio GmbH
+
+"""Compare user property loading strategies.
+
+Loads a set of properties for pages of users using
+- `propmap`: the `Users.properties` map of each user (one query per user)
+- `rows`: one query returning `UserProperties` objects, converted one by one (previous user list implementation)
+- `bulk`: `UserProperties.load`
+
+and reports latency and number of queries per page. Additionally measures the user list endpoint with the `properties`
+parameter.
+
+Usage: python3 -m bench.userprops [-u USERS] [-o results.json]
+"""
+
+import json
+import platform
+import sys
+import tempfile
+import time
+
+from argparse import ArgumentParser
+from datetime import datetime
+
+from . import common
+from .api import run
+
+propnames = ("displayname", "storagequotalimit", "messagesizeextended", "creationtime")
+
+
+def _propmap(users, tags):
+    return {user.ID: {key: value for key, value in user.properties.namemap().items() if key in propnames}
+            for user in users}
+
+
+def _rows(users, tags):
+    from orm.users import UserProperties
+    result = {user.ID: {} for user in users}
+    for prop in UserProperties.query.filter(UserProperties.userID.in_(result.keys()), UserProperties.tag.in_(tags)):
+        result[prop.userID][prop.name] = prop.val
+    return result
+
+
+def _bulk(users, tags):
+    from orm.users import UserProperties
+    return UserProperties.load([user.ID for user in users], tags)
+
+
+strategies = (("propmap", _propmap), ("rows", _rows), ("bulk", _bulk))
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Compare user property loading strategies")
+    parser.add_argument("-u", "--users", type=int, default=5000, help="Number of users to create")
+    parser.add_argument("-p", "--properties", type=int, default=10, help="Number of properties per user")
+    parser.add_argument("-s", "--sizes", default="50,500,5000", help="Comma separated list of page sizes")
+    parser.add_argument("-n", "--iterations", type=int, default=10, help="Number of measured repetitions")
+    parser.add_argument("-w", "--warmup", type=int, default=2, help="Number of unmeasured repetitions")
+    parser.add_argument("-o", "--output", help="Write results to file")
+    parser.add_argument("-c", "--compare", help="Compare results with previous run")
+    parser.add_argument("--workdir", help="Directory for runtime files. Defaults to a temporary directory.")
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir
+    if workdir is None:
+        import atexit
+        import shutil
+        workdir = tempfile.mkdtemp(prefix="grommunio-bench-")
+        atexit.register(shutil.rmtree, workdir, True)  # Registered first to run after the final metrics flush
+    common.setup(workdir)
+    seeded = common.seed(1, args.users, args.properties)
+    API = common.loadApp()
+    API.logger.setLevel("ERROR")
+    client = API.test_client()
+    headers = common.login(client)
+
+    from api import BaseRoute
+    from orm import DB
+    from orm.users import Users
+    from tools.constants import PropTags
+    DB.enableQueryStats()
+    tags = [getattr(PropTags, name.upper()) for name in propnames]
+    sizes = [int(size) for size in args.sizes.split(",")]
+    results = {"meta": {"date": datetime.now().isoformat(timespec="seconds"),
+                        "python": platform.python_version(),
+                        "platform": platform.platform(),
+                        "users": args.users,
+                        "properties": args.properties,
+                        "iterations": args.iterations,
+                        "seedTime": seeded["seedTime"]},
+               "endpoints": {}}
+    for size in sizes:
+        reference = None
+        for name, strategy in strategies:
+            latencies, queries = [], 0
+            for iteration in range(args.warmup+args.iterations):
+                DB.session.remove()
+                users = Users.query.filter(Users.domainID == 1).order_by(Users.ID).limit(size).all()
+                DB.resetQueryStats()
+                start = time.perf_counter()
+                loaded = strategy(users, tags)
+                duration = time.perf_counter()-start
+                if iteration >= args.warmup:
+                    latencies.append(duration)
+                    queries = DB.queryStats()[0]
+            reference = reference or loaded
+            if loaded != reference:
+                print("Result mismatch for strategy {} with {} users".format(name, size), file=sys.stderr)
+                return 1
+            result = common.summarize(latencies)
+            result["queries"] = queries
+            results["endpoints"]["{} users ({})".format(size, name)] = result
+            print("{:<24} {:>6} queries  p50 {:>9.3f} ms  p95 {:>9.3f} ms"
+                  .format("{} users ({})".format(size, name), queries, result["p50"], result["p95"]), file=sys.stderr)
+        path = BaseRoute+"/domains/1/users?limit={}&properties={}".format(size, ",".join(propnames))
+        result = run(client, headers, "GET", path, None, args.iterations, args.warmup)
+        results["endpoints"]["{} users (endpoint)".format(size)] = result
+        print("{:<24} {:>8.2f} req/s  p50 {:>9.3f} ms  p95 {:>9.3f} ms"
+              .format("{} users (endpoint)".format(size), result["throughput"], result["p50"], result["p95"]),
+              file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    if args.compare:
+        from .api import compare
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
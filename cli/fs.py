@@ -14,101 +14,128 @@ def _human(size):
     return size, units[index]
 
 
-def _du(path):
-    import os
-    files, size = 0, os.path.getsize(path)
-    for pathname, dirnames, filenames in os.walk(path):
-        for filename in dirnames+filenames:
-            file = os.path.join(pathname, filename)
-            if not os.path.islink(file):
-                files += os.path.isfile(file)
-                size += os.path.getsize(file)
-    return files, size
-
-
 def _statStr(cli, files, size):
     human = "" if size < 1024 else " ("+cli.col("{:.3n} {}".format(*_human(size)), attrs=["bold"])+")"
     return f"{size:,} bytes{human} used by "+cli.col(f"{files} file"+("" if files == 1 else "s"), attrs=["bold"])
 
 
 def cliFsDu(args):
+    from tools.diskusage import partitions, splitTree, usage
     cli = args._cli
-    from tools.config import Config
     files = size = 0
-    if args.partition is None or args.partition == "domain":
-        prefix = Config["options"]["domainPrefix"]
-        f, s = _du(prefix)
-        files += f
-        size += s
-        cli.print(prefix+": "+_statStr(cli, f, s))
-    if args.partition is None or args.partition == "user":
-        prefix = Config["options"]["userPrefix"]
-        f, s = _du(prefix)
-        files += f
-        size += s
-        cli.print(prefix+": "+_statStr(cli, f, s))
-    if args.partition == None:
+    for partition, prefix, levels in partitions(args.partition):
+        depth = levels if args.depth is None else args.depth
+        verbose = not args.summary and (args.mailboxes or args.depth is not None)
+        dirs, pfiles, psize = splitTree(prefix, depth)
+        for path, f, s in usage(dirs, args.jobs):
+            pfiles += f
+            psize += s
+            if verbose:
+                cli.print(path+": "+_statStr(cli, f, s))
+        files += pfiles
+        size += psize
+        if not args.summary:
+            cli.print(prefix+": "+_statStr(cli, pfiles, psize))
+    if args.partition is None or args.summary:
         cli.print(_statStr(cli, files, size))
 
 
-def _clean(cli, path, used, maxdepth, du=False, delete=True):
+def _clean(cli, path, used, levels, du=False, delete=True, jobs=8):
     import os
     import shutil
+    from tools.diskusage import splitTree, usage
     path = path.rstrip(os.path.sep)
-    prefix = len(path)
-    maxdepth -= 1
+    parents = {parent: 0 for parent in splitTree(path, levels-1)[0]}
+    unused = []
+    for parent in parents:
+        try:
+            with os.scandir(parent) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        parents[parent] += 1
+                        if entry.path not in used:
+                            unused.append(entry.path)
+        except OSError:
+            pass
     files = size = 0
-    for pathname, dirnames, filenames in os.walk(path):
-        depth = pathname[prefix:].count(os.path.sep)
-        if depth > maxdepth:
-            dirnames.clear()
-            continue
-        if depth < maxdepth:
+    results = usage(unused, jobs) if du else ((dp, 0, 0) for dp in unused)
+    for dp, f, s in results:
+        files += f
+        size += s
+        parents[os.path.dirname(dp)] -= 1
+        cli.print("Remov{} {}".format("ing" if delete else "e", cli.col(dp, attrs=["bold"])))
+        if delete:
+            shutil.rmtree(dp, ignore_errors=True)
+    for parent, remaining in parents.items():
+        if remaining > 0 or parent == path:
             continue
-        removed = 0
-        for dirname in dirnames:
-            dp = os.path.join(pathname, dirname)
-            if dp not in used:
-                removed += 1
-                if du:
-                    f, s = _du(dp)
-                    files += f
-                    size += s
-                cli.print("Remov{} {}".format("ing" if delete else "e", cli.col(dp, attrs=["bold"])))
-                if delete:
-                    shutil.rmtree(dp, ignore_errors=True)
-        if len(dirnames)-removed <= 0 and depth != 0:
-            size += os.path.getsize(pathname)
-            cli.print("Remov{} empty directory {}".format("ing" if delete else "e", cli.col(pathname, attrs=["bold"])))
-            if delete:
-                try: os.rmdir(pathname)
-                except: pass
-        dirnames.clear()
+        if du:
+            try:
+                size += os.lstat(parent).st_size
+            except OSError:
+                pass
+        cli.print("Remov{} empty directory {}".format("ing" if delete else "e", cli.col(parent, attrs=["bold"])))
+        if delete:
+            try: os.rmdir(parent)
+            except: pass
     return files, size
 
 
 def cliFsClean(args):
     cli = args._cli
     cli.require("DB")
-    from tools.config import Config
-    opt = Config["options"]
+    from tools.diskusage import partitions
     files = size = 0
-    if args.partition is None or args.partition == "domain":
-        from orm.domains import Domains
-        used = {d.homedir for d in Domains.query.with_entities(Domains.homedir).filter(Domains.homedir != "").all()}
-        f, s = _clean(cli, opt["domainPrefix"], used, opt["domainStorageLevels"], not args.nostat, not args.dryrun)
-        files += f
-        size += s
-    if args.partition is None or args.partition == "user":
-        from orm.users import Users
-        used = {u.maildir for u in Users.query.with_entities(Users.maildir).filter(Users.maildir != "").all()}
-        f, s = _clean(cli, opt["userPrefix"], used, opt["userStorageLevels"], not args.nostat, not args.dryrun)
+    for partition, prefix, levels in partitions(args.partition):
+        if partition == "domain":
+            from orm.domains import Domains
+            used = {d.homedir for d in Domains.query.with_entities(Domains.homedir).filter(Domains.homedir != "").all()}
+        else:
+            from orm.users import Users
+            used = {u.maildir for u in Users.query.with_entities(Users.maildir).filter(Users.maildir != "").all()}
+        f, s = _clean(cli, prefix, used, levels, not args.nostat, not args.dryrun, args.jobs)
         files += f
         size += s
     if not args.nostat:
         cli.print(("Operation would free " if args.dryrun else "Freed ")+_statStr(cli, files, size))
 
 
+def _openIndex(cli, readonly=False):
+    import sqlite3
+    from tools.diskusage import UsageIndex
+    try:
+        return UsageIndex(readonly=readonly)
+    except (OSError, sqlite3.Error) as err:
+        cli.print(cli.col("Failed to open usage index: "+" - ".join(str(arg) for arg in err.args), "red"))
+
+
+def cliFsIndexRefresh(args):
+    cli = args._cli
+    index = _openIndex(cli)
+    if index is None:
+        return 1
+    callback = (lambda path, files, size: cli.print(path+": "+_statStr(cli, files, size))) if args.verbose else None
+    with index:
+        stats = index.refresh(args.partition, args.full, args.jobs, callback)
+    cli.print("Rescanned {scanned}, unchanged {unchanged}, removed {removed} director{}"
+              .format("y" if stats["removed"] == 1 else "ies", **stats))
+
+
+def cliFsIndexShow(args):
+    cli = args._cli
+    index = _openIndex(cli, True)
+    if index is None:
+        return 1
+    with index:
+        for entry in index.top(args.limit, args.partition):
+            cli.print(entry["path"]+": "+_statStr(cli, entry["files"], entry["size"]))
+        if args.summary:
+            for partition, summary in index.summary().items():
+                cli.print("{} ({} director{}): {}".format(cli.col(partition, attrs=["bold"]), summary["directories"],
+                                                         "y" if summary["directories"] == 1 else "ies",
+                                                         _statStr(cli, summary["files"], summary["size"])))
+
+
 def _setupCliFsParser(subp: ArgumentParser):
     Cli.parser_stub(subp)
     sub = subp.add_subparsers()
@@ -118,10 +145,31 @@ def _setupCliFsParser(subp: ArgumentParser):
     clean.set_defaults(_handle=cliFsClean)
     clean.add_argument("partition", nargs="?", choices=("domain", "user"), help="Clean only specified partition")
     clean.add_argument("-d", "--dryrun", action="store_true", help="Do not actually delete anything")
+    clean.add_argument("-j", "--jobs", type=int, default=8, help="Maximum number of directories to scan in parallel")
     clean.add_argument("-s", "--nostat", action="store_true", help="Do not collect disk usage of deleted files")
     du = sub.add_parser("du", help="Show disk usage")
     du.set_defaults(_handle=cliFsDu)
     du.add_argument("partition", nargs="?", choices=("domain", "user"), help="Partition to calculate disk usage for")
+    du.add_argument("-j", "--jobs", type=int, default=8, help="Maximum number of directories to scan in parallel")
+    mode = du.add_mutually_exclusive_group()
+    mode.add_argument("-d", "--depth", type=int, help="Show disk usage of each directory DEPTH levels below the partition root")
+    mode.add_argument("-m", "--mailboxes", action="store_true", help="Show disk usage of each user or domain home directory")
+    mode.add_argument("-s", "--summary", action="store_true", help="Only show the grand total")
+    index = sub.add_parser("index", help="Manage the persistent disk usage index")
+    Cli.parser_stub(index)
+    indexSub = index.add_subparsers()
+    refresh = indexSub.add_parser("refresh", help="Update disk usage index")
+    refresh.description = "Rescan all home directories that were modified since the last refresh"
+    refresh.set_defaults(_handle=cliFsIndexRefresh)
+    refresh.add_argument("partition", nargs="?", choices=("domain", "user"), help="Refresh only specified partition")
+    refresh.add_argument("-f", "--full", action="store_true", help="Rescan all directories")
+    refresh.add_argument("-j", "--jobs", type=int, default=8, help="Maximum number of directories to scan in parallel")
+    refresh.add_argument("-v", "--verbose", action="store_true", help="Print disk usage of rescanned directories")
+    show = indexSub.add_parser("show", help="Show largest home directories")
+    show.set_defaults(_handle=cliFsIndexShow)
+    show.add_argument("partition", nargs="?", choices=("domain", "user"), help="Show only specified partition")
+    show.add_argument("-n", "--limit", type=int, default=10, help="Maximum number of directories to show")
+    show.add_argument("-s", "--summary", action="store_true", help="Show partition totals")
 
 
 @Cli.command("fs", _setupCliFsParser, help="Filesystem operations")
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: 2026 grommunio GmbH
+
+from . import Cli, InvalidUseError
+from argparse import ArgumentParser
+
+
+def _openIndex(cli, readonly=False):
+    import sqlite3
+    from tools.search import SearchIndex
+    try:
+        return SearchIndex(readonly=readonly)
+    except (OSError, sqlite3.Error) as err:
+        cli.print(cli.col("Failed to open search index: "+" - ".join(str(arg) for arg in err.args), "red"))
+
+
+def cliSearchRebuild(args):
+    cli = args._cli
+    cli.require("DB")
+    from time import time
+    from tools.search import indexable
+    unknown = [model for model in args.model if model not in indexable]
+    if unknown:
+        cli.print(cli.col("Cannot index "+", ".join(unknown), "red"))
+        return 2
+    index = _openIndex(cli)
+    if index is None:
+        return 1
+    with index:
+        for model in args.model or indexable:
+            start = time()
+            count = index.rebuild(model)
+            cli.print("Indexed {} {} in {:.1f}s".format(count, model, time()-start))
+
+
+def cliSearchStatus(args):
+    cli = args._cli
+    from datetime import datetime
+    from tools.config import Config
+    index = _openIndex(cli, True)
+    if index is None:
+        return 1
+    cli.print("Search engine: "+cli.col(Config["options"]["search"]["engine"], attrs=["bold"]))
+    with index:
+        for model, stats in index.stats().items():
+            cli.print("{}: {} objects, {} documents, built {}"
+                      .format(cli.col(model, attrs=["bold"]), stats["objects"], stats["documents"],
+                              datetime.fromtimestamp(stats["built"]).strftime("%Y-%m-%d %H:%M:%S")))
+
+
+def _setupCliSearchParser(subp: ArgumentParser):
+    from tools.search import indexable
+    Cli.parser_stub(subp)
+    sub = subp.add_subparsers()
+    rebuild = sub.add_parser("rebuild", help="Rebuild search index")
+    rebuild.description = "Recreate the search index from the database. Required after initial activation of the index "\
+                          "and after changes made outside of grommunio-admin."
+    rebuild.set_defaults(_handle=cliSearchRebuild)
+    rebuild.add_argument("model", nargs="*", help="Only rebuild index of specified models ({})".format(", ".join(indexable)))
+    status = sub.add_parser("status", help="Show search index statistics")
+    status.set_defaults(_handle=cliSearchStatus)
+
+
+@Cli.command("search", _setupCliSearchParser, help="Search index management")
+def cliSearchStub(args):
+    raise InvalidUseError()
@@ -159,6 +159,21 @@ def _updateStoreprops(cli, user, props, props_rm=()):
         cli.print(cli.col("Failed to set store properties: "+err.args[0], "yellow"))
 
 
+def _loadProperties(cli, userIDs, props):
+    """Load user properties specified by name."""
+    if not props:
+        return {}
+    from orm.users import UserProperties
+    from tools.constants import PropTags
+    tags = []
+    for prop in props:
+        tag = getattr(PropTags, prop.upper(), None)
+        if tag is None:
+            cli.print(cli.col("Unknown property '{}' - ignored".format(prop), "yellow"))
+        tags.append(tag)
+    return UserProperties.load(userIDs, tags)
+
+
 def cliUserShow(args):
     cli = args._cli
     cli.require("DB")
@@ -180,14 +195,17 @@ def cliUserList(args):
     if len(users) == 0:
         cli.print(cli.col("No users found.", "yellow"))
         return 1
+    properties = _loadProperties(cli, [user.ID for user in users], args.property)
     maxNameLen = max(len(user.username) for user in users)
     for user in users:
         if user.domainName() is not None:
             printName = "{}@{}".format(cli.col(user.baseName(), attrs=["bold"]), user.domainName())
         else:
             printName = cli.col(user.username, attrs=["bold"])
-        cli.print("{}:\t{}{}({}|{})".format(user.ID, printName, " "*(maxNameLen-len(user.username)+4),
-                                            _mkStatus(cli, user.domainStatus), _mkStatus(cli, user.status)))
+        props = "".join("  {}={}".format(cli.col(name, attrs=["dark"]), value)
+                        for name, value in properties.get(user.ID, {}).items())
+        cli.print("{}:\t{}{}({}|{}){}".format(user.ID, printName, " "*(maxNameLen-len(user.username)+4),
+                                              _mkStatus(cli, user.domainStatus), _mkStatus(cli, user.status), props))
     cli.print("({} users total)".format(len(users)))
 
 
@@ -236,6 +254,47 @@ def cliUserCreate(args):
     _dumpUser(cli, result)
 
 
+def cliUserBulkCreate(args):
+    cli = args._cli
+    cli.require("DB")
+    import json
+    from orm.domains import Domains
+    from orm.misc import DBConf
+    from orm.users import Users
+    from tools.misc import RecursiveDict
+    try:
+        with cli.open(args.file) as file:
+            content = file.read()
+        records = json.loads(content) if content.lstrip().startswith("[") else \
+            [json.loads(line) for line in content.splitlines() if line.strip()]
+    except (OSError, ValueError) as err:
+        cli.print(cli.col("Failed to load users: "+" - ".join(str(arg) for arg in err.args), "red"))
+        return 1
+    if not args.no_defaults:
+        systemDefaults = DBConf.getFile("grommunio-admin", "defaults-system", True).get("user", RecursiveDict())
+        domainDefaults = {}
+        for index, record in enumerate(records):
+            props = RecursiveDict(systemDefaults)
+            domainname = record.get("username", "").split("@", 1)[-1]
+            if domainname not in domainDefaults:
+                domain = Domains.query.filter(Domains.domainname == domainname).with_entities(Domains.ID).first()
+                domainDefaults[domainname] = {} if domain is None else \
+                    DBConf.getFile("grommunio-admin", "defaults-domain-"+str(domain.ID), True).get("user", {})
+            props.update(domainDefaults[domainname])
+            props.update(record)
+            records[index] = props
+    status = Users.createBulk(records, not args.no_sync, args.batch_size, args.workers)
+    failed = 0
+    for entry in status:
+        if entry["code"] == 201:
+            cli.print("{}: {}".format(entry["username"], cli.col(entry["message"], "green")))
+        else:
+            failed += 1
+            cli.print("{}: {}".format(entry["username"], cli.col(entry["message"], "red")))
+    cli.print("{} user{} created, {} failed".format(len(status)-failed, "" if len(status)-failed == 1 else "s", failed))
+    return 1 if failed else 0
+
+
 def cliUserDelete(args):
     cli = args._cli
     cli.require("DB")
@@ -330,13 +389,19 @@ def cliUserQuery(args):
 
     from .common import Table
     from orm.users import Users
+    from tools.constants import PropTags
     args.attributes = args.attributes or ("ID", "username", "status")
     query = _mkUserQuery(args)
     query = Users.optimize_query(query, args.attributes)
-    users = [user.todict(args.attributes) for user in query]
+    users = query.all()
+    properties = _loadProperties(cli, [user.ID for user in users], args.property)
+    propnames = [prop.lower() for prop in args.property or () if hasattr(PropTags, prop.upper())]
+    columns = list(args.attributes)+propnames
     separator = args.separator or ("," if args.format == "csv" else "  ")
-    data = [[attrTf.get(attr, lambda x: x)(user.get(attr)) for attr in args.attributes] for user in users]
-    header = None if len(args.attributes) <= 1 and len(data) <= 1 and args.format == "pretty" else args.attributes
+    data = [[attrTf.get(attr, lambda x: x)(values.get(attr)) for attr in args.attributes] +
+            [properties[user.ID].get(prop) for prop in propnames]
+            for user, values in ((user, user.todict(args.attributes)) for user in users)]
+    header = None if len(columns) <= 1 and len(data) <= 1 and args.format == "pretty" else columns
     table = Table(data, header, separator, cli.col("(no results)", attrs=["dark"]))
     table.dump(cli, args.format)
 
@@ -430,6 +495,13 @@ def _setupCliUser(subp: ArgumentParser):
     create.add_argument("--no-defaults", action="store_true", help="Do not apply configured default values")
     create.set_defaults(_handle=cliUserCreate)
     _cliAddUserAttributes(create)
+    bulkCreate = sub.add_parser("bulk-create", help="Create multiple users from file")
+    bulkCreate.set_defaults(_handle=cliUserBulkCreate)
+    bulkCreate.add_argument("file", help="JSON or JSON lines file containing the user data")
+    bulkCreate.add_argument("--batch-size", type=int, default=100, help="Number of users to insert per commit")
+    bulkCreate.add_argument("--no-defaults", action="store_true", help="Do not apply configured default values")
+    bulkCreate.add_argument("--no-sync", action="store_true", help="Do not write user properties to the stores")
+    bulkCreate.add_argument("--workers", type=int, default=4, help="Number of stores to create in parallel")
     delete = sub.add_parser("delete", help="Delete user")
     delete.set_defaults(_handle=cliUserDelete)
     delete.add_argument("userspec", help="User ID or name").completer = _cliUserspecCompleter
@@ -441,6 +513,7 @@ def _setupCliUser(subp: ArgumentParser):
     list.add_argument("userspec", nargs="?", help="User ID or name prefix")
     list.add_argument("-f", "--filter", action="append", help="Filter by attribute, e.g. -f ID=42")
     list.add_argument("-s", "--sort", action="append", help="Sort by attribute, e.g. -s username,desc")
+    list.add_argument("-p", "--property", action="append", help="Show user property, e.g. -p displayname")
     modify = sub.add_parser("modify",  help="Modify user")
     modify.set_defaults(_handle=cliUserModify)
     modify.add_argument("userspec", help="User ID or name prefix").completer = _cliUserspecCompleter
@@ -458,6 +531,7 @@ def _setupCliUser(subp: ArgumentParser):
                        metavar="FORMAT", default="pretty")
     query.add_argument("--separator", help="Set column separator")
     query.add_argument("-s", "--sort", action="append", help="Sort by attribute, e.g. -s username,desc")
+    query.add_argument("-p", "--property", action="append", help="Add user property column, e.g. -p displayname")
     query.add_argument("attributes", nargs="*", choices=AttrChoice(), help="Attributes to query", metavar="ATTRIBUTE")
     show = sub.add_parser("show", help="Show detailed information about user")
     show.set_defaults(_handle=cliUserShow)
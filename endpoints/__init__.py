@@ -4,19 +4,307 @@
 
 __all__ = ["domain", "system", "defaults", "misc", "service", "tasq"]
 
-from flask import request, jsonify
+from flask import request, jsonify, Response, stream_with_context
 from orm import DB
 from tools.DataModel import MissingRequiredAttributeError, InvalidAttributeError, MismatchROError
 from tools.misc import damerau_levenshtein_distance as dldist
+import json
 import re
 
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from sqlalchemy import case
 from sqlalchemy.exc import IntegrityError
 
 matchStringRe = re.compile(r"([\w\-]*)")
 
 
+def _decodeCursor(cursor, sorts):
+    """Decode pagination cursor.
+
+    Parameters
+    ----------
+    cursor : str
+        Cursor token or empty string to start at the first entry
+    sorts : list
+        Sort expressions of the current request
+
+    Raises
+    ------
+    ValueError
+        Cursor is invalid or was created with different sort expressions
+
+    Returns
+    -------
+    list
+        Sort key values or None if cursor is empty
+    """
+    if not cursor:
+        return None
+    try:
+        data = json.loads(urlsafe_b64decode(cursor+"="*(-len(cursor) % 4)))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(data, dict) or data.get("s") != sorts or not isinstance(data.get("k"), list):
+        raise ValueError("Cursor does not match request")
+    return data["k"]
+
+
+def cursorToken(Model, objects, limit):
+    """Create cursor pointing to the element after the last object.
+
+    Parameters
+    ----------
+    Model : SQLAlchemy model with DataModel extension
+        Model of the objects
+    objects : list
+        Objects of the current page
+    limit : str or int
+        Page size. If the page is incomplete, there is no next page.
+
+    Returns
+    -------
+    str
+        Cursor token or None if the last page is reached
+    """
+    if not limit or len(objects) < int(limit):
+        return None
+    sorts = request.args.getlist("sort")
+    data = json.dumps({"s": sorts, "k": objects[-1].sortvalues(sorts)}, separators=(",", ":"), default=str)
+    return urlsafe_b64encode(data.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def streamRequested(count, limit, offset):
+    """Check whether a list response should be streamed.
+
+    Streaming can be explicitly enabled or disabled with the 'stream' parameter. Otherwise, it is enabled if the
+    number of returned elements exceeds the `options.streaming.threshold` configuration value.
+
+    Parameters
+    ----------
+    count : int
+        Total number of results or None if unknown
+    limit : str or int
+        Page size or None if unlimited
+    offset : str or int
+        Index of the first element or None
+
+    Returns
+    -------
+    bool
+        True if the response should be streamed, False otherwise
+    """
+    if "stream" in request.args:
+        return request.args["stream"] == "true"
+    from tools.config import Config
+    threshold = Config["options"]["streaming"]["threshold"]
+    if not threshold:
+        return False
+    size = None if count is None else max(0, count-int(offset or 0))
+    if limit:
+        size = int(limit) if size is None else min(size, int(limit))
+    return size is None or size > threshold
+
+
+def streamList(Model, query, spec=1, convert=None, fields={}):
+    """Create streaming JSON list response.
+
+    The IDs of the results are read through a server-side cursor on a separate connection. The objects are loaded in
+    batches of `options.streaming.batchSize` through the regular session and written to the response one batch at a
+    time, so that neither the objects nor the serialized data have to be kept in memory completely. As the cursor does
+    not use the connection of the regular session, eager loading and `convert` can issue further queries while the
+    cursor is open (MySQL does not allow this on the connection of an open server-side cursor).
+    Objects are removed from the session after conversion.
+
+    Parameters
+    ----------
+    Model : SQLAlchemy model with DataModel extension
+        Model of the objects
+    query : BaseQuery
+        Query returning the objects
+    spec : int or iterable, optional
+        Level or attribute selection to optimize loading of the objects for (see DataModel.optimize_query). The default
+        is 1.
+    convert : function, optional
+        Function converting a list of objects into a list of JSON serializable elements. The default is None, which uses
+        the `spec` representation of the objects.
+    fields : dict, optional
+        Additional fields of the response object. The default is {}.
+
+    Returns
+    -------
+    Response
+        Streaming flask response containing the fields and the converted objects in `data`.
+    """
+    from flask import current_app
+    from flask.json import dumps
+    from sqlalchemy.orm import Session
+    from tools.config import Config
+    batch = Config["options"]["streaming"]["batchSize"]
+    convert = convert or (lambda objects: [obj.todict(spec) for obj in objects])
+    head = dumps(fields)[:-1]
+
+    def generate():
+        connection = DB.engine.connect().execution_options(stream_results=True)
+        session = Session(bind=connection)
+        yield head+(', ' if fields else '')+'"data": ['
+        separator = ""
+        try:
+            IDs = (row[0] for row in query.with_entities(Model.ID).with_session(session).yield_per(batch))
+            while True:
+                chunk = [ID for _, ID in zip(range(batch), IDs)]
+                if not chunk:
+                    break
+                loaded = {obj.ID: obj for obj in Model.optimized_query(spec).filter(Model.ID.in_(chunk))}
+                objects = [loaded[ID] for ID in chunk if ID in loaded]
+                elements = convert(objects)
+                for obj in objects:
+                    DB.session.expunge(obj)
+                if elements:
+                    yield separator+", ".join(dumps(element) for element in elements)
+                    separator = ", "
+        except Exception:
+            current_app.logger.error("Streaming list response aborted", exc_info=True)
+            return
+        finally:
+            session.close()
+            connection.close()
+        yield "]}"
+    return Response(stream_with_context(generate()), mimetype="application/json")
+
+
+def _exportValue(data, key):
+    """Get CSV representation of a (nested) value.
+
+    Parameters
+    ----------
+    data : dict
+        Dictionary representation of the object
+    key : str
+        Name of the value. Nested values are addressed as `<key>.<subkey>`.
+
+    Returns
+    -------
+    str or int or float
+        Value to write to the CSV file
+    """
+    from flask.json import dumps
+    for part in key.split("."):
+        data = data.get(part) if isinstance(data, dict) else None
+    if data is None:
+        return ""
+    if isinstance(data, bool):
+        return "true" if data else "false"
+    return dumps(data) if isinstance(data, (dict, list, tuple)) else data
+
+
+def defaultExport(Model, name, filters=(), exclude=(), fields=(), extend=None):
+    """Export objects of specified model as CSV or JSONL.
+
+    Uses the same filter, match and sort parameters as `defaultListQuery`. The 'format' parameter selects the output
+    format (`csv` or `jsonl`, default `csv`) and 'columns' the exported attributes (default: all exportable attributes
+    up to level 1). Only attributes stored in the object itself can be exported, references and relationships are not
+    available. The total count is not computed and 'limit' and 'offset' are only applied if given explicitly.
+
+    Objects are read through a server-side cursor on a separate connection in batches of `options.streaming.batchSize`,
+    so that memory usage does not depend on the number of exported objects and `extend` can use the regular session to
+    load additional data for each batch. If the export fails after the response has been started, a final error record
+    is written (`{"error": ...}` for JSONL, a line starting with `#error` for CSV).
+
+    Parameters
+    ----------
+    Model : SQLAlchemy model with DataModel extension
+        Model to export
+    name : str
+        Base name of the exported file
+    filters : iterable, optional
+        A list of filter expressions to apply to the query. The default is ().
+    exclude : Collection, optional
+        Attributes that cannot be exported. The default is ().
+    fields : list of str, optional
+        Names of additional columns provided by `extend`. Nested values are addressed as `<key>.<subkey>`.
+        The default is ().
+    extend : function, optional
+        Function called with each batch of objects and the list of their dictionary representations, adding the values
+        of `fields` to the dictionaries. The default is None.
+
+    Returns
+    -------
+    Response
+        Streaming flask response containing the exported data or error response
+    """
+    import csv
+    import io
+    from flask import current_app
+    from flask.json import dumps
+    from sqlalchemy import inspect
+    from sqlalchemy.orm import Session
+    from tools.config import Config
+    fmt = request.args.get("format", "csv")
+    if fmt not in ("csv", "jsonl"):
+        return jsonify(message="Invalid export format '{}'".format(fmt)), 400
+    Model._init()
+    relationships = set(inspect(Model).relationships.keys())
+    exportable = {prop.attr: prop for prop in Model._meta.props(predicate=lambda prop: "hidden" not in prop.flags and
+                                                                "ref" not in prop.flags and prop.proxy is None and
+                                                                prop.attr not in relationships and
+                                                                prop.attr not in exclude)}
+    if "columns" in request.args:
+        columns = list(dict.fromkeys(column for column in request.args["columns"].split(",") if column))
+        invalid = [column for column in columns if column not in exportable]
+        if invalid:
+            return jsonify(message="Cannot export column(s) "+", ".join(invalid)), 400
+    else:
+        columns = [prop.attr for prop in Model._meta.props(1) if prop.attr in exportable]
+    try:
+        query, limit, offset, _ = defaultListQuery(Model, filters, result="query", include_count=None, spec=columns)
+    except ValueError as err:
+        return jsonify(message=err.args[0]), 400
+    query = query.limit(limit if "limit" in request.args else None).offset(offset)
+    header = [exportable[column].key for column in columns]+list(fields)
+    batch = Config["options"]["streaming"]["batchSize"]
+
+    def generate():
+        connection = DB.engine.connect().execution_options(stream_results=True)
+        session = Session(bind=connection)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        try:
+            if fmt == "csv":
+                writer.writerow(header)
+            objects = iter(query.with_session(session).yield_per(batch))
+            while True:
+                chunk = [obj for _, obj in zip(range(batch), objects)]
+                if not chunk:
+                    break
+                data = [obj.todict(columns) for obj in chunk]
+                for obj in chunk:
+                    session.expunge(obj)
+                if extend is not None:
+                    extend(chunk, data)
+                if fmt == "jsonl":
+                    yield "".join(dumps(entry)+"\n" for entry in data)
+                    continue
+                writer.writerows([_exportValue(entry, key) for key in header] for entry in data)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            yield buffer.getvalue()
+        except Exception:
+            current_app.logger.error("Export of {} aborted".format(name), exc_info=True)
+            # The status code has already been sent, so mark the data as incomplete
+            message = "Export aborted due to an internal error"
+            yield dumps({"error": message})+"\n" if fmt == "jsonl" else buffer.getvalue()+"#error "+message+"\r\n"
+        finally:
+            session.close()
+            connection.close()
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return Response(stream_with_context(generate()), mimetype=mimetype,
+                    headers={"Content-Disposition": 'attachment; filename="{}.{}"'.format(name, fmt)})
+
+
 def defaultListQuery(Model, filters=(), order=None, result="response", automatch=True, autofilter=True, autosort=True,
-                     include_count="count", query=None):
+                     include_count="count", query=None, spec=None):
     """Process a listing query for specified model.
 
     Automatically uses 'limit' (50), 'offset' (0) and 'level' (1) parameters from the request.
@@ -28,6 +316,16 @@ def defaultListQuery(Model, filters=(), order=None, result="response", automatch
     other sorting is active (`order` is None and no "sort" query parameter is given), the results are ranked by the
     Damerau-Levenshtein distance to the search term. Note that ranking is done after the query and a low `limit` parameter
     may prevent a good match from being selected at all.
+    If the search index is enabled (see tools.search), matching and ranking are instead performed by the index and the
+    database query, unless the search term is too short or too unspecific to be looked up in the index.
+
+    If the 'cursor' parameter is present, keyset pagination is used instead of 'offset': The results are ordered by the
+    requested sort keys (see DataModel.keyset) and the response contains a `next` cursor, that can be passed to retrieve
+    the following page. An empty cursor starts at the first element. In cursor mode, `order` and match ranking are ignored
+    and the total count is only computed if requested with 'count=true'.
+
+    Large responses are streamed (see `streamRequested` and `streamList`), unless keyset pagination is used or the
+    results are ranked after the query.
 
     Parameters
     ----------
@@ -50,6 +348,9 @@ def defaultListQuery(Model, filters=(), order=None, result="response", automatch
         Default is "count".
     query: BaseQuery, optional
         Specify a base query to build upon. Default is None.
+    spec: int or list of str, optional
+        Level or attribute selection to optimize the query for (see DataModel.optimize_query). Default is None, which
+        uses the 'level' parameter.
     Returns
     -------
     Response
@@ -62,23 +363,50 @@ def defaultListQuery(Model, filters=(), order=None, result="response", automatch
     if len(offset) == 0:
         offset = None
     verbosity = int(request.args.get("level", 1))
-    query = (Model.optimized_query(verbosity) if query is None else Model.optimize_query(query, verbosity)).filter(*filters)
-    if autosort:
+    cursor = request.args.get("cursor")
+    spec = verbosity if spec is None else spec
+    query = (Model.optimized_query(spec) if query is None else Model.optimize_query(query, spec)).filter(*filters)
+    if cursor is None and autosort:
         query = Model.autosort(query, request.args.getlist("sort"))
-    if order is not None:
+    if cursor is None and order is not None:
         query = query.order_by(*(order if type(order) in (list, tuple) else (order,)))
     if autofilter:
         query = Model.autofilter(query, request.args)
+    ranked = None
     if automatch and "match" in request.args:
         matchStr = request.args["match"].lower()
         fields = set(request.args["matchFields"].split(",")) if "matchFields" in request.args else None
-        query = Model.automatch(query, request.args["match"], fields)
+        if cursor is None and order is None and "sort" not in request.args:
+            from tools.search import rankedMatch
+            ranked = rankedMatch(Model, request.args["match"], fields)
+        if ranked is None:
+            query = Model.automatch(query, request.args["match"], fields)
+        else:
+            query = query.filter(Model.ID.in_(ranked))
+            if ranked:
+                query = query.order_by(case({ID: rank for rank, ID in enumerate(ranked)}, value=Model.ID))
+    if cursor is not None:
+        include_count = include_count if request.args.get("count") == "true" else None
     count = query.count() if include_count else None
+    if cursor is not None:
+        try:
+            sorts = request.args.getlist("sort")
+            query = Model.keyset(query, sorts, _decodeCursor(cursor, sorts))
+        except ValueError as err:
+            if result == "response":
+                return jsonify(message=err.args[0]), 400
+            raise
+        offset = None
     if result == "query":
         return query, limit, offset, count
     query = query.limit(limit).offset(offset)
+    rerank = cursor is None and order is None and "sort" not in request.args and automatch and "match" in request.args \
+        and ranked is None
+    if result == "response" and cursor is None and not rerank and streamRequested(count, limit, offset):
+        return streamList(Model, query, spec, lambda objects: [obj.todict(verbosity) for obj in objects],
+                          {include_count: count} if include_count else {})
     objects = query.all()
-    if order is None and "sort" not in request.args and automatch and "match" in request.args:
+    if rerank:
         scored = ((min(dldist(str(field).lower(), matchStr) for field in obj.matchvalues(fields) if field is not None), obj)
                   for obj in objects)
         objects = [so[1] for so in sorted(scored, key=lambda entry: entry[0])]
@@ -90,6 +418,8 @@ def defaultListQuery(Model, filters=(), order=None, result="response", automatch
     resp = dict(data=data)
     if include_count:
         resp[include_count] = count
+    if cursor is not None:
+        resp["next"] = cursorToken(Model, objects, limit)
     return jsonify(resp)
 
 
@@ -168,6 +498,73 @@ def defaultPatch(Model, ID, errName, obj=None, filters=(), result="response"):
     return jsonify(Model.optimized_query(2).filter(Model.ID == ID).first().fulldesc())
 
 
+def defaultBatchPatch(Model, filters=(), apply=None):
+    """Process a batch PATCH query for specified model.
+
+    The request body must contain a list of entries, each consisting of the `ID` of the object and the `patch` to apply.
+    Every patch is applied in a savepoint, so that failing entries do not affect the others. Changes are committed in
+    chunks of 'chunkSize' entries (query parameter), or in a single transaction if no chunk size is given. If the commit
+    of a chunk fails, all of its entries are reported as failed.
+
+    Parameters
+    ----------
+    Model : SQLAlchemy model with DataModel extension
+        Model to perform the query on.
+    filters : iterable, optional
+        A list of filter expressions restricting the objects that can be patched. The default is ().
+    apply : function, optional
+        Function applying a patch, called as apply(obj, patch). Errors should be reported by raising a ValueError or
+        PermissionError. The default is None, which calls `fromdict` on the object.
+
+    Returns
+    -------
+    Response
+        Flask response containing the result of each entry or an error message.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, list) or \
+       any(not isinstance(entry, dict) or not isinstance(entry.get("patch"), dict) for entry in data):
+        return jsonify(message="Could not update: expected list of objects containing ID and patch"), 400
+    try:
+        chunkSize = int(request.args.get("chunkSize", 0)) or len(data)
+    except ValueError:
+        return jsonify(message="Invalid chunk size"), 400
+    apply = apply or (lambda obj, patch: obj.fromdict(patch))
+    results = []
+    for start in range(0, len(data), max(chunkSize, 1)):
+        chunk = data[start:start+chunkSize]
+        IDs = {entry.get("ID") for entry in chunk if isinstance(entry.get("ID"), int)}
+        objects = {obj.ID: obj for obj in Model.query.filter(Model.ID.in_(IDs), *filters)} if IDs else {}
+        chunkResults = []
+        for entry in chunk:
+            result = {"ID": entry.get("ID"), "success": False}
+            chunkResults.append(result)
+            obj = objects.get(entry.get("ID"))
+            if obj is None:
+                result["message"] = "Object not found"
+                continue
+            try:
+                with DB.session.begin_nested():
+                    apply(obj, entry["patch"])
+                result["success"] = True
+            except (InvalidAttributeError, MismatchROError, ValueError, PermissionError) as err:
+                result["message"] = err.args[0]
+            except IntegrityError as err:
+                result["message"] = "Invalid data"
+                result["error"] = err.orig.args[1] if len(err.orig.args) > 1 else str(err.orig)
+        try:
+            DB.session.commit()
+        except IntegrityError as err:
+            DB.session.rollback()
+            for result in chunkResults:
+                if result["success"]:
+                    result.update(success=False, message="Commit failed",
+                                  error=err.orig.args[1] if len(err.orig.args) > 1 else str(err.orig))
+        results += chunkResults
+    succeeded = sum(result["success"] for result in results)
+    return jsonify(data=results, succeeded=succeeded, failed=len(results)-succeeded)
+
+
 def defaultCreate(Model, result="response"):
     """Create a new object of the specified model.
 
@@ -67,6 +67,7 @@ def ldapDownsync(orgID=None, domainID=None):
     params = {"domainID": domainID} if domainID else {"orgID": orgID} if orgID is not None else {}
     params["lang"] = request.args.get("lang", "")
     params["import"] = request.args.get("import") == "true"
+    params["delta"] = request.args.get("delta") == "true"
     permission = DomainAdminROPermission(domainID) if domainID else \
         OrgAdminPermission(orgID) if orgID else SystemAdminROPermission()
     task = TasQServer.create("ldapSync", params, permission)
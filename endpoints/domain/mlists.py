@@ -8,7 +8,7 @@ from api.security import checkPermissions
 
 from flask import request, jsonify
 
-from .. import defaultListHandler, defaultObjectHandler
+from .. import defaultBatchPatch, defaultListHandler, defaultObjectHandler
 
 from tools.permissions import DomainAdminPermission, DomainAdminROPermission
 
@@ -23,6 +23,14 @@ def mlistListEndpoint(domainID):
     return defaultListHandler(MLists, (MLists.domainID == domainID,))
 
 
+@API.route(api.BaseRoute+"/domains/<int:domainID>/mlists", methods=["PATCH"])
+@secure(requireDB=True)
+def patchMlists(domainID):
+    checkPermissions(DomainAdminPermission(domainID))
+    from orm.mlists import MLists
+    return defaultBatchPatch(MLists, (MLists.domainID == domainID,))
+
+
 @API.route(api.BaseRoute+"/domains/<int:domainID>/mlists", methods=["POST"])
 @secure(requireDB=True)
 def createMlist(domainID):
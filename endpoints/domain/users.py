@@ -5,21 +5,22 @@
 import api
 
 from api.core import API, secure
-from api.security import checkPermissions
+from api.security import checkPermissions, invalidateAuth
 from base64 import b64decode
 from datetime import datetime
 from flask import request, jsonify
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import aliased
 
-from .. import defaultListHandler, defaultObjectHandler
+from .. import cursorToken, defaultBatchPatch, defaultExport, defaultListHandler, defaultObjectHandler, streamList, \
+    streamRequested
 
 from services import Service
 
 from tools import formats
 from tools.config import Config
 from tools.constants import PropTags, PropTypes, ExchangeErrors, PrivateFIDs, Permissions
-from tools.misc import createMapping, loadPSO, GenericObject
+from tools.misc import loadPSO, GenericObject
 from tools.permissions import SystemAdminPermission, DomainAdminPermission, DomainAdminROPermission
 from tools.rop import nxTime, makeEidEx
 from tools.storage import setDirectoryOwner, setDirectoryPermission
@@ -39,26 +40,70 @@ def getUsers(domainID):
     checkPermissions(DomainAdminROPermission(domainID))
     from orm.users import Users, UserProperties
     verbosity = int(request.args.get("level", 1))
-    query, limit, offset, count = defaultListHandler(Users, filters=(Users.domainID == domainID,), result="query")
+    try:
+        query, limit, offset, count = defaultListHandler(Users, filters=(Users.domainID == domainID,), result="query")
+    except ValueError as err:
+        return jsonify(message=err.args[0]), 400
     sorts = request.args.getlist("sort")
-    for s in sorts:
+    for s in sorts if "cursor" not in request.args else ():
         sprop, sorder = s.split(",", 1) if "," in s else (s, "asc")
         if hasattr(PropTags, sprop.upper()):
             up = aliased(UserProperties)
             query = query.join(up, (up.userID == Users.ID) & (up.tag == getattr(PropTags, sprop.upper())))\
                          .order_by(up._propvalstr.desc() if sorder == "desc" else up._propvalstr.asc())
-    data = [user.todict(verbosity) for user in query.limit(limit).offset(offset).all()]
-    if verbosity < 2 and "properties" in request.args:
-        tags = [getattr(PropTags, prop.upper(), None) for prop in request.args["properties"].split(",")]
-        for user in data:
-            user["properties"] = {}
-        usermap = createMapping(data, lambda x: x["ID"])
-        properties = UserProperties.query.filter(UserProperties.userID.in_(usermap.keys()), UserProperties.tag.in_(tags)).all()
-        for prop in properties:
-            usermap[prop.userID]["properties"][prop.name] = prop.val
+
+    def serialize(users):
+        data = [user.todict(verbosity) for user in users]
+        if verbosity < 2 and "properties" in request.args:
+            tags = [getattr(PropTags, prop.upper(), None) for prop in request.args["properties"].split(",")]
+            properties = UserProperties.load([user["ID"] for user in data], tags)
+            for user in data:
+                user["properties"] = properties[user["ID"]]
+        return data
+
+    query = query.limit(limit).offset(offset)
+    if "cursor" not in request.args and streamRequested(count, limit, offset):
+        return streamList(Users, query, verbosity, serialize, {"count": count})
+    users = query.all()
+    data = serialize(users)
+    if "cursor" in request.args:
+        return jsonify(count=count, data=data, next=cursorToken(Users, users, limit))
     return jsonify(count=count, data=data)
 
 
+@API.route(api.BaseRoute+"/domains/<int:domainID>/users/export", methods=["GET"])
+@secure(requireDB=True)
+def exportUsers(domainID):
+    checkPermissions(DomainAdminROPermission(domainID))
+    from orm.users import Users, UserProperties
+    props = [prop for prop in request.args.get("properties", "").split(",") if prop]
+    unknown = [prop for prop in props if not hasattr(PropTags, prop.upper())]
+    if unknown:
+        return jsonify(message="Unknown properties: "+", ".join(unknown)), 400
+    tags = [getattr(PropTags, prop.upper()) for prop in props]
+
+    def addProperties(users, data):
+        properties = UserProperties.load([user.ID for user in users], tags)
+        for user, entry in zip(users, data):
+            entry["properties"] = properties[user.ID]
+    return defaultExport(Users, "users", (Users.domainID == domainID,), ("chat", "chatAdmin", "properties"),
+                         ["properties."+prop.lower() for prop in props], addProperties if tags else None)
+
+
+@API.route(api.BaseRoute+"/domains/<int:domainID>/users", methods=["PATCH"])
+@secure(requireDB=True, authLevel="user")
+def patchUsers(domainID):
+    checkPermissions(DomainAdminPermission(domainID))
+    from orm.users import Users
+    sysadmin = SystemAdminPermission() in request.auth["user"].permissions()
+
+    def apply(user, patch):
+        if not sysadmin:
+            patch.pop("homeserver", None)
+        user.fromdict(patch)
+    return defaultBatchPatch(Users, (Users.domainID == domainID,), apply)
+
+
 @API.route(api.BaseRoute+"/domains/<int:domainID>/users", methods=["POST"])
 @secure(requireDB=True, authLevel="user")
 def createUser(domainID):
@@ -75,6 +120,34 @@ def createUser(domainID):
     return jsonify(result.fulldesc()), 201
 
 
+@API.route(api.BaseRoute+"/domains/<int:domainID>/users/bulk", methods=["POST"])
+@secure(requireDB=True, authLevel="user")
+def createUsersBulk(domainID):
+    checkPermissions(DomainAdminPermission(domainID))
+    from orm.users import Users
+    from tools.tasq import TasQServer
+    records = (request.get_json(silent=True) or {}).get("data", [])
+    sysadmin = SystemAdminPermission() in request.auth["user"].permissions()
+    hashes = []
+    for record in records:
+        record["domainID"] = domainID
+        if not sysadmin:
+            record.pop("homeserver", None)
+        record.pop("passwordHash", None)
+        # Do not store plain text passwords in the task
+        hashes.append(Users.hashPassword(record.pop("password")) if "password" in record else None)
+    task = TasQServer.create("createUsers", dict(data=records, passwordHashes=hashes),
+                             permission=DomainAdminPermission(domainID))
+    timeout = float(request.args.get("timeout", 1))
+    if timeout > 0:
+        TasQServer.wait(task.ID, timeout)
+    if not task.done:
+        return jsonify(message="Created background task #"+str(task.ID), taskID=task.ID), 202
+    if task.state == task.COMPLETED:
+        return jsonify(message=task.message, data=task.params.get("result", []))
+    return jsonify(message="User creation failed: "+task.message), 500
+
+
 @API.route(api.BaseRoute+"/domains/<int:domainID>/users/<int:userID>", methods=["GET", "PATCH"])
 @secure(requireDB=True, authLevel="user")
 def userObjectEndpoint(domainID, userID):
@@ -154,6 +227,7 @@ def updateUserRoles(domainID, userID):
         DB.session.commit()
     except IntegrityError as err:
         return jsonify(message="Invalid data", error=err.orig.args[1]), 400
+    invalidateAuth()
     roles = AdminRoles.query.join(AdminUserRoleRelation).filter(AdminUserRoleRelation.userID == userID).all()
     return jsonify(data=[role.ref() for role in roles])
 
@@ -27,19 +27,12 @@ def checkAccess(permission):
 @secure(requireDB=True, requireAuth="optional")
 def getUserSyncPolicy(username):
     checkAccess(DomainAdminROPermission("*"))
-    from orm.domains import Domains
     from orm.users import Users
-    user = Users.query.filter(Users.username == username).first()
-    if user is None:
+    merged = Users.mergedSyncPolicy(username)
+    if merged is None:
         return jsonify(data=Config["sync"]["defaultPolicy"])
-    checkAccess(DomainAdminROPermission(user.domainID))
-    domain = Domains.query.filter(Domains.ID == user.domainID, Domains._syncPolicy != None).first()
-    policy = dict(Config["sync"]["defaultPolicy"])
-    if domain is not None:
-        policy.update(domain.syncPolicy)
-    if user.syncPolicy is not None:
-        policy.update(user.syncPolicy)
-    return jsonify(data=policy)
+    checkAccess(DomainAdminROPermission(merged["domainID"]))
+    return jsonify(data=merged["policy"])
 
 
 @API.route(api.BaseRoute+"/service/wipe/<username>", methods=["GET"])
@@ -5,7 +5,7 @@
 from flask import request, jsonify
 from sqlalchemy.exc import IntegrityError
 
-from .. import defaultListHandler, defaultObjectHandler, defaultPatch
+from .. import defaultBatchPatch, defaultExport, defaultListHandler, defaultObjectHandler, defaultPatch
 
 import api
 from api.core import API, secure
@@ -95,6 +95,14 @@ def domainListEndpoint():
     return defaultListHandler(Domains)
 
 
+@API.route(api.BaseRoute+"/system/domains/export", methods=["GET"])
+@secure(requireDB=True)
+def domainExport():
+    checkPermissions(SystemAdminROPermission())
+    from orm.domains import Domains
+    return defaultExport(Domains, "domains", exclude=("chat",))
+
+
 @API.route(api.BaseRoute+"/system/domains", methods=["POST"])
 @secure(requireDB=True)
 def domainCreate():
@@ -145,6 +153,26 @@ def updateDomain(domainID):
     return jsonify(domain.fulldesc())
 
 
+@API.route(api.BaseRoute+"/system/domains", methods=["PATCH"])
+@secure(requireDB=True, authLevel="user")
+def patchDomains():
+    checkPermissions(OrgAdminPermission("*"))
+    from orm.domains import Domains
+    from orm.users import Users
+    permissions = request.auth["user"].permissions()
+
+    def apply(domain, patch):
+        if OrgAdminPermission(domain.orgID) not in permissions:
+            raise PermissionError("Insufficient permissions")
+        oldStatus = domain.domainStatus
+        domain.fromdict(patch)
+        if oldStatus != domain.domainStatus:
+            Users.query.filter(Users.domainID == domain.ID)\
+                       .update({Users.addressStatus: Users.addressStatus.op("&")(0xF)+(domain.domainStatus << 4)},
+                               synchronize_session=False)
+    return defaultBatchPatch(Domains, apply=apply)
+
+
 @API.route(api.BaseRoute+"/system/domains/<int:domainID>", methods=["DELETE"])
 @secure(requireDB=True)
 def deleteDomain(domainID):
@@ -7,12 +7,15 @@ from api.core import API, secure
 from api.security import checkPermissions
 
 from datetime import datetime
-from flask import jsonify, request
+from flask import Response, jsonify, request
 
 from tools.config import Config
 from tools.logs import LogReader
 from tools.permissions import SystemAdminROPermission
 
+maxStreamTimeout = 60  # Each open stream occupies a worker thread, clients reconnect with the last event ID
+
+
 @API.route(api.BaseRoute+"/system/logs", methods=["GET"])
 @secure()
 def getLogs():
@@ -30,4 +33,39 @@ def getLog(file):
     n = int(request.args.get("n", 10))
     skip = int(request.args.get("skip", 0))
     after = datetime.strptime(request.args["after"], "%Y-%m-%d %H:%M:%S.%f") if "after" in request.args else None
-    return jsonify(data=LogReader.tail(log.get("format", "journald"), log["source"], n, skip, after))
+    cursor = request.args.get("cursor", request.headers.get("Last-Event-ID"))
+    reader = LogReader.open(log.get("format", "journald"), log["source"])
+    try:
+        data = reader.tail(n, skip, after) if cursor is None else reader.follow(cursor, n)
+    except ValueError as err:
+        return jsonify(message=err.args[0]), 400
+    if request.args.get("stream") == "true":
+        return _streamLog(reader, data, n, min(float(request.args.get("timeout", 30)), maxStreamTimeout))
+    return jsonify(data=data, cursor=reader.cursor)
+
+
+def _streamLog(reader, data, n, timeout):
+    """Create server-sent events response pushing new log entries.
+
+    Each event contains a list of log entries, the event ID is the cursor of the last entry.
+    The stream is closed after `timeout` seconds, clients can resume by reconnecting with the last event ID.
+    """
+    import json
+    import time
+
+    def events():
+        entries = data
+        deadline = time.monotonic()+timeout
+        while True:
+            if entries:
+                yield "id: {}\ndata: {}\n\n".format(reader.cursor, json.dumps(entries, separators=(",", ":")))
+            else:
+                yield ":\n\n"  # Keep-alive
+            remaining = deadline-time.monotonic()
+            if remaining <= 0:
+                return
+            if len(entries) < n:  # Otherwise, more entries might be pending
+                reader.wait(min(remaining, 15))
+            entries = reader.follow(reader.cursor, n) if reader.cursor is not None else reader.tail(n)
+
+    return Response(events(), mimetype="text/event-stream", headers={"X-Accel-Buffering": "no"})
@@ -2,7 +2,6 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 # SPDX-FileCopyrightText: 2022 grommunio GmbH
 
-import json
 import subprocess
 
 from flask import jsonify, request
@@ -11,6 +10,7 @@ import api
 
 from api.core import API, secure
 from api.security import checkPermissions
+from tools.mailqueue import Snapshots
 from tools.permissions import SystemAdminROPermission, SystemAdminPermission
 
 
@@ -18,26 +18,32 @@ from tools.permissions import SystemAdminROPermission, SystemAdminPermission
 @secure()
 def getMailqData():
     checkPermissions(SystemAdminROPermission())
-    try:
-        postfixMailq = subprocess.run("mailq", stdout=subprocess.PIPE, universal_newlines=True).stdout
-    except Exception as err:
-        API.logger.error("Failed to run mailq: {} ({})"
-                         .format(type(err).__name__, " - ".join(str(arg) for arg in err.args)))
-        postfixMailq = "Failed to run mailq."
-    try:
-        gromoxMailq = subprocess.run("gromox-mailq", stdout=subprocess.PIPE, universal_newlines=True).stdout
-    except Exception as err:
-        API.logger.error("Failed to run gromox-mailq: {} ({})"
-                         .format(type(err).__name__, " - ".join(str(arg) for arg in err.args)))
-        gromoxMailq = ""
-    try:
-        postqueue = subprocess.run(["postqueue", "-j"], stdout=subprocess.PIPE, universal_newlines=True).stdout
-        postqueue = [json.loads(line) for line in postqueue.split("\n") if line]
-    except Exception as err:
-        API.logger.error("Failed to run postqueue: {} ({})"
-                         .format(type(err).__name__, " - ".join(str(arg) for arg in err.args)))
-        postqueue = []
-    return jsonify(postfixMailq=postfixMailq, gromoxMailq=gromoxMailq, postqueue=postqueue)
+    snapshot = Snapshots.get()
+    return jsonify(snapshot=snapshot.ID, postfixMailq=snapshot.postfixMailq, gromoxMailq=snapshot.gromoxMailq,
+                   postqueue=snapshot.postqueue)
+
+
+@API.route(api.BaseRoute+"/system/mailq/entries", methods=["GET"])
+@secure()
+def getMailqEntries():
+    checkPermissions(SystemAdminROPermission())
+    snapshot = Snapshots.get()
+    entries = snapshot.filter(request.args.get("queue"), request.args.get("sender"), request.args.get("recipient"))
+    offset = int(request.args.get("offset", 0))
+    limit = int(request.args.get("limit", 50))
+    return jsonify(snapshot=snapshot.ID, count=len(entries), data=entries[offset:offset+limit])
+
+
+@API.route(api.BaseRoute+"/system/mailq/delta", methods=["GET"])
+@secure()
+def getMailqDelta():
+    checkPermissions(SystemAdminROPermission())
+    snapshot = Snapshots.get()
+    previous = Snapshots.find(int(request.args["since"])) if "since" in request.args else None
+    if previous is None:
+        return jsonify(snapshot=snapshot.ID, reset=True, added=snapshot.postqueue, changed=[], removed=[])
+    added, changed, removed = snapshot.diff(previous)
+    return jsonify(snapshot=snapshot.ID, reset=False, added=added, changed=changed, removed=removed)
 
 
 @API.route(api.BaseRoute+"/system/mailq/flush", methods=["POST"])
@@ -54,6 +60,7 @@ def flushMailq():
         log("Postqueue (out): "+result.stdout)
     if result.stderr:
         log("Postqueue (err): "+result.stderr)
+    Snapshots.invalidate()
     if result.returncode:
         return jsonify(message="Call to postqueue failed ({})".format(result.returncode)), 500
     return jsonify(message="Success")
@@ -69,6 +76,7 @@ def postsuper(op):
         log("Postsuper (out): "+result.stdout)
     if result.stderr:
         log("Postsuper (err): "+result.stderr)
+    Snapshots.invalidate()
     return result
 
 
@@ -17,7 +17,6 @@ from tools.license import getLicense, updateCertificate
 from tools.permissions import SystemAdminPermission, SystemAdminROPermission
 
 import json
-import os
 import psutil
 import requests
 import shlex
@@ -32,33 +31,28 @@ from io import StringIO
 @secure()
 def getDashboard():
     checkPermissions(SystemAdminROPermission())
-    disks = []
-    for disk in psutil.disk_partitions():
-        try:
-            usage = psutil.disk_usage(disk.mountpoint)
-            stat = {"percent": usage.percent, "total": usage.total, "used": usage.used, "free": usage.free}
-            stat["device"] = disk.device
-            stat["mountpoint"] = disk.mountpoint
-            stat["filesystem"] = disk.fstype
-            disks.append(stat)
-        except:
-            pass
-    cpu = psutil.cpu_times_percent()
-    cpuPercent = dict(user=cpu.user, system=cpu.system, io=cpu.iowait, interrupt=cpu.irq+cpu.softirq, steal=cpu.steal,
-                      idle=cpu.idle)
-    vm = psutil.virtual_memory()
-    memory = dict(percent=vm.percent, total=vm.total, used=vm.used, buffer=vm.buffers, cache=vm.cached, free=vm.free,
-                  available=vm.available)
-    sm = psutil.swap_memory()
-    swap = dict(percent=sm.percent, total=sm.total, used=sm.used, free=sm.free)
-    return jsonify(disks=disks,
-                   load=os.getloadavg(),
-                   cpuPercent=cpuPercent,
-                   memory=memory,
-                   swap=swap,
+    from tools.sampler import Sampler
+    metrics = Sampler.latest()
+    return jsonify(disks=metrics["disks"],
+                   load=metrics["load"],
+                   cpuPercent=metrics["cpuPercent"],
+                   memory=metrics["memory"],
+                   swap=metrics["swap"],
                    booted=datetime.fromtimestamp(psutil.boot_time()).strftime("%Y-%m-%d %H:%M:%S"))
 
 
+@API.route(api.BaseRoute+"/system/dashboard/history", methods=["GET"])
+@secure()
+def getDashboardHistory():
+    checkPermissions(SystemAdminROPermission())
+    from tools.sampler import Sampler
+    limit = request.args.get("limit")
+    data = Sampler.history(None if limit is None else int(limit))
+    if request.args.get("disks", "false").lower() != "true":
+        data = [{key: value for key, value in sample.items() if key != "disks"} for sample in data]
+    return jsonify(interval=Sampler.interval, data=data)
+
+
 @API.route(api.BaseRoute+"/system/dashboard/services", methods=["GET"])
 @secure()
 def getDashboardServices():
@@ -104,6 +98,21 @@ def signalDashboardService(unit, action):
         return jsonify(message=msg or "Success"), 500 if msg else 201
 
 
+@API.route(api.BaseRoute+"/system/dashboard/transitions", methods=["GET"])
+@secure()
+def getDashboardTransitions():
+    checkPermissions(SystemAdminROPermission())
+    known = {service["unit"]: service.get("name", service["unit"].replace(".service", ""))
+             for service in Config["options"]["dashboard"]["services"]}
+    if len(known) == 0:
+        return jsonify(data=[])
+    with Service("systemd") as sysd:
+        transitions = sysd.getTransitions(*known)
+    for transition in transitions:
+        transition["name"] = known[transition["unit"]]
+    return jsonify(data=transitions)
+
+
 def dumpLicense():
     License = getLicense()
     try:
@@ -264,3 +273,42 @@ def getServerObject(ID):
         if server is not None and server.users+server.domains != 0:
             return jsonify(message="Cannot delete server with users or domains"), 400
     return defaultObjectHandler(Servers, ID, "")
+
+
+@API.route(api.BaseRoute+"/system/storage/usage", methods=["GET"])
+@secure(requireDB=True)
+def getStorageUsage():
+    checkPermissions(SystemAdminROPermission())
+    import sqlite3
+    from orm.domains import Domains
+    from orm.users import Users
+    from tools.diskusage import UsageIndex
+    partition = request.args.get("partition")
+    limit = int(request.args.get("limit", 50))
+    try:
+        with UsageIndex(readonly=True) as index:
+            data = index.top(limit, partition)
+            summary = index.summary()
+    except sqlite3.Error:
+        return jsonify(data=[], summary={})
+    paths = [entry["path"] for entry in data]
+    names = {user.maildir: user.username for user in
+             Users.query.with_entities(Users.maildir, Users.username).filter(Users.maildir.in_(paths))}
+    names.update({domain.homedir: domain.domainname for domain in
+                  Domains.query.with_entities(Domains.homedir, Domains.domainname).filter(Domains.homedir.in_(paths))})
+    for entry in data:
+        entry["name"] = names.get(entry["path"])
+    return jsonify(data=data, summary=summary)
+
+
+@API.route(api.BaseRoute+"/system/metrics", methods=["GET"])
+@secure(requireAuth="optional")
+def getMetrics():
+    if request.remote_addr not in Config["metrics"]["hosts"]:
+        checkPermissions(SystemAdminROPermission())
+    from tools.metrics import Metrics
+    if Metrics is None:
+        return jsonify(message="Metrics are disabled"), 503
+    response = make_response(Metrics.render())
+    response.headers.set("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+    return response
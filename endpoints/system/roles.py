@@ -10,9 +10,8 @@ from api.core import API, secure
 from api.security import checkPermissions
 
 from tools.constants import PropTags
-from tools.misc import createMapping
 from tools.permissions import Permissions, SystemAdminPermission, SystemAdminROPermission
-from .. import defaultListHandler, defaultObjectHandler
+from .. import cursorToken, defaultExport, defaultListHandler, defaultObjectHandler, streamList, streamRequested
 
 
 @API.route(api.BaseRoute+"/system/users", methods=["GET"])
@@ -21,26 +20,56 @@ def userListEndpointUnrestricted():
     checkPermissions(SystemAdminROPermission())
     from orm.users import Users, UserProperties
     verbosity = int(request.args.get("level", 1))
-    query, limit, offset, count = defaultListHandler(Users, (Users.ID != 0,), result="query")
+    try:
+        query, limit, offset, count = defaultListHandler(Users, (Users.ID != 0,), result="query")
+    except ValueError as err:
+        return jsonify(message=err.args[0]), 400
     sorts = request.args.getlist("sort")
-    for s in sorts:
+    for s in sorts if "cursor" not in request.args else ():
         sprop, sorder = s.split(",", 1) if "," in s else (s, "asc")
         if hasattr(PropTags, sprop.upper()):
             up = aliased(UserProperties)
             query = query.join(up, (up.userID == Users.ID) & (up.tag == getattr(PropTags, sprop.upper())))\
                          .order_by(up._propvalstr.desc() if sorder == "desc" else up._propvalstr.asc())
-    data = [user.todict(verbosity) for user in query.limit(limit).offset(offset).all()]
-    if verbosity < 2 and "properties" in request.args:
-        tags = [getattr(PropTags, prop.upper(), None) for prop in request.args["properties"].split(",")]
-        for user in data:
-            user["properties"] = {}
-        usermap = createMapping(data, lambda x: x["ID"])
-        properties = UserProperties.query.filter(UserProperties.userID.in_(usermap.keys()), UserProperties.tag.in_(tags)).all()
-        for prop in properties:
-            usermap[prop.userID]["properties"][prop.name] = prop.val
+
+    def serialize(users):
+        data = [user.todict(verbosity) for user in users]
+        if verbosity < 2 and "properties" in request.args:
+            tags = [getattr(PropTags, prop.upper(), None) for prop in request.args["properties"].split(",")]
+            properties = UserProperties.load([user["ID"] for user in data], tags)
+            for user in data:
+                user["properties"] = properties[user["ID"]]
+        return data
+
+    query = query.limit(limit).offset(offset)
+    if "cursor" not in request.args and streamRequested(count, limit, offset):
+        return streamList(Users, query, verbosity, serialize, {"count": count})
+    users = query.all()
+    data = serialize(users)
+    if "cursor" in request.args:
+        return jsonify(count=count, data=data, next=cursorToken(Users, users, limit))
     return jsonify(count=count, data=data)
 
 
+@API.route(api.BaseRoute+"/system/users/export", methods=["GET"])
+@secure(requireDB=True)
+def userExportUnrestricted():
+    checkPermissions(SystemAdminROPermission())
+    from orm.users import Users, UserProperties
+    props = [prop for prop in request.args.get("properties", "").split(",") if prop]
+    unknown = [prop for prop in props if not hasattr(PropTags, prop.upper())]
+    if unknown:
+        return jsonify(message="Unknown properties: "+", ".join(unknown)), 400
+    tags = [getattr(PropTags, prop.upper()) for prop in props]
+
+    def addProperties(users, data):
+        properties = UserProperties.load([user.ID for user in users], tags)
+        for user, entry in zip(users, data):
+            entry["properties"] = properties[user.ID]
+    return defaultExport(Users, "users", (Users.ID != 0,), ("chat", "chatAdmin", "properties"),
+                         ["properties."+prop.lower() for prop in props], addProperties if tags else None)
+
+
 @API.route(api.BaseRoute+"/system/roles/permissions", methods=["GET"])
 @secure()
 def getAdminPermissions():
@@ -25,6 +25,8 @@ else:
     error = config.validate()
     if error:
         raise TypeError("Invalid configuration found - aborting ({})".format(error))
+    from api.core import validator
+    validator.precompile(API)
     if not config.Config["tasq"].get("disabled", False):
         import uwsgi
         import uwsgidecorators
@@ -11,17 +11,29 @@ from sqlalchemy.orm import scoped_session, sessionmaker, class_mapper, Query, co
 
 from tools.config import Config
 
+from functools import lru_cache
+
 import logging
+import re
 logger = logging.getLogger("mysql")
 
+_fingerprintRe = ((re.compile(r"'(?:[^'\\]|\\.)*'"), "?"),
+                  (re.compile(r"%\(\w+\)s|%s|\b\d+(?:\.\d+)?\b"), "?"),
+                  (re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)"), "(?, ...)"),
+                  (re.compile(r"\s+"), " "))
+
 
 class DBConn:
     def __init__(self, URI):
         import threading
         self.engine = create_engine(URI, pool_recycle=Config["DB"]["sessionTimout"])
         self.session = scoped_session(sessionmaker(self.engine), threading.get_ident)
+        self._queryStats = None
+        self._instrument = False
         self.__version = None
         self.__maxversion = 0
+        if Config["DB"]["instrument"]["enabled"]:
+            self.enableQueryStats(True)
         self.initVersion()
 
     def __reinit(self):
@@ -42,9 +54,141 @@ class DBConn:
         def removeSession(*args, **kwargs):
             self.session.remove()
 
+    def enableQueryStats(self, instrument=False):
+        """Track number and duration of executed queries per thread.
+
+        In instrumentation mode, queries are additionally grouped by their normalized SQL (see `fingerprint`) and
+        queries exceeding the `DB.instrument.slowQuery` threshold are logged.
+
+        Parameters
+        ----------
+        instrument : bool, optional
+            Enable instrumentation mode. The default is False.
+        """
+        import threading
+        import time
+        self._instrument = self._instrument or instrument
+        if self._queryStats is not None:
+            return
+        self._queryStats = stats = threading.local()
+        conf = Config["DB"]["instrument"]
+
+        def before(conn, cursor, statement, parameters, context, executemany):
+            stats.start = time.perf_counter()
+
+        def after(conn, cursor, statement, parameters, context, executemany):
+            duration = time.perf_counter()-stats.start
+            stats.count = getattr(stats, "count", 0)+1
+            stats.duration = getattr(stats, "duration", 0)+duration
+            if not self._instrument:
+                return
+            fingerprint = self.fingerprint(statement)
+            queries = getattr(stats, "queries", None)
+            if queries is None:
+                queries = stats.queries = {}
+            entry = queries.get(fingerprint)
+            if entry is None:
+                entry = queries[fingerprint] = [0, 0]
+            entry[0] += 1
+            entry[1] += duration
+            if duration >= conf["slowQuery"]:
+                logger.warning("Slow query ({:.1f} ms): {}".format(duration*1000, fingerprint))
+
+        event.listen(self.engine, "before_cursor_execute", before)
+        event.listen(self.engine, "after_cursor_execute", after)
+
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def fingerprint(statement):
+        """Normalize SQL statement.
+
+        Literals and bind parameters are replaced by `?`, lists of parameters are collapsed
+        and whitespace is normalized, so that identical queries with different parameters produce the same result.
+
+        Parameters
+        ----------
+        statement : str
+            SQL statement
+
+        Returns
+        -------
+        str
+            Normalized statement
+        """
+        for regex, replacement in _fingerprintRe:
+            statement = regex.sub(replacement, statement)
+        return statement.strip()
+
+    def resetQueryStats(self):
+        """Reset query statistics of the current thread."""
+        if self._queryStats is not None:
+            self._queryStats.count = self._queryStats.duration = 0
+            self._queryStats.queries = {}
+
+    def queryStats(self):
+        """Get query statistics of the current thread.
+
+        Returns
+        -------
+        tuple
+            Number and total duration (in seconds) of queries executed since the last reset,
+            or None if tracking is disabled
+        """
+        if self._queryStats is None:
+            return None
+        return getattr(self._queryStats, "count", 0), getattr(self._queryStats, "duration", 0)
+
+    def checkQueries(self, context, duration=None):
+        """Check queries executed by the current thread since the last reset.
+
+        Logs a warning if the number or duration of queries exceeds the configured thresholds
+        or if identical queries were executed repeatedly (likely N+1 pattern).
+        Has no effect if instrumentation mode is disabled.
+
+        Parameters
+        ----------
+        context : str
+            Description of the operation (e.g. request method and route)
+        duration : float, optional
+            Total duration of the operation, checked against the `slowRequest` threshold. If omitted, the total
+            query time is used. The default is None.
+
+        Returns
+        -------
+        list of tuple
+            Fingerprints, number of executions and total duration of repeated queries
+        """
+        if not self._instrument or self._queryStats is None:
+            return []
+        conf = Config["DB"]["instrument"]
+        count, total = self.queryStats()
+        duration = total if duration is None else duration
+        queries = getattr(self._queryStats, "queries", {})
+        repeated = sorted(((fingerprint, entry[0], entry[1]) for fingerprint, entry in queries.items()
+                           if entry[0] >= conf["repeatThreshold"]), key=lambda item: -item[1])
+        if count > conf["maxQueries"] or duration >= conf["slowRequest"] or repeated:
+            logger.warning("{}: {} queries in {:.1f} ms (total {:.1f} ms){}"
+                           .format(context, count, total*1000, duration*1000,
+                                   "".join("\n  possible N+1: {}x ({:.1f} ms) {}".format(num, spent*1000, fingerprint)
+                                           for fingerprint, num, spent in repeated)))
+        return repeated
+
+    def afterFork(self):
+        """Detach from connections inherited from the parent process.
+
+        Must be called in a forked child process before accessing the database.
+        Inherited connections are left open, as closing them would also terminate them for the parent.
+        """
+        self.session.registry.registry = {}
+        try:
+            self.engine.dispose(close=False)
+        except TypeError:  # SQLAlchemy < 1.4.33
+            self.__inheritedPool = self.engine.pool
+            self.engine.pool = self.engine.pool.recreate()
+
     def testConnection(self, verbose=False):
         try:
-            self.session.execute("SELECT 1 FROM DUAL")
+            self.session.execute("SELECT 1")
         except OperationalError as err:
             self.session.remove()
             return "Database connection failed with error {}: {}".format(err.orig.args[0], err.orig.args[1])
@@ -137,6 +281,8 @@ def _loadDBConfig():
         logger.error("No database configuration found")
         return None
     DBconf = Config["DB"]
+    if "uri" in DBconf:
+        return DBconf["uri"]
     if "user" not in DBconf or "pass" not in DBconf:
         logger.error("Database user or password missing")
         return None
@@ -219,6 +365,22 @@ def OptionalC(version, default, column):
     return column if DB.minVersion(version) else column_property(select([text(default)]).as_scalar())
 
 
+def invalidateAuth(username=None):
+    """Drop cached authentication data.
+
+    Has no effect if the API security module is not loaded (e.g. when running the CLI).
+
+    Parameters
+    ----------
+    username : str, optional
+        Only invalidate entries of this user. If None, all entries are dropped. The default is None.
+    """
+    import sys
+    security = sys.modules.get("api.security")
+    if security is not None:
+        security.invalidateAuth(username)
+
+
 class NotifyTable:
     """Helper class tracking inserts and deletes.
 
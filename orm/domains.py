@@ -2,8 +2,8 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 # SPDX-FileCopyrightText: 2021 grommunio GmbH
 
-from . import DB, OptionalC, OptionalNC, NotifyTable
-from tools import formats
+from . import DB, OptionalC, OptionalNC, NotifyTable, invalidateAuth
+from tools import formats, search
 from tools.DataModel import DataModel, Id, Text, Int, Date, RefProp
 from tools.DataModel import InvalidAttributeError, MismatchROError, MissingRequiredAttributeError
 from services import Service
@@ -276,6 +276,8 @@ class Domains(DataModel, DB.Base, NotifyTable):
     @validates("_syncPolicy")
     def triggerSyncPolicyUpdate(self, key, value, *args):
         if value != self._syncPolicy:
+            from .users import syncPolicyCache
+            syncPolicyCache.discard(lambda username, entry: entry["domainID"] == self.ID)
             users = ["grommunio-sync:policycache-"+user.username
                      for user in Users.query.with_entities(Users.username).filter(Users.domainID == self.ID)]
             if len(users) > 0:
@@ -294,6 +296,7 @@ class Domains(DataModel, DB.Base, NotifyTable):
         Users.query.filter(Users.domainID == self.ID)\
                    .update({Users.addressStatus: Users.addressStatus.op("&")(0xF) + (self.DELETED << 4)},
                            synchronize_session=False)
+        invalidateAuth()
 
     def recover(self):
         from .users import Users
@@ -301,6 +304,7 @@ class Domains(DataModel, DB.Base, NotifyTable):
         Users.query.filter(Users.domainID == self.ID)\
                    .update({Users.addressStatus: Users.addressStatus.op("&")(0xF) + (self.NORMAL << 4)},
                            synchronize_session=False)
+        invalidateAuth()
 
     def purge(self, deleteFiles=False, printStatus=False):
         from .classes import Classes, Hierarchy, Members
@@ -430,3 +434,4 @@ else:
                                                   .as_scalar()))
 
 Domains.NTregister()
+search.track(Domains)
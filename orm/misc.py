@@ -78,6 +78,30 @@ class DBConf(DB.Base):
                             .with_entities(DBConf.value).first()
         return default if entry is None else entry.value
 
+    @staticmethod
+    def setValue(service, file, key, value):
+        """Set single config value.
+
+        Creates the entry if it does not exist.
+        Changes are not committed.
+
+        Parameters
+        ----------
+        service : str
+            Service name
+        file : str
+            File name
+        key : str
+            Configuration key
+        value : str
+            New value
+        """
+        entry = DBConf.query.filter(DBConf.service == service, DBConf.file == file, DBConf.key == key).first()
+        if entry is None:
+            DB.session.add(DBConf(service=service, file=file, key=key, value=value))
+        else:
+            entry.value = value
+
     @staticmethod
     def setFile(service, file, data):
         """Write key-value mapping to config file.
@@ -4,13 +4,13 @@
 
 import json
 
-from sqlalchemy import Column, ForeignKey
+from sqlalchemy import Column, ForeignKey, event
 from sqlalchemy.dialects.mysql import INTEGER, TEXT, VARCHAR
 from sqlalchemy.orm import relationship
 
 from tools.DataModel import DataModel, Id, Int, RefProp, Text
 
-from . import DB
+from . import DB, invalidateAuth
 
 
 class AdminRoles(DataModel, DB.Base):
@@ -82,4 +82,13 @@ class AdminUserRoleRelation(DataModel, DB.Base):
         else:
             self.role = role
 
+
+def _invalidateAuth(*args, **kwargs):
+    invalidateAuth()
+
+
+for _table in (AdminRolePermissionRelation, AdminUserRoleRelation):
+    for _event in ("after_insert", "after_update", "after_delete"):
+        event.listen(_table, _event, _invalidateAuth)
+
 from .users import Users
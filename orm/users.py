@@ -2,12 +2,14 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 # SPDX-FileCopyrightText: 2020-2021 grommunio GmbH
 
-from . import DB, OptionalC, OptionalNC, NotifyTable, logger
+from . import DB, OptionalC, OptionalNC, NotifyTable, invalidateAuth, logger
 from services import Service
-from tools import formats
+from tools import formats, search
+from tools.config import Config
 from tools.constants import PropTags, PropTypes
 from tools.DataModel import DataModel, Id, Text, Int, BoolP, RefProp, Bool, Date
 from tools.DataModel import InvalidAttributeError, MismatchROError, MissingRequiredAttributeError
+from tools.misc import TTLCache
 from tools.rop import nxTime
 
 from sqlalchemy import Column, ForeignKey, event, func, inspect, select
@@ -21,6 +23,9 @@ import json
 import sys
 
 from datetime import datetime
+from functools import lru_cache
+
+syncPolicyCache = TTLCache(Config["sync"].get("policyCacheSize", 4096), Config["sync"].get("policyCacheTTL", 60))
 
 # Was moved in SQLA 1.4
 import sqlalchemy
@@ -221,19 +226,40 @@ class Users(DataModel, DB.Base, NotifyTable):
     _propcache = None
 
     @staticmethod
-    def checkCreateParams(data):
+    def checkCreateParams(data, checkLimits=True, domains=None):
+        """Check and complete user creation parameters.
+
+        Parameters
+        ----------
+        data : dict
+            User data. Domain information and default properties are added.
+        checkLimits : bool, optional
+            Check license and domain user limits. The default is True.
+        domains : dict, optional
+            Cache for domain lookups, shared between multiple calls. The default is None.
+
+        Returns
+        -------
+        str
+            Error message or None if the parameters are valid
+        """
         from orm.domains import Domains
         from tools.license import getLicense
         if "username" not in data:
             return "Missing username"
-        if data.get("status", 0) != Users.SHARED and Users.count() >= getLicense().users:
+        if checkLimits and data.get("status", 0) != Users.SHARED and Users.count() >= getLicense().users:
             return "License user limit exceeded"
         if "domainID" in data:
-            domain = Domains.query.filter(Domains.ID == data.get("domainID")).first()
+            key, condition = ("ID", data["domainID"]), Domains.ID == data.get("domainID")
         elif "@" in data["username"]:
-            domain = Domains.query.filter(Domains.domainname == data["username"].split("@")[1]).first()
+            key = ("name", data["username"].split("@")[1])
+            condition = Domains.domainname == key[1]
         else:
-            domain = None
+            key = condition = None
+        domains = {} if domains is None else domains
+        if key is not None and key not in domains:
+            domains[key] = Domains.query.filter(condition).first()
+        domain = domains.get(key)
         if domain is None:
             return "Invalid domain"
         if data.get("status") != Users.CONTACT:
@@ -245,8 +271,7 @@ class Users(DataModel, DB.Base, NotifyTable):
                 data["username"] += "@"+domain.domainname
         data["domain"] = domain
         data["domainID"] = domain.ID
-        domainUsers = Users.count(Users.domainID == domain.ID)
-        if domain.maxUser <= domainUsers:
+        if checkLimits and domain.maxUser <= Users.count(Users.domainID == domain.ID):
             return "Maximum number of domain users reached"
         data["domainStatus"] = domain.domainStatus
         if "properties" not in data:
@@ -329,12 +354,16 @@ class Users(DataModel, DB.Base, NotifyTable):
 
     @password.setter
     def password(self, pw):
+        self._password = self.hashPassword(pw)
+
+    @staticmethod
+    def hashPassword(pw):
         # On OpenBSD only blowfish is supported
         if sys.platform.startswith("openbsd"):
             _method = crypt.METHOD_BLOWFISH
         else:
             _method = crypt.METHOD_SHA512
-        self._password = crypt.crypt(pw, crypt.mksalt(_method))
+        return crypt.crypt(pw, crypt.mksalt(_method))
 
     def chkPw(self, pw):
         return crypt.crypt(pw, self.password) == self.password
@@ -568,10 +597,59 @@ class Users(DataModel, DB.Base, NotifyTable):
     @validates("_syncPolicy")
     def triggerSyncPolicyUpdate(self, key, value, *args):
         if value != self._syncPolicy:
+            syncPolicyCache.pop(self.username.lower())
             with Service("redis", errors=Service.SUPPRESS_INOP) as r:
                 r.delete("grommunio-sync:policycache-"+self.username)
         return value
 
+    @staticmethod
+    def mergedSyncPolicy(username):
+        """Get effective sync policy of a user.
+
+        The policy is merged from the default, domain and user policy.
+        Results are cached per process (case insensitive, matching the username collation) and invalidated when the
+        domain or user policy changes. Malformed stored policies are ignored.
+
+        Parameters
+        ----------
+        username : str
+            Name of the user
+
+        Returns
+        -------
+        dict
+            Dictionary containing the domainID and the merged policy, or None if the user does not exist
+        """
+        cached = syncPolicyCache.get(username.lower())
+        if cached is not None:
+            return cached
+        from .domains import Domains
+        row = Users.query.outerjoin(Domains, Domains.ID == Users.domainID)\
+                         .filter(Users.username == username)\
+                         .with_entities(Users.domainID, Users._syncPolicy, Domains._syncPolicy.label("domainPolicy"))\
+                         .first()
+        if row is None:
+            return None
+        def decode(value):
+            try:
+                value = json.loads(value)
+            except Exception:
+                return {}
+            return value if isinstance(value, dict) else {}
+
+        policy = dict(Config["sync"]["defaultPolicy"])
+        policy.update(decode(row.domainPolicy))
+        policy.update(decode(row._syncPolicy))
+        cached = {"domainID": row.domainID, "policy": policy}
+        syncPolicyCache.put(username.lower(), cached)
+        return cached
+
+    @validates("_password", "addressStatus")
+    def triggerAuthUpdate(self, key, value, *args):
+        if self.username is not None and value != getattr(self, key):
+            invalidateAuth(self.username)
+        return value
+
     @validates("homeserverID")
     def checkHomeserver(self, key, value, *args):
         from tools.config import Config
@@ -671,6 +749,157 @@ class Users(DataModel, DB.Base, NotifyTable):
             DB.session.rollback()
             return "Failed to create user "+" - ".join(str(arg) for arg in err.args), 500
 
+    @staticmethod
+    def createBulk(records, sync=True, batchSize=100, workers=4, progress=None, passwordHashes=None):
+        """Create multiple users.
+
+        All records are validated before any user is inserted. Valid users are inserted in batches,
+        their stores are created in parallel by a pool of `workers` threads.
+        If stores are not created by gromox-mkprivate, a pre-initialized template store is used.
+
+        Instead of `password`, hashes created by `hashPassword` can be passed separately in `passwordHashes`, so that
+        plain text passwords do not need to be stored when creating users in a background task. Hashes contained in
+        the records themselves are ignored.
+
+        Parameters
+        ----------
+        records : list of dict
+            User data as accepted by `create`
+        sync : bool, optional
+            Write user properties to the store after creation. The default is True.
+        batchSize : int, optional
+            Number of users to insert per commit. The default is 100.
+        workers : int, optional
+            Number of stores to set up in parallel. The default is 4.
+        progress : function, optional
+            Function called with the number of processed records after each batch of stores. The default is None.
+        passwordHashes : list of str, optional
+            Password hash for each record or None to use the `password` of the record. The default is None.
+
+        Returns
+        -------
+        list of dict
+            Status (ID, username, code and message) for each record, in order of the input
+        """
+        from .misc import Servers
+        from concurrent.futures import ThreadPoolExecutor
+        from tools.license import getLicense
+        from tools.misc import GenericObject
+        from tools.storage import UserSetup, UserTemplate
+
+        def fail(index, message, code=400):
+            status[index] = dict(username=records[index].get("username"), code=code, message=message)
+
+        def discard(user):
+            if user in DB.session:
+                DB.session.expunge(user)
+
+        def setup(user):
+            with UserSetup(user, None, template) as us:
+                us.run()
+            return us
+
+        status = [None]*len(records)
+        pending = []
+        maxUsers, userCount = getLicense().users, Users.count()
+        domains, domainCounts = {}, {}
+        usernames = set()
+        for index, props in enumerate(records):
+            if props.get("status") == Users.CONTACT:
+                fail(index, "Cannot create contacts in bulk")
+                continue
+            error = Users.checkCreateParams(props, False, domains)
+            if error is not None:
+                fail(index, error)
+                continue
+            if props["username"] in usernames:
+                fail(index, "Duplicate username")
+                continue
+            domain = props["domain"]
+            if domain.ID not in domainCounts:
+                domainCounts[domain.ID] = Users.count(Users.domainID == domain.ID)
+            if props.get("status", 0) != Users.SHARED and userCount >= maxUsers:
+                fail(index, "License user limit exceeded")
+                continue
+            if domain.maxUser <= domainCounts[domain.ID]:
+                fail(index, "Maximum number of domain users reached")
+                continue
+            chat, homeserver = props.pop("chat", None), props.get("homeserver")
+            props.pop("passwordHash", None)
+            passwordHash = passwordHashes[index] if passwordHashes else None
+            try:
+                user = Users(props)
+            except (InvalidAttributeError, MismatchROError, MissingRequiredAttributeError, ValueError) as err:
+                fail(index, err.args[0])
+                continue
+            if passwordHash is not None:
+                user._password = passwordHash
+            discard(user)
+            usernames.add(user.username)
+            userCount += props.get("status", 0) != Users.SHARED
+            domainCounts[domain.ID] += 1
+            pending.append((index, user, chat, homeserver))
+        existing = {user.username for user in Users.query.filter(Users.username.in_(usernames)).with_entities(Users.username)}
+        for index, user, _, _ in pending:
+            if user.username in existing:
+                fail(index, "User already exists", 409)
+        pending = [entry for entry in pending if entry[1].username not in existing]
+
+        Aliases.NTactive(False)
+        Users.NTactive(False)
+        created = []
+        for offset in range(0, len(pending), batchSize):
+            for index, user, chat, homeserver in pending[offset:offset+batchSize]:
+                try:
+                    with DB.session.begin_nested():
+                        DB.session.add(user)
+                        DB.session.flush()
+                        user.homeserverID, user.maildir = Servers.allocUser(user.ID, homeserver)
+                    created.append((index, user, chat))
+                except IntegrityError as err:
+                    fail(index, "Object violates database constraints "+err.orig.args[1])
+            DB.session.commit()
+
+        template = UserTemplate.create()
+        try:
+            for offset in range(0, len(created), batchSize):
+                batch = created[offset:offset+batchSize]
+                stores = [GenericObject(ID=user.ID, username=user.username, maildir=user.maildir) for _, user, _ in batch]
+                with ThreadPoolExecutor(workers, thread_name_prefix="UserSetup") as executor:
+                    setups = list(executor.map(setup, stores))
+                for (index, user, chat), store, us in zip(batch, stores, setups):
+                    user.maildir = store.maildir
+                    if chat:
+                        try:
+                            user.chat = chat
+                        except ValueError as err:
+                            logger.error("Failed to activate chat: "+err.args[0])
+                    if us.success:
+                        status[index] = dict(ID=user.ID, username=user.username, code=201, message="User created")
+                    else:
+                        fail(index, "Error during user setup: "+us.error, us.errorCode)
+                        status[index]["ID"] = user.ID
+                DB.session.commit()
+                if progress is not None:
+                    progress(len(records)-len(created)+offset+len(batch))
+        finally:
+            if template is not None:
+                template.close()
+            Aliases.NTactive(True)
+            Users.NTactive(True)
+            if created:
+                Users.NTtouch()
+                DB.session.commit()
+
+        if sync:
+            for index, user, _ in created:
+                if status[index]["code"] == 201:
+                    try:
+                        user.syncStore()
+                    except Exception:
+                        pass
+        return status
+
     @classmethod
     def mkContact(cls, props, externID=None, *args, **kwargs):
         smtpaddress = props.get("username")
@@ -706,6 +935,8 @@ class Users(DataModel, DB.Base, NotifyTable):
 
     @validates("username")
     def usernameUpdateHook(self, key, value, *args):
+        if self.username is not None:
+            syncPolicyCache.pop(self.username.lower())
         self.primaryEmail = value
         return value
 
@@ -771,13 +1002,73 @@ class UserProperties(DB.Base):
     def baseType(self):
         return self.tag & 0x0FFF
 
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def converter(tag):
+        """Get function converting the raw column values of a tag.
+
+        Parameters
+        ----------
+        tag : int
+            Property tag
+
+        Returns
+        -------
+        function
+            Function taking the string and binary column values and returning the property value
+        """
+        proptype = tag & 0xFFFF
+        if proptype == PropTypes.BINARY:
+            return lambda string, binary: binary
+        if proptype == PropTypes.FILETIME:
+            return lambda string, binary: datetime.fromtimestamp(nxTime(int(string))).strftime("%Y-%m-%d %H:%M:%S")
+        pyType = PropTypes.pyType(proptype)
+        return lambda string, binary: pyType(string)
+
+    @classmethod
+    def load(cls, userIDs, tags, chunkSize=5000):
+        """Load properties of multiple users.
+
+        Fetches the requested properties of all users with a single query per `chunkSize` users. Values are converted
+        to the property type and multi-value properties are returned as lists.
+
+        Parameters
+        ----------
+        userIDs : Collection of int
+            IDs of the users
+        tags : Collection of int
+            Tags of the properties to load. Unknown tags (None) are ignored.
+        chunkSize : int, optional
+            Maximum number of users to load per query. The default is 5000.
+
+        Returns
+        -------
+        dict
+            Mapping of user ID to a dict containing the (lower case) property names and values. Every requested user
+            is included, even if it has none of the properties.
+        """
+        tags = {tag for tag in tags if tag is not None}
+        userIDs = list(userIDs)
+        result = {ID: {} for ID in userIDs}
+        if not tags:
+            return result
+        converters = {tag: cls.converter(tag) for tag in tags}
+        names = {tag: (PropTags.lookup(tag, None) or "<unknown>").lower() for tag in tags}
+        for start in range(0, len(userIDs), chunkSize):
+            rows = DB.session.query(cls.userID, cls.tag, cls._propvalstr, cls._propvalbin)\
+                .filter(cls.userID.in_(userIDs[start:start+chunkSize]), cls.tag.in_(tags))\
+                .order_by(cls.userID, cls.tag, cls.orderID)
+            for userID, tag, string, binary in rows:
+                value = converters[tag](string, binary)
+                if PropTypes.ismv(tag):
+                    result[userID].setdefault(names[tag], []).append(value)
+                else:
+                    result[userID][names[tag]] = value
+        return result
+
     @property
     def val(self):
-        if self.type == PropTypes.BINARY:
-            return self._propvalbin
-        if self.type == PropTypes.FILETIME:
-            return datetime.fromtimestamp(nxTime(int(self._propvalstr))).strftime("%Y-%m-%d %H:%M:%S")
-        return PropTypes.pyType(self.type)(self._propvalstr)
+        return self.converter(self.tag)(self._propvalstr, self._propvalbin)
 
     @val.setter
     def val(self, value):
@@ -986,6 +1277,7 @@ from . import misc, roles
 
 Users.NTregister()
 Aliases.NTregister()
+search.track(Users)
 
 if sqlalchemy.__version__.split(".") >= ["1", "4"]:
     inspect(Users).add_property("orgID", column_property(select(Domains.orgID)
@@ -995,6 +1287,12 @@ else:
                                                          .where(Domains.ID == Users.domainID).as_scalar()))
 
 
+@event.listens_for(Users, "after_delete")
+def _User_delete(mapper, connection, target):
+    invalidateAuth(target.username)
+    syncPolicyCache.pop(target.username.lower())
+
+
 @event.listens_for(Users, "expire")
 def _User_expire(target, *args, **kwargs):
     if target is not None:
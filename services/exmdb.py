@@ -2,7 +2,11 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 # SPDX-FileCopyrightText: 2021 grommunio GmbH
 
-from . import ServiceHub
+from . import ServiceHub, ServiceUnavailableError
+
+import threading
+import time
+import weakref
 
 
 def exmdbHandleException(service, error):
@@ -10,17 +14,199 @@ def exmdbHandleException(service, error):
         return ServiceHub.UNAVAILABLE, error.args[0]
 
 
+class ClientPool:
+    """Per-process pool of exmdb clients.
+
+    Clients are keyed by (host, port, homedir, isPrivate) and leased exclusively to one user at a time.
+    A client is returned to the pool once its lease object is garbage collected,
+    unless a connection or protocol error occurred while it was in use.
+    Idle clients are discarded after `idleTimeout` seconds.
+    """
+    def __init__(self, factory, maxsize=16, idleTimeout=60, waitTimeout=5):
+        """Initialize pool.
+
+        Parameters
+        ----------
+        factory : callable
+            Function creating a new client from (host, port, homedir, isPrivate)
+        maxsize : int, optional
+            Maximum number of open (idle or leased) clients. The default is 16.
+        idleTimeout : float, optional
+            Number of seconds after which idle clients are closed. The default is 60.
+        waitTimeout : float, optional
+            Maximum number of seconds to wait for a client if the pool is exhausted. The default is 5.
+        """
+        self.factory = factory
+        self.maxsize = maxsize
+        self.idleTimeout = idleTimeout
+        self.waitTimeout = waitTimeout
+        self._idle = {}
+        self._leased = 0
+        self._cond = threading.Condition()
+        self._stats = {"created": 0, "reused": 0, "evicted": 0, "broken": 0}
+
+    def _idleCount(self):
+        return sum(len(clients) for clients in self._idle.values())
+
+    def _evict(self, now):
+        """Drop expired idle clients. Must be called with the lock held."""
+        for key in list(self._idle):
+            clients = [(client, last) for client, last in self._idle[key] if now-last < self.idleTimeout]
+            self._stats["evicted"] += len(self._idle[key])-len(clients)
+            if clients:
+                self._idle[key] = clients
+            else:
+                del self._idle[key]
+
+    def _dropOldest(self):
+        """Close the least recently used idle client. Must be called with the lock held."""
+        key = min(self._idle, key=lambda key: self._idle[key][0][1])
+        self._idle[key].pop(0)
+        if not self._idle[key]:
+            del self._idle[key]
+        self._stats["evicted"] += 1
+
+    def acquire(self, key):
+        """Lease a client.
+
+        Parameters
+        ----------
+        key : tuple
+            (host, port, homedir, isPrivate) tuple
+
+        Raises
+        ------
+        ServiceUnavailableError
+            No client became available within the wait timeout.
+
+        Returns
+        -------
+        tuple
+            Client and a bool indicating whether the client was reused
+        """
+        deadline = time.monotonic()+self.waitTimeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._evict(now)
+                if self._idle.get(key):
+                    client, _ = self._idle[key].pop()
+                    if not self._idle[key]:
+                        del self._idle[key]
+                    self._leased += 1
+                    self._stats["reused"] += 1
+                    return client, True
+                if self._leased+self._idleCount() >= self.maxsize and self._idle:
+                    self._dropOldest()
+                if self._leased < self.maxsize:
+                    self._leased += 1
+                    break
+                if now >= deadline or not self._cond.wait(deadline-now):
+                    raise ServiceUnavailableError("Exmdb connection limit reached")
+        try:
+            client = self.factory(*key)
+        except BaseException:
+            self.release(key, None)
+            raise
+        with self._cond:
+            self._stats["created"] += 1
+        return client, False
+
+    def release(self, key, client):
+        """Return leased client to the pool.
+
+        Parameters
+        ----------
+        key : tuple
+            Key the client was acquired with
+        client : pyexmdb.ExmdbQueries
+            Client to return, or None if the client is unusable and should be discarded
+        """
+        with self._cond:
+            self._leased -= 1
+            if client is None:
+                self._stats["broken"] += 1
+            else:
+                self._idle.setdefault(key, []).append((client, time.monotonic()))
+            self._cond.notify()
+
+    def clear(self):
+        """Close all idle clients."""
+        with self._cond:
+            self._idle.clear()
+
+    def stats(self):
+        """Get pool statistics.
+
+        Returns
+        -------
+        dict
+            Number of leased and idle clients and event counters
+        """
+        with self._cond:
+            return dict(self._stats, leased=self._leased, idle=self._idleCount())
+
+
+class _Lease:
+    """Exclusive use of a pooled client."""
+    def __init__(self, pool, key):
+        self.client, self.reused = pool.acquire(key)
+        self.pool, self.key = pool, key
+        self._finalizer = weakref.finalize(self, pool.release, key, self.client)
+
+    def discard(self):
+        """Close the client instead of returning it to the pool."""
+        if self._finalizer.detach() is not None:
+            self.pool.release(self.key, None)
+
+    def renew(self):
+        """Replace the client with a new connection."""
+        self.discard()
+        self.client, self.reused = self.pool.acquire(self.key)
+        self._finalizer = weakref.finalize(self, self.pool.release, self.key, self.client)
+
+
 @ServiceHub.register("exmdb", exmdbHandleException)
 class ExmdbService:
-    class _BoundClient:
-        def __init__(self, exmdb, host, port, homedir, isPrivate):
+    class _PooledClient:
+        """Proxy for a pooled exmdb client.
+
+        If `bound` is True, the homedir is automatically inserted as first argument of each method call.
+
+        Connections that fail with a connection or protocol error are discarded.
+        If a reused connection fails with a connection error, read-only calls (listed in `retryable`) are retried once
+        with a new connection. As the request might already have been processed by the server, these calls can be
+        executed twice. `resolveNamedProperties` may create property IDs, but returns the same IDs when repeated.
+        All other calls are never retried, the connection error is passed to the caller.
+        """
+        retryable = frozenset(("getAllStoreProperties", "getFolderMemberList", "getFolderProperties",
+                               "getStoreProperties", "getSyncData", "listFolders", "resolveNamedProperties"))
+
+        def __init__(self, exmdb, host, port, homedir, isPrivate, bound=True):
+            self.__exmdb = exmdb
             self.__homedir = homedir
-            self.__client = exmdb.ExmdbQueries(host, port, homedir, isPrivate)
+            self.__bound = bound
+            self.__lease = _Lease(exmdb.pool, (host, port, homedir, isPrivate))
+
+        def __call(self, attr, *args, **kwargs):
+            lease = self.__lease
+            args = (self.__homedir,)+args if self.__bound else args
+            try:
+                return getattr(lease.client, attr)(*args, **kwargs)
+            except self.__exmdb.ConnectionError:
+                if not lease.reused or attr not in self.retryable:
+                    lease.discard()
+                    raise
+                lease.renew()
+            except self.__exmdb.ExmdbProtocolError:
+                lease.discard()
+                raise
+            return getattr(lease.client, attr)(*args, **kwargs)
 
         def __getattr__(self, attr):
-            target = getattr(self.__client, attr)
+            target = getattr(self.__lease.client, attr)
             if callable(target):
-                return lambda *args, **kwargs: target(self.__homedir, *args, **kwargs)
+                return lambda *args, **kwargs: self.__call(attr, *args, **kwargs)
             return target
 
     __loaded = False
@@ -49,25 +235,33 @@ class ExmdbService:
 
         cls.host = Config["options"].get("exmdbHost", "::1")
         cls.port = Config["options"].get("exmdbPort", "5000")
+        cls.pool = ClientPool(pyexmdb.ExmdbQueries,
+                              Config["options"].get("exmdbPoolSize", 16),
+                              Config["options"].get("exmdbPoolIdle", 60),
+                              Config["options"].get("exmdbPoolTimeout", 5))
         cls.pyexmdb = pyexmdb
-        cls.loaded = True
+        cls.__loaded = True
 
-    def client(self, homedir, isPrivate):
+    def client(self, homedir, isPrivate, host=None):
         """Shortcut for creating a client.
 
+        The client is taken from the connection pool and returned once it is no longer referenced.
+
         Parameters
         ----------
         homedir : str
             Home directory of the user or domain.
         isPrivate : bool
             Whether it is a user (True) or domain (False) database
+        host : str, optional
+            Host to connect to. The default is the configured exmdbHost.
 
         Returns
         -------
-        pyexmdb.ExmdbQueries
+        services.exmdb.ExmdbService._PooledClient
             Exmdb client
         """
-        return self.ExmdbQueries(self.host, self.port, homedir, isPrivate)
+        return self._PooledClient(self, host or self.host, self.port, homedir, isPrivate, bound=False)
 
     def user(self, user):
         """Create client for user.
@@ -82,11 +276,11 @@ class ExmdbService:
 
         Returns
         -------
-        services.exmdb.ExmdbService._BoundClient
+        services.exmdb.ExmdbService._PooledClient
             Exmdb client bound to the specific user
         """
         host = user.homeserver.hostname if user.homeserver is not None else self.host
-        return self._BoundClient(self, host, self.port, user.maildir, True)
+        return self._PooledClient(self, host, self.port, user.maildir, True)
 
     def domain(self, domain):
         """Create client for domain.
@@ -101,8 +295,8 @@ class ExmdbService:
 
         Returns
         -------
-        services.exmdb.ExmdbService._BoundClient
+        services.exmdb.ExmdbService._PooledClient
             Exmdb client bound to the specific domain
         """
         host = domain.homeserver.hostname if domain.homeserver is not None else self.host
-        return self._BoundClient(self, host, self.port, domain.homedir, False)
+        return self._PooledClient(self, host, self.port, domain.homedir, False)
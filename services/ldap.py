@@ -7,6 +7,7 @@ from . import ServiceHub, ServiceDisabledError, ServiceUnavailableError, Instanc
 import ldap3
 import ldap3.core.exceptions as ldapexc
 import ldap3.utils.config as ldap3_conf
+import queue
 import re
 import threading
 import yaml
@@ -177,6 +178,9 @@ class LdapService:
             raise ServiceDisabledError("Service disabled by configuration")
         try:
             self.conn = self.testConnection(self._config)
+            self._pool = queue.Queue()
+            self._pool.put(self.conn)
+            self._poolSize = 1
         except ldap3.core.exceptions.LDAPInvalidDnError:
             raise ServiceUnavailableError("Invalid base DN")
         except Exception as err:
@@ -196,6 +200,8 @@ class LdapService:
             return common
         if name == "all":
             return common+("*",)
+        if name == "sync":
+            return common+("*", self.changeAttribute)
         userconf = self._config["users"]
         common += (userconf["displayName"],)
         if mode == "user":
@@ -266,6 +272,20 @@ class LdapService:
         """
         return "(|{})".format("".join("({}={})".format(self._config["objectID"], self.escape_filter_chars(ID)) for ID in IDs))
 
+    @property
+    def changeAttribute(self):
+        """Attribute tracking modifications of directory objects.
+
+        Active Directory provides the `uSNChanged` update sequence number, which is not affected by clock skew
+        but is local to each domain controller. Other directories use `modifyTimestamp`.
+
+        Returns
+        -------
+        str
+            Name of the attribute
+        """
+        return "uSNChanged" if "ActiveDirectory" in self._config["users"].get("templates", ()) else "modifyTimestamp"
+
     @property
     def _sbase(self):
         return self._searchBase(self._config)
@@ -289,16 +309,16 @@ class LdapService:
         def filtered(results):
             return list(filter(lambda r: r.error is None, results)) if filterIncomplete else list(results)
 
-        def searchPaged(typeFilter, type, *args, **kwargs):
+        def searchPaged(conn, typeFilter, type, *args, **kwargs):
             filterExpr = "(&{}{})".format(baseFilter, typeFilter) if baseFilter and typeFilter else baseFilter or typeFilter
-            if not self.conn.search(self._sbase, filterExpr, *args, **kwargs):
+            if not conn.search(self._sbase, filterExpr, *args, **kwargs):
                 return []
-            results = filtered(SearchResult(self, type, result) for result in self.conn.response)
-            cookie = self.conn.result.get("controls", {}).get("1.2.840.113556.1.4.319", {}).get("value", {}).get("cookie")
+            results = filtered(SearchResult(self, type, result) for result in conn.response)
+            cookie = conn.result.get("controls", {}).get("1.2.840.113556.1.4.319", {}).get("value", {}).get("cookie")
             while cookie and (not limit or len(results) < limit) and \
-                  self.conn.search(self._sbase, filterExpr, *args, **kwargs, paged_cookie=cookie):
-                results += filtered(SearchResult(self, type, result) for result in self.conn.response)
-                cookie = self.conn.result.get("controls", {}).get("1.2.840.113556.1.4.319", {}).get("value", {}).get("cookie")
+                  conn.search(self._sbase, filterExpr, *args, **kwargs, paged_cookie=cookie):
+                results += filtered(SearchResult(self, type, result) for result in conn.response)
+                cookie = conn.result.get("controls", {}).get("1.2.840.113556.1.4.319", {}).get("value", {}).get("cookie")
             return results[:limit] if limit and len(results) > limit else results
 
         if limit:
@@ -308,13 +328,16 @@ class LdapService:
         domainexpr = "(|{})".format("".join("({}=*@{})".format(username, d) for d in domains)) if domains is not None else ""
         filterexpr = "".join("("+f+")" for f in userconf.get("filters", ()))
         userFilter = "(&{}{}{})".format(filterexpr, userconf.get("filter", ""), domainexpr)
-        with self.lock:
-            results = searchPaged(userFilter, "user", *args, attributes=self._attrSet(attributes, "user"), **kwargs)
+        conn = self._pool.get()
+        try:
+            results = searchPaged(conn, userFilter, "user", *args, attributes=self._attrSet(attributes, "user"), **kwargs)
             if limit:
                 limit -= len(results)
             if self._config["enableContacts"] and (limit is None or limit > 0):
-                results += searchPaged(self._config["users"]["contactFilter"], "contact", *args,
+                results += searchPaged(conn, self._config["users"]["contactFilter"], "contact", *args,
                                        attributes=self._attrSet(attributes, "contact"), **kwargs)
+        finally:
+            self._pool.put(conn)
         return results
 
     @classmethod
@@ -441,26 +464,103 @@ class LdapService:
         res = res[0]
         return yaml.dump({"DN": res.DN})+yaml.dump({"attributes": dict(res.data)})
 
+    def growPool(self, size):
+        """Open additional connections until the pool contains `size` connections.
+
+        Searches are distributed over all pooled connections, allowing multiple threads to query the server in
+        parallel. Connections are kept open for the lifetime of the service.
+
+        Parameters
+        ----------
+        size : int
+            Requested pool size
+
+        Returns
+        -------
+        int
+            Actual pool size
+        """
+        with self.lock:
+            while self._poolSize < size:
+                try:
+                    self._pool.put(self.testConnection(self._config, active=False))
+                except Exception as err:
+                    logger.warning("Failed to open additional connection: "+" - ".join(str(arg) for arg in err.args))
+                    break
+                self._poolSize += 1
+            return self._poolSize
+
     @staticmethod
     def escape_filter_chars(text, encoding=None):
         return escape_filter_chars(text, encoding)
 
-    def getAll(self, IDs):
+    def getAll(self, IDs, attributes=None):
         """Get user information for each ID.
 
-        Queries the same information as getUserInfo.
+        By default, queries the same information as getUserInfo.
 
         Parameters
         ----------
         IDs : list of bytes or str
             IDs to search
+        attributes : str or list of str, optional
+            Attribute set or list of attributes to fetch. The default is None.
 
         Returns
         -------
         list
             List of GenericObjects with information about found users
         """
-        return self._search(self._matchFiltersMulti(IDs))
+        return self._search(self._matchFiltersMulti(IDs), attributes=attributes)
+
+    def getChanged(self, mark, pageSize=1000):
+        """Get all objects modified since the given mark.
+
+        Results contain the same attributes as the "sync" attribute set, which can be passed to `syncMark`.
+
+        Parameters
+        ----------
+        mark : str
+            Value of the change attribute as returned by `syncMark`
+        pageSize : int, optional
+            Perform a paged search with given page size. Default is 1000.
+
+        Returns
+        -------
+        list
+            List of objects modified since mark (inclusive)
+        """
+        changeFilter = "({}>={})".format(self.changeAttribute, self.escape_filter_chars(mark))
+        return self._search(changeFilter, attributes="sync", paged_size=pageSize)
+
+    def syncMark(self, results, mark=None):
+        """Determine the latest modification of the given objects.
+
+        Parameters
+        ----------
+        results : list of SearchResult
+            Objects retrieved with the "sync" attribute set
+        mark : str, optional
+            Previous mark to include in comparison. The default is None.
+
+        Returns
+        -------
+        str
+            Latest change attribute value or None if no value was found
+        """
+        from datetime import datetime, timezone
+        attr = self.changeAttribute
+        marks = [] if mark is None else [mark]
+        for result in results:
+            value = result.data.get(attr)
+            value = SearchResult._reduce(value) if value else None
+            if isinstance(value, datetime):
+                value = value.astimezone(timezone.utc).strftime("%Y%m%d%H%M%SZ")
+            if value is not None:
+                marks.append(str(value))
+        if not marks:
+            return None
+        return max(marks, key=int) if attr == "uSNChanged" else max(marks)
 
     def getUserInfo(self, ID):
         """Get e-mail address of an ldap user.
@@ -4,11 +4,18 @@
 
 from . import ServiceHub
 
+import os
 import subprocess
+import threading
 import time
+import weakref
 
+from collections import deque
 from datetime import datetime
 
+import logging
+logger = logging.getLogger("systemd")
+
 def handleSystemdExceptions(service, error):
     if isinstance(error, FileNotFoundError):
         return  # Invalid argument, pass exception on to the caller...
@@ -28,18 +35,32 @@ class Systemd:
 
     def __init__(self, system=None):
         from tools.config import Config
-        self.system = system if system is not None else not Config["options"].get("systemdUser", False)
+        options = Config["options"]
+        self.system = system if system is not None else not options.get("systemdUser", False)
+        self.cacheTTL = options["systemdCacheTTL"]
+        self.watch = options["systemdWatch"]
+        self.transitions = deque(maxlen=options["systemdTransitions"])
+        self._lock = threading.Lock()
+        self._units = {}
+        self._queried = {service["unit"] for service in options["dashboard"]["services"]}
+        self._updated = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def __del__(self):
+        self._stop.set()
 
     @property
     def __mode(self):
         return "--system" if self.system else "--user"
 
-    def getServices(self, *services):
+    def _query(self, *services):
         args = ("systemctl", "-q", self.__mode, "show",
                 "--property="+",".join(self.valmap), *services)
         result = subprocess.run(args, stdout=subprocess.PIPE, universal_newlines=True)
         split = [[line.split("=", 1) for line in block.split("\n") if "=" in line] for block in result.stdout.split("\n\n")]
-        units = [{self.valmap[key]: value for key, value in block if key in self.valmap} for block in split]
+        units = [{self.valmap[key]: value for key, value in block if key in self.valmap} for block in split if block]
         for unit in units:
             unit["unit"] = unit["unit"].split(" ")[0]
             since = unit["sa"] if unit["state"] == "active" else unit["si"]
@@ -52,9 +73,114 @@ class Systemd:
             unit.pop("sa", None), unit.pop("si", None)
         return {unit["unit"]: unit for unit in units if "unit" in unit}
 
+    def _refresh(self):
+        """Update state of all watched units with a single systemctl call and record state transitions."""
+        units = self._query(*self._queried) if self._queried else {}
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        for name, unit in units.items():
+            old = self._units.get(name)
+            if old is not None and any(old.get(key) != unit.get(key) for key in ("state", "substate", "autostart")):
+                self.transitions.append({"unit": name, "time": now,
+                                         "from": {key: old.get(key) for key in ("state", "substate", "autostart")},
+                                         "to": {key: unit.get(key) for key in ("state", "substate", "autostart")}})
+        self._units = units
+        self._updated = time.monotonic()
+
+    def _expired(self):
+        return self._updated is None or time.monotonic()-self._updated >= self.cacheTTL
+
+    @staticmethod
+    def _watch(ref, stop, timeout):
+        """Refresh unit states whenever the cache expires.
+
+        Only holds a weak reference to the service, so that the thread exits when the service is reloaded.
+        """
+        while not stop.wait(timeout):
+            self = ref()
+            if self is None or self.cacheTTL <= 0:
+                return
+            with self._lock:
+                if self._expired():
+                    try:
+                        self._refresh()
+                    except FileNotFoundError:
+                        logger.warning("systemctl not found - stopping unit state watcher")
+                        return
+                    except Exception as err:
+                        logger.warning("Failed to refresh unit states: {}: {}".format(type(err).__name__, err))
+                timeout = self.cacheTTL if self._updated is None else \
+                    max(self._updated+self.cacheTTL-time.monotonic(), 0)
+            del self
+
+    def _startWatcher(self):
+        """Start the watcher thread if enabled and not running in the current process.
+
+        Like the metrics sampler, the thread is started on first access and restarted automatically after a fork.
+        """
+        if not self.watch or self.cacheTTL <= 0:
+            return
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._watch, args=(weakref.ref(self), self._stop, self.cacheTTL),
+                                        name="systemd watcher", daemon=True)
+        self._thread.start()
+
+    def getServices(self, *services):
+        """Get state of systemd units.
+
+        Unit states are cached for `options.systemdCacheTTL` seconds.
+        All units requested so far are refreshed together.
+        If `options.systemdWatch` is set, the states are refreshed in the background when the cache expires.
+
+        Parameters
+        ----------
+        services : str
+            Names of the units
+
+        Returns
+        -------
+        dict
+            Mapping of unit name to unit information
+        """
+        with self._lock:
+            self._startWatcher()
+            if self._expired() or not self._queried.issuperset(services):
+                self._queried.update(services)
+                self._refresh()
+            return {unit: dict(self._units[unit]) for unit in services if unit in self._units}
+
+    def getTransitions(self, *services):
+        """Get recorded unit state transitions.
+
+        Without `options.systemdWatch`, transitions are only detected when the unit states are requested.
+
+        Parameters
+        ----------
+        services : str
+            Only return transitions of the specified units. If omitted, transitions of all units are returned.
+
+        Returns
+        -------
+        list of dict
+            State transitions in chronological order
+        """
+        with self._lock:
+            self._startWatcher()
+            if self._expired() or not self._queried.issuperset(services):
+                self._queried.update(services)
+                self._refresh()
+            return [dict(transition) for transition in self.transitions
+                    if not services or transition["unit"] in services]
+
+    def invalidate(self):
+        """Force refresh on next access."""
+        self._updated = None
+
     def run(self, command, *targets):
         result = subprocess.run(("systemctl", "-q", self.__mode, command, *targets),
                                 stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+        self.invalidate()
         return result.returncode, result.stdout
 
     def startService(self, *services):
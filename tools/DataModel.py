@@ -2,13 +2,14 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 # SPDX-FileCopyrightText: 2020 grommunio GmbH
 
-from sqlalchemy import func, or_
+from sqlalchemy import and_, false, func, or_
 from sqlalchemy.inspection import inspect as inspecc
 from sqlalchemy.orm import joinedload, aliased
 
 from collections.abc import Iterable
 
 import logging
+import threading
 logger = logging.getLogger("DataModel")
 
 
@@ -250,6 +251,8 @@ class DataModel:
         Stores all mapped props and keeps shortcuts for filtering and reverse lookup
         """
 
+        maxSelections = 64
+
         def __init__(self, dictmap, sortables, matchables):
             """Initialize metadata.
 
@@ -270,6 +273,9 @@ class DataModel:
                 self.lookup[m].flags.add("match")
             self.filters = tuple(self.props(predicate=lambda prop: prop.filter is not None))
             self.matchables = tuple(self.props(predicate=lambda prop: "match" in prop.flags))
+            self.serializers = {}
+            self.selections = {}
+            self._lock = threading.Lock()
 
         def props(self, level=None, predicate=lambda x: True):
             """Return list of props available at level, fulfilling the predicate.
@@ -290,6 +296,88 @@ class DataModel:
                     for prop in self.levels[lev]
                     if (level is None or lev <= int(level)) and predicate(prop))
 
+        def serializer(self, spec, exclude=()):
+            """Get serializer function for a specific level or attribute selection.
+
+            Serializers are compiled on first use and cached. Serializers for attribute selections are only kept for the
+            `maxSelections` most recently compiled selections, as these can be chosen freely by clients. Lookups are
+            lock free, compilation and eviction are serialized.
+
+            Parameters
+            ----------
+            spec : int or iterable
+                Level of detail or list of attribute names to include
+            exclude : Collection, optional
+                Attributes to exclude. The default is ().
+
+            Returns
+            -------
+            function
+                Function creating the dictionary representation of an object
+            """
+            if isinstance(spec, int):
+                spec = max(-1, min(spec, len(self.levels)-1))
+            else:
+                spec = frozenset(spec)
+            key = (spec, frozenset(exclude))
+            cache = self.serializers if isinstance(spec, int) else self.selections
+            serializer = cache.get(key)
+            if serializer is not None:
+                return serializer
+            if isinstance(spec, int):
+                propsel = lambda prop: "hidden" not in prop.flags and prop.attr not in exclude and prop.proxy is None
+            else:
+                sspec = spec
+                propsel = lambda prop: prop.attr in sspec and prop.attr not in exclude and prop.proxy is None
+                spec = None
+            with self._lock:
+                serializer = cache.get(key)
+                if serializer is None:
+                    if cache is self.selections and len(cache) >= self.maxSelections:
+                        cache.pop(next(iter(cache)))
+                    serializer = cache[key] = self._compile(self.props(spec, propsel))
+            return serializer
+
+        @staticmethod
+        def _compile(props):
+            """Generate serializer function for a list of props.
+
+            Plain attributes and function transformations are resolved once and inlined into a single dict expression,
+            anything else is delegated to `Prop.value`.
+
+            Parameters
+            ----------
+            props : Iterable
+                Props to serialize
+
+            Returns
+            -------
+            function
+                Function creating the dictionary representation of an object
+            """
+            import keyword
+            namespace, items = {}, []
+            for index, prop in enumerate(props):
+                if prop.attr.isidentifier() and not keyword.iskeyword(prop.attr):
+                    attr = "obj."+prop.attr
+                else:
+                    attr = "getattr(obj, {!r})".format(prop.attr)
+                if "ref" in prop.flags or (prop.func is None and "call" in prop.flags):
+                    namespace["value{}".format(index)] = prop.value
+                    expr = "value{}(obj)".format(index)
+                elif prop.func is not None:
+                    namespace["func{}".format(index)] = prop.func
+                    namespace["args{}".format(index)] = prop.args
+                    namespace["kwargs{}".format(index)] = prop.kwargs
+                    expr = "func{0}({1}, *args{0}, **kwargs{0})".format(index, attr) if prop.args or prop.kwargs else\
+                           "func{}({})".format(index, attr)
+                else:
+                    expr = attr
+                items.append("{!r}: {}".format(prop.key, expr))
+            source = "def serialize(obj):\n    return {"+", ".join(items)+"}\n"
+            exec(compile(source, "<DataModel serializer>", "exec"), namespace)
+            return namespace["serialize"]
+
     _meta = None
 
     def __init__(self, props, *args, **kwargs):
@@ -352,13 +440,7 @@ class DataModel:
             Dictionary representation
         """
         self._init()
-        if isinstance(spec, int):
-            propsel = lambda prop: "hidden" not in prop.flags and prop.attr not in exclude and prop.proxy is None
-        else:
-            sspec = set(spec)
-            propsel = lambda prop: prop.attr in sspec and prop.attr not in exclude and prop.proxy is None
-            spec = None
-        return {prop.key: prop.value(self) for prop in self._meta.props(spec, propsel)}
+        return self._meta.serializer(spec, exclude)(self)
 
     @classmethod
     def optimize_query(cls, query, spec):
@@ -535,6 +617,30 @@ class DataModel:
                 query = query.filter(or_(attr == v for v in values))
         return query
 
+    @classmethod
+    def _sortprops(cls, sorts):
+        """Generate (prop, order) tuples from valid sort expressions.
+
+        Parameters
+        ----------
+        cls : Class
+            Class inheriting from DataModel
+        sorts : list
+            List of sort expressions
+
+        Returns
+        -------
+        Generator Object
+            Iterator yielding sortable props and the requested order ("asc" or "desc")
+        """
+        cls._init()
+        for s in sorts:
+            column, order = s.split(",", 1) if "," in s else (s, "asc")
+            prop = cls._meta.lookup.get(column)
+            if prop is None or "sort" not in prop.flags:
+                continue
+            yield prop, order
+
     @classmethod
     def autosort(cls, query, sorts):
         """Apply valid sort expressions to query.
@@ -558,12 +664,7 @@ class DataModel:
         Query
             Query with applied order by expressions
         """
-        cls._init()
-        for s in sorts:
-            column, order = s.split(",", 1) if "," in s else (s, "asc")
-            prop = cls._meta.lookup.get(column)
-            if prop is None or "sort" not in prop.flags:
-                continue
+        for prop, order in cls._sortprops(sorts):
             if prop.target is None:
                 column = prop.value(cls, "unmask")
                 query = query.order_by(column.desc() if order == "desc" else column.asc())
@@ -572,6 +673,108 @@ class DataModel:
                 query = query.order_by(func.isnull(column), column.desc() if order == "desc" else column.asc())
         return query
 
+    @classmethod
+    def sortkeys(cls, sorts):
+        """Get props defining a total order for keyset pagination.
+
+        Uses the same sort expressions as `autosort`, with the ID appended as tie breaker.
+
+        Parameters
+        ----------
+        cls : Class
+            Class inheriting from DataModel
+        sorts : list
+            List of sort expressions
+
+        Raises
+        ------
+        ValueError
+            Sorting cannot be used for keyset pagination or contains unknown sort keys
+
+        Returns
+        -------
+        list
+            List of (prop, order) tuples
+        """
+        cls._init()
+        if "ID" not in cls._meta.lookup:
+            raise ValueError("Cursor pagination is not supported for this object type")
+        for s in sorts:
+            prop = cls._meta.lookup.get(s.split(",", 1)[0])
+            if prop is None or "sort" not in prop.flags:
+                raise ValueError("Cannot use sort '{}' with cursor pagination".format(s.split(",", 1)[0]))
+        keys = []
+        for prop, order in cls._sortprops(sorts):
+            if prop.target is not None or prop.proxy is not None:
+                raise ValueError("Cannot use sort '{}' with cursor pagination".format(prop.key))
+            if prop.key != "ID" and all(prop is not key[0] for key in keys):
+                keys.append((prop, order))
+        idorder = next((order for prop, order in cls._sortprops(sorts) if prop.key == "ID"), "asc")
+        return keys+[(cls._meta.lookup["ID"], idorder)]
+
+    @classmethod
+    def keyset(cls, query, sorts, after=None):
+        """Apply keyset pagination to query.
+
+        Orders the query by the sort keys (see `sortkeys`) and, if `after` is given, restricts the result to entries
+        following the specified sort key values.
+        NULL values are ordered first in ascending and last in descending order, matching MySQL behavior.
+
+        Parameters
+        ----------
+        cls : Class
+            Class inheriting from DataModel
+        query : Query
+            SQLAlchemy Query
+        sorts : list
+            List of sort expressions
+        after : list, optional
+            Sort key values of the last element of the previous page. The default is None.
+
+        Raises
+        ------
+        ValueError
+            Invalid sort expressions or number of values
+
+        Returns
+        -------
+        Query
+            Query with applied order by and filter expressions
+        """
+        keys = [(prop.value(cls, "unmask"), order) for prop, order in cls.sortkeys(sorts)]
+        query = query.order_by(*(column.desc() if order == "desc" else column.asc() for column, order in keys))
+        if after is None:
+            return query
+        if len(after) != len(keys):
+            raise ValueError("Cursor does not match sort expressions")
+        conditions, equal = [], []
+        for (column, order), value in zip(keys, after):
+            if value is None:
+                follows = column.isnot(None) if order == "asc" else None
+                same = column.is_(None)
+            else:
+                follows = column > value if order == "asc" else or_(column < value, column.is_(None))
+                same = column == value
+            if follows is not None:
+                conditions.append(and_(*equal, follows))
+            equal.append(same)
+        return query.filter(or_(*conditions) if conditions else false())
+
+    def sortvalues(self, sorts):
+        """Get sort key values of the object.
+
+        Parameters
+        ----------
+        sorts : list
+            List of sort expressions
+
+        Returns
+        -------
+        list
+            Values of the sort keys (see `sortkeys`)
+        """
+        return [prop.value(self, "unmask") for prop, order in self.sortkeys(sorts)]
+
     @classmethod
     def automatch(cls, query, expr, fields=None):
         """Add fuzzy matching to query."""
@@ -57,10 +57,18 @@ def _defaultConfig():
     return {
         "DB": {
             "sessionTimout": 28800,
+            "instrument": {
+                "enabled": False,
+                "slowQuery": 0.1,
+                "slowRequest": 1,
+                "maxQueries": 50,
+                "repeatThreshold": 10,
+                },
             },
         "openapi": {
             "validateRequest": True,
-            "validateResponse": True
+            "validateResponse": True,
+            "responseSampleRate": 1
             },
         "options": {
             "antispamUrl": "http://localhost:11334",
@@ -72,19 +80,41 @@ def _defaultConfig():
             "userPrefix": "/var/lib/gromox/user/",
             "exmdbHost": "::1",
             "exmdbPort": "5000",
+            "exmdbPoolSize": 16,
+            "exmdbPoolIdle": 60,
+            "exmdbPoolTimeout": 5,
             "domainStorageLevels": 1,
             "userStorageLevels": 2,
             "domainAcceleratedStorage": None,
             "userAcceleratedStorage": None,
+            "usageIndexPath": "/var/lib/grommunio-admin-api/usage.sqlite3",
+            "search": {
+                "engine": "like",
+                "indexPath": "/var/lib/grommunio-admin-api/search.sqlite3",
+                "candidates": 1000
+                },
+            "streaming": {
+                "threshold": 5000,
+                "batchSize": 1000
+                },
             "dashboard": {
-                "services": []
+                "services": [],
+                "sampleInterval": 5,
+                "historySize": 720
                 },
-            "serverPolicy": "round-robin"
+            "serverPolicy": "round-robin",
+            "systemdCacheTTL": 10,
+            "systemdWatch": True,
+            "systemdTransitions": 100,
+            "mailqCacheTTL": 5,
+            "mailqSnapshots": 10
             },
         "security": {
             "jwtPrivateKeyFile": "/etc/grommunio-admin-api/jwt-privkey.pem",
             "jwtPublicKeyFile": "/etc/grommunio-admin-api/jwt-pubkey.pem",
             "rsaKeySize": 4096,
+            "authCacheTTL": 60,
+            "authCacheSize": 1024,
             },
         "mconf": {
           "ldapPath": "/etc/gromox/ldap_adaptor.cfg",
@@ -94,12 +124,20 @@ def _defaultConfig():
         "sync": {
             "syncStateFolder": "GS-SyncState",
             "defaultPolicy": _defaultSyncPolicy,
-            "policyHosts": ["127.0.0.1", "localhost", "::1", "::ffff:127.0.0.1"]
+            "policyHosts": ["127.0.0.1", "localhost", "::1", "::ffff:127.0.0.1"],
+            "policyCacheTTL": 60,
+            "policyCacheSize": 4096,
             },
         "chat": {
             "connection": {},
             },
         "tasq": {},
+        "metrics": {
+            "enabled": True,
+            "path": "/run/grommunio/admin-api-metrics",
+            "flushInterval": 5,
+            "hosts": ["127.0.0.1", "localhost", "::1", "::ffff:127.0.0.1"],
+            },
         }
 
 
@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: 2026 grommunio GmbH
+
+import os
+import sqlite3
+import time
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+def partitions(partition: str = None):
+    """Get configured storage partitions.
+
+    Parameters
+    ----------
+    partition : str, optional
+        Only return the specified partition ("domain" or "user"). The default is None.
+
+    Yields
+    ------
+    name : str
+        Name of the partition
+    prefix : str
+        Root directory of the partition
+    levels : int
+        Number of directory levels between the root and the home directories
+    """
+    from .config import Config
+    opt = Config["options"]
+    if partition is None or partition == "domain":
+        yield "domain", opt["domainPrefix"], opt["domainStorageLevels"]
+    if partition is None or partition == "user":
+        yield "user", opt["userPrefix"], opt["userStorageLevels"]
+
+
+def treeSize(path: str):
+    """Calculate number of files and total size of a directory tree.
+
+    Symbolic links are ignored. Entries that vanish or cannot be accessed during the scan are skipped.
+
+    Parameters
+    ----------
+    path : str
+        Root of the tree
+
+    Returns
+    -------
+    files : int
+        Number of regular files
+    size : int
+        Total size in bytes, including directories
+    """
+    try:
+        files, size = 0, os.lstat(path).st_size
+    except OSError:
+        return 0, 0
+    stack = [path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    try:
+                        if entry.is_symlink():
+                            continue
+                        size += entry.stat(follow_symlinks=False).st_size
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        else:
+                            files += entry.is_file(follow_symlinks=False)
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+    return files, size
+
+
+def splitTree(path: str, depth: int):
+    """Split directory tree at given depth.
+
+    Collects all directories exactly `depth` levels below `path`. Files and directories located above that level are
+    accounted for in the returned totals, so that the sum of the `treeSize` of each returned directory and the totals
+    equals the `treeSize` of `path`.
+
+    Parameters
+    ----------
+    path : str
+        Root of the tree
+    depth : int
+        Number of levels to descend
+
+    Returns
+    -------
+    dirs : list of str
+        Directories found at `depth`
+    files : int
+        Number of files located above `depth`
+    size : int
+        Size of all files and directories located above `depth`
+    """
+    if depth <= 0:
+        return [path], 0, 0
+    level, files = [path], 0
+    try:
+        size = os.lstat(path).st_size
+    except OSError:
+        return [], 0, 0
+    for current in range(depth):
+        subdirs = []
+        for dirpath in level:
+            try:
+                with os.scandir(dirpath) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_symlink():
+                                continue
+                            if entry.is_dir(follow_symlinks=False):
+                                subdirs.append(entry.path)
+                                if current == depth-1:
+                                    continue
+                            else:
+                                files += entry.is_file(follow_symlinks=False)
+                            size += entry.stat(follow_symlinks=False).st_size
+                        except OSError:
+                            pass
+            except OSError:
+                pass
+        level = subdirs
+    return sorted(level), files, size
+
+
+def usage(paths, workers: int = 8):
+    """Calculate disk usage of multiple directory trees in parallel.
+
+    Results are yielded as soon as the respective tree has been scanned, so the order is not deterministic.
+    Closing the generator cancels all pending scans.
+
+    Parameters
+    ----------
+    paths : Iterable of str
+        Directories to scan
+    workers : int, optional
+        Maximum number of concurrent scans. The default is 8.
+
+    Yields
+    ------
+    path : str
+        Path of the scanned directory
+    files : int
+        Number of files in the directory tree
+    size : int
+        Total size of the directory tree
+    """
+    with ThreadPoolExecutor(max(1, workers), thread_name_prefix="du") as executor:
+        futures = {executor.submit(treeSize, path): path for path in paths}
+        try:
+            for future in as_completed(futures):
+                yield (futures[future],)+future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def dirMtime(path: str):
+    """Get latest modification time of a directory and its immediate subdirectories.
+
+    Parameters
+    ----------
+    path : str
+        Directory to check
+
+    Returns
+    -------
+    float
+        Modification timestamp or None if the directory could not be accessed
+    """
+    try:
+        mtime = os.lstat(path).st_mtime
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        mtime = max(mtime, entry.stat(follow_symlinks=False).st_mtime)
+                except OSError:
+                    pass
+    except OSError:
+        return None
+    return mtime
+
+
+class UsageIndex:
+    """Persistent index of home directory disk usage.
+
+    Stores number of files, size and modification time of each user and domain home directory in an SQLite database.
+    Refreshing the index only rescans directories whose modification time (see `dirMtime`) changed since the last
+    scan.
+    """
+
+    _schema = """CREATE TABLE IF NOT EXISTS usage (
+                     path TEXT PRIMARY KEY,
+                     partition TEXT NOT NULL,
+                     files INTEGER NOT NULL,
+                     size INTEGER NOT NULL,
+                     mtime REAL NOT NULL,
+                     scanned REAL NOT NULL);
+                 CREATE INDEX IF NOT EXISTS usage_size ON usage (size);
+                 CREATE INDEX IF NOT EXISTS usage_partition_size ON usage (partition, size);"""
+
+    def __init__(self, path: str = None, readonly: bool = False):
+        """Open usage index.
+
+        Parameters
+        ----------
+        path : str, optional
+            Path to the index file. The default is taken from the `options.usageIndexPath` configuration value.
+        readonly : bool, optional
+            Whether to open the index in read-only mode. The default is False.
+
+        Raises
+        ------
+        sqlite3.OperationalError
+            Index file could not be opened or created
+        """
+        from .config import Config
+        self.path = path or Config["options"]["usageIndexPath"]
+        if readonly:
+            self.conn = sqlite3.connect("file:{}?mode=ro".format(self.path), uri=True)
+        else:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.conn = sqlite3.connect(self.path, timeout=30)
+            self.conn.executescript(self._schema)
+        self.conn.row_factory = sqlite3.Row
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Close the index file."""
+        self.conn.close()
+
+    @staticmethod
+    def _check(path, mtime, full):
+        current = dirMtime(path)
+        if current is None:
+            return path, None, 0, 0
+        if not full and current == mtime:
+            return None
+        return (path, current)+treeSize(path)
+
+    def refresh(self, partition: str = None, full: bool = False, workers: int = 8, callback=None):
+        """Refresh the index.
+
+        Parameters
+        ----------
+        partition : str, optional
+            Only refresh the specified partition ("domain" or "user"). The default is None.
+        full : bool, optional
+            Rescan all directories, regardless of their modification time. The default is False.
+        workers : int, optional
+            Maximum number of concurrent scans. The default is 8.
+        callback : callable, optional
+            Function called with the path, number of files and size of each rescanned directory. The default is None.
+
+        Returns
+        -------
+        dict
+            Number of `scanned`, `unchanged` and `removed` directories
+        """
+        stats = {"scanned": 0, "unchanged": 0, "removed": 0}
+        for name, prefix, levels in partitions(partition):
+            known = {row["path"]: row["mtime"] for row in
+                     self.conn.execute("SELECT path, mtime FROM usage WHERE partition=?", (name,))}
+            dirs = splitTree(prefix.rstrip(os.path.sep), levels)[0]
+            with ThreadPoolExecutor(max(1, workers), thread_name_prefix="du") as executor:
+                futures = [executor.submit(self._check, path, known.get(path), full) for path in dirs]
+                for future in as_completed(futures):
+                    result = future.result()
+                    if result is None:
+                        stats["unchanged"] += 1
+                        continue
+                    path, mtime, files, size = result
+                    if mtime is None:
+                        continue
+                    self.conn.execute("INSERT OR REPLACE INTO usage VALUES (?, ?, ?, ?, ?, ?)",
+                                      (path, name, files, size, mtime, time.time()))
+                    stats["scanned"] += 1
+                    if callback is not None:
+                        callback(path, files, size)
+            removed = set(known)-set(dirs)
+            self.conn.executemany("DELETE FROM usage WHERE path=?", ((path,) for path in removed))
+            stats["removed"] += len(removed)
+            self.conn.commit()
+        return stats
+
+    def top(self, limit: int = 10, partition: str = None):
+        """Get largest directories.
+
+        Parameters
+        ----------
+        limit : int, optional
+            Maximum number of entries to return. The default is 10.
+        partition : str, optional
+            Only return directories of the specified partition. The default is None.
+
+        Returns
+        -------
+        list of dict
+            Index entries, sorted by size in descending order
+        """
+        if partition is None:
+            rows = self.conn.execute("SELECT * FROM usage ORDER BY size DESC LIMIT ?", (limit,))
+        else:
+            rows = self.conn.execute("SELECT * FROM usage WHERE partition=? ORDER BY size DESC LIMIT ?",
+                                     (partition, limit))
+        return [dict(row) for row in rows]
+
+    def summary(self):
+        """Get per-partition totals.
+
+        Returns
+        -------
+        dict
+            Mapping of partition name to number of `directories`, `files`, `size` and time of the oldest scan
+        """
+        return {row["partition"]: {"directories": row["directories"], "files": row["files"], "size": row["size"],
+                                   "scanned": row["scanned"]}
+                for row in self.conn.execute("SELECT partition, COUNT(*) AS directories, SUM(files) AS files, "
+                                             "SUM(size) AS size, MIN(scanned) AS scanned FROM usage GROUP BY partition")}
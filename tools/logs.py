@@ -27,6 +27,33 @@ class LogReader:
             return obj
         return inner
 
+    @classmethod
+    def open(cls, source, target):
+        """Create log reader.
+
+        Automatically uses the correct log reader according to `source`.
+
+        Parameters
+        ----------
+        source : str
+            Name of the log source
+        target : str
+            Name of the log file or unit
+
+        Raises
+        ------
+        ValueError
+            `source` is not a registered log reader
+
+        Returns
+        -------
+        object
+            Log reader instance
+        """
+        if source not in cls.rreg:
+            raise ValueError("Unknown source '{}'".format(source))
+        return cls.rreg[source](target)
+
     @classmethod
     def tail(cls, source, target, *args, **kwargs):
         """Get log tail.
@@ -54,9 +81,7 @@ class LogReader:
         list
             List of log file entries
         """
-        if source not in cls.rreg:
-            raise ValueError("Unknown source '{}'".format(source))
-        return cls.rreg[source](target).tail(*args, **kwargs)
+        return cls.open(source, target).tail(*args, **kwargs)
 
 
 @LogReader.register("journald")
@@ -73,6 +98,7 @@ class JournaldReader:
         """
         self.reader = Reader()
         self.reader.add_match(_SYSTEMD_UNIT=unit)
+        self.cursor = None
 
     @staticmethod
     def _entry(data):
@@ -84,6 +110,8 @@ class JournaldReader:
     def tail(self, n=10, skip=0, after=None):
         """Get log tail.
 
+        Afterwards, `cursor` points to the most recent entry.
+
         Parameters
         ----------
         n : int, optional
@@ -99,15 +127,67 @@ class JournaldReader:
             List of log file entries
         """
         self.reader.seek_tail()
+        newest = self.reader.get_previous()
+        self.cursor = newest.get("__CURSOR", self.cursor)
+        if len(newest) == 0 or (n <= 0 and after is None):
+            return []
         if after is None:
-            if skip > 0:
-                self.reader.get_previous(skip)
-            entries = reversed([self.reader.get_previous() for _ in range(n)])
-            return [self._entry(entry) for entry in entries if len(entry) != 0]
+            if skip > 1:
+                self.reader.get_previous(skip-1)
+            entries = [newest] if skip == 0 else []
+            entries += [self.reader.get_previous() for _ in range(n-len(entries))]
+            return [self._entry(entry) for entry in reversed(entries) if len(entry) != 0]
         entries = []
-        while True:
-            entry = self.reader.get_previous()
-            if len(entry) == 0 or entry["__REALTIME_TIMESTAMP"] <= after:
-                break
+        entry = newest
+        while len(entry) != 0 and entry["__REALTIME_TIMESTAMP"] > after:
             entries.append(self._entry(entry))
+            entry = self.reader.get_previous()
         return list(reversed(entries))
+
+    def follow(self, cursor, n=1000):
+        """Get entries following the cursor.
+
+        Afterwards, `cursor` points to the last returned entry.
+
+        Parameters
+        ----------
+        cursor : str
+            Cursor returned by a previous call to `tail` or `follow`
+        n : int, optional
+            Maximum number of lines to return. The default is 1000.
+
+        Raises
+        ------
+        ValueError
+            The cursor is invalid.
+
+        Returns
+        -------
+        list
+            List of log file entries
+        """
+        try:
+            self.reader.seek_cursor(cursor)
+        except (OSError, ValueError):
+            raise ValueError("Invalid cursor")
+        entries = []
+        entry = self.reader.get_next()
+        if len(entry) != 0 and entry["__CURSOR"] != cursor:
+            entries.append(entry)
+        while len(entries) < n:
+            entry = self.reader.get_next()
+            if len(entry) == 0:
+                break
+            entries.append(entry)
+        self.cursor = entries[-1]["__CURSOR"] if entries else cursor
+        return [self._entry(entry) for entry in entries]
+
+    def wait(self, timeout):
+        """Wait for new entries.
+
+        Parameters
+        ----------
+        timeout : float
+            Maximum time to wait in seconds
+        """
+        self.reader.wait(timeout)
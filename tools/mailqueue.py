@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: 2026 grommunio GmbH
+
+import json
+import subprocess
+import threading
+import time
+
+from collections import OrderedDict
+
+import logging
+logger = logging.getLogger("mailq")
+
+
+class Snapshot:
+    """Mail queue snapshot.
+
+    Attributes
+    ----------
+    ID : int
+        Snapshot identifier (milliseconds since epoch of the creation time)
+    postfixMailq : str
+        Output of the postfix mailq command
+    gromoxMailq : str
+        Output of the gromox-mailq command
+    postqueue : list of dict
+        Parsed output of `postqueue -j`
+    entries : dict
+        Mapping of queue ID to postqueue entry
+    """
+
+    def __init__(self, ID, postfixMailq, gromoxMailq, postqueue):
+        self.ID = ID
+        self.created = time.monotonic()
+        self.postfixMailq = postfixMailq
+        self.gromoxMailq = gromoxMailq
+        self.postqueue = postqueue
+        self.entries = {entry.get("queue_id"): entry for entry in postqueue}
+
+    def filter(self, queue=None, sender=None, recipient=None):
+        """Filter postqueue entries.
+
+        All filters are case-insensitive substring matches.
+
+        Parameters
+        ----------
+        queue : str, optional
+            Name of the queue (e.g. `deferred`). The default is None.
+        sender : str, optional
+            Sender address. The default is None.
+        recipient : str, optional
+            Address of any recipient. The default is None.
+
+        Returns
+        -------
+        list of dict
+            Matching entries
+        """
+        entries = self.postqueue
+        if queue:
+            entries = [entry for entry in entries if entry.get("queue_name") == queue]
+        if sender:
+            sender = sender.lower()
+            entries = [entry for entry in entries if sender in entry.get("sender", "").lower()]
+        if recipient:
+            recipient = recipient.lower()
+            entries = [entry for entry in entries
+                       if any(recipient in rcpt.get("address", "").lower() for rcpt in entry.get("recipients", ()))]
+        return entries
+
+    def diff(self, other):
+        """Calculate changes since an older snapshot.
+
+        Parameters
+        ----------
+        other : Snapshot
+            Previous snapshot
+
+        Returns
+        -------
+        added : list of dict
+            Entries not present in `other`
+        changed : list of dict
+            Entries that moved to a different queue
+        removed : list of str
+            Queue IDs of entries no longer present
+        """
+        added = [entry for ID, entry in self.entries.items() if ID not in other.entries]
+        changed = [entry for ID, entry in self.entries.items()
+                   if ID in other.entries and other.entries[ID].get("queue_name") != entry.get("queue_name")]
+        removed = [ID for ID in other.entries if ID not in self.entries]
+        return added, changed, removed
+
+
+def _run(*args):
+    try:
+        return subprocess.run(args, stdout=subprocess.PIPE, universal_newlines=True).stdout
+    except Exception as err:
+        logger.error("Failed to run {}: {} ({})".format(args[0], type(err).__name__,
+                                                        " - ".join(str(arg) for arg in err.args)))
+
+
+class SnapshotCache:
+    """Cache for mail queue snapshots.
+
+    Concurrent requests for an expired snapshot are coalesced into a single set of subprocess calls.
+    A number of previous snapshots is kept to allow calculating deltas.
+    """
+
+    def __init__(self, ttl=5, history=10):
+        """Initialize cache.
+
+        Parameters
+        ----------
+        ttl : float, optional
+            Time (in seconds) after which a snapshot expires. The default is 5.
+        history : int, optional
+            Number of snapshots to keep. The default is 10.
+        """
+        self.ttl = ttl
+        self.history = max(1, history)
+        self._snapshots = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _create():
+        postfixMailq = _run("mailq")
+        gromoxMailq = _run("gromox-mailq")
+        postqueue = _run("postqueue", "-j")
+        try:
+            postqueue = [json.loads(line) for line in postqueue.split("\n") if line] if postqueue else []
+        except Exception as err:
+            logger.error("Failed to parse postqueue output: {} ({})"
+                         .format(type(err).__name__, " - ".join(str(arg) for arg in err.args)))
+            postqueue = []
+        return Snapshot(int(time.time()*1000), "Failed to run mailq." if postfixMailq is None else postfixMailq,
+                        gromoxMailq or "", postqueue)
+
+    def get(self):
+        """Get current snapshot.
+
+        Returns
+        -------
+        Snapshot
+            The most recent snapshot, created if necessary
+        """
+        with self._lock:
+            if self._snapshots:
+                latest = next(reversed(self._snapshots.values()))
+                if time.monotonic()-latest.created < self.ttl:
+                    return latest
+                snapshot = self._create()
+                snapshot.ID = max(snapshot.ID, latest.ID+1)
+            else:
+                snapshot = self._create()
+            self._snapshots[snapshot.ID] = snapshot
+            while len(self._snapshots) > self.history:
+                self._snapshots.popitem(False)
+            return snapshot
+
+    def find(self, ID):
+        """Get previous snapshot.
+
+        Parameters
+        ----------
+        ID : int
+            ID of the snapshot
+
+        Returns
+        -------
+        Snapshot
+            The snapshot or None if it is not available (anymore)
+        """
+        with self._lock:
+            return self._snapshots.get(ID)
+
+    def invalidate(self):
+        """Force creation of a new snapshot on next access."""
+        with self._lock:
+            for snapshot in self._snapshots.values():
+                snapshot.created = float("-inf")
+
+
+def _createCache():
+    from .config import Config
+    options = Config["options"]
+    return SnapshotCache(options["mailqCacheTTL"], options["mailqSnapshots"])
+
+
+Snapshots = _createCache()
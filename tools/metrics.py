@@ -0,0 +1,413 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: 2026 grommunio GmbH
+
+"""Process-aggregated metrics in Prometheus text format.
+
+Each process records counters and histograms in memory and periodically writes them, together with the current
+values of all gauges and the cumulative statistics of caches and pools, to a JSON file in a shared directory.
+Collecting the metrics merges the files of all processes. Counters of processes that exited are folded into an archive
+file, gauges are only reported for running processes.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+from .config import Config
+
+import logging
+logger = logging.getLogger("metrics")
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_meta = {
+    "grommunio_admin_requests_total": ("counter", "Number of handled API requests"),
+    "grommunio_admin_request_duration_seconds": ("histogram", "API request processing time"),
+    "grommunio_admin_db_queries_total": ("counter", "Number of database queries executed by API requests"),
+    "grommunio_admin_db_query_seconds_total": ("counter", "Time spent executing database queries in API requests"),
+    "grommunio_admin_processes": ("gauge", "Number of processes reporting metrics"),
+    "grommunio_admin_tasq_running": ("gauge", "Number of processes running a TasQ server"),
+    "grommunio_admin_tasq_workers": ("gauge", "Number of TasQ workers"),
+    "grommunio_admin_tasq_queued": ("gauge", "Number of tasks waiting for a TasQ worker"),
+    "grommunio_admin_tasq_busy": ("gauge", "Number of tasks currently executed by TasQ workers"),
+    "grommunio_admin_service_state": ("gauge", "Number of processes in which the service is in the given state"),
+    "grommunio_admin_cache_entries": ("gauge", "Number of entries in the cache"),
+    "grommunio_admin_cache_hits_total": ("counter", "Number of cache hits"),
+    "grommunio_admin_cache_misses_total": ("counter", "Number of cache misses"),
+    "grommunio_admin_exmdb_pool_connections": ("gauge", "Number of pooled exmdb connections"),
+    "grommunio_admin_exmdb_pool_events_total": ("counter", "Number of exmdb connection pool events"),
+}
+
+# Caches reporting statistics, as (label, module, attribute)
+_caches = (("auth", "api.security", "authCache"), ("syncPolicy", "orm.users", "syncPolicyCache"))
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+class Registry:
+    """In-process metrics store."""
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, labels, value=1):
+        """Increase counter.
+
+        Parameters
+        ----------
+        name : str
+            Name of the metric
+        labels : dict
+            Metric labels
+        value : float, optional
+            Value to add. The default is 1.
+        """
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0)+value
+
+    def observe(self, name, labels, value):
+        """Add observation to histogram.
+
+        Parameters
+        ----------
+        name : str
+            Name of the metric
+        labels : dict
+            Metric labels
+        value : float
+            Observed value
+        """
+        key = _key(name, labels)
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = [[0]*(len(BUCKETS)+1), 0, 0]
+            index = next((i for i, bound in enumerate(BUCKETS) if value <= bound), len(BUCKETS))
+            hist[0][index] += 1
+            hist[1] += value
+            hist[2] += 1
+
+    def dump(self):
+        """Export registry content as JSON serializable dict."""
+        with self._lock:
+            return {"counters": [[name, dict(labels), value] for (name, labels), value in self.counters.items()],
+                    "histograms": [[name, dict(labels), list(hist[0]), hist[1], hist[2]]
+                                   for (name, labels), hist in self.histograms.items()]}
+
+    def snapshot(self):
+        """Export registry content, cumulative statistics and gauges of this process.
+
+        Returns
+        -------
+        dict
+            Registry content (see `dump`) with `counters` extended by `counters()` and `gauges` set to `gauges()`
+        """
+        data = self.dump()
+        data["counters"] += counters()
+        data["gauges"] = gauges()
+        return data
+
+
+def counters():
+    """Collect cumulative statistics of this process.
+
+    The values are maintained by the respective components since process start and are reported and archived like
+    registry counters.
+    Modules that are not loaded in this process are skipped.
+
+    Returns
+    -------
+    list of list
+        Name, labels and value of each counter
+    """
+    values = []
+    for cache, module, attr in _caches:
+        module = sys.modules.get(module)
+        if module is None or not hasattr(module, attr):
+            continue
+        stats = getattr(module, attr).stats()
+        values += [["grommunio_admin_cache_hits_total", {"cache": cache}, stats["hits"]],
+                   ["grommunio_admin_cache_misses_total", {"cache": cache}, stats["misses"]]]
+    exmdb = sys.modules.get("services.exmdb")
+    pool = getattr(getattr(exmdb, "ExmdbService", None), "pool", None)
+    if pool is not None:
+        stats = pool.stats()
+        values += [["grommunio_admin_exmdb_pool_events_total", {"event": event}, stats[event]]
+                   for event in ("created", "reused", "evicted", "broken")]
+    return values
+
+
+def gauges():
+    """Collect current gauge values of this process.
+
+    Modules that are not loaded in this process are skipped.
+
+    Returns
+    -------
+    list of list
+        Name, labels and value of each gauge
+    """
+    values = [["grommunio_admin_processes", {}, 1]]
+    tasq = sys.modules.get("tools.tasq")
+    if tasq is not None:
+        server = tasq.TasQServer
+        values += [["grommunio_admin_tasq_running", {}, int(server.running())],
+                   ["grommunio_admin_tasq_workers", {}, server.workers()],
+                   ["grommunio_admin_tasq_queued", {}, server.queued()],
+                   ["grommunio_admin_tasq_busy", {}, server.busy()]]
+    services = sys.modules.get("services")
+    if services is not None:
+        for instance in list(services.ServiceHub._instances.values()):
+            values.append(["grommunio_admin_service_state", {"service": instance.name, "state": instance.statename}, 1])
+    for cache, module, attr in _caches:
+        module = sys.modules.get(module)
+        if module is None or not hasattr(module, attr):
+            continue
+        values.append(["grommunio_admin_cache_entries", {"cache": cache}, getattr(module, attr).stats()["size"]])
+    exmdb = sys.modules.get("services.exmdb")
+    pool = getattr(getattr(exmdb, "ExmdbService", None), "pool", None)
+    if pool is not None:
+        stats = pool.stats()
+        values += [["grommunio_admin_exmdb_pool_connections", {"state": state}, stats[state]]
+                   for state in ("leased", "idle")]
+    return values
+
+
+class MetricsStore:
+    """File backed metrics aggregation."""
+
+    def __init__(self, path, interval=5):
+        """Initialize store.
+
+        Parameters
+        ----------
+        path : str
+            Directory to store process metrics in. If None, only metrics of the current process are available.
+        interval : float, optional
+            Minimum time (in seconds) between two writes of the process metrics file. The default is 5.
+        """
+        self.path = path
+        self.interval = interval
+        self.registry = Registry()
+        self._flushed = 0
+        self._lock = threading.Lock()
+        if path is not None:
+            try:
+                os.makedirs(path, 0o700, exist_ok=True)
+            except OSError as err:
+                logger.warning("Cannot create metrics directory '{}' ({}), metrics will not be aggregated"
+                               .format(path, err.strerror))
+                self.path = None
+
+    def _file(self, pid):
+        return os.path.join(self.path, "metrics-{}.json".format(pid))
+
+    def flush(self, force=False):
+        """Write metrics of the current process to the shared directory.
+
+        Parameters
+        ----------
+        force : bool, optional
+            Write even if the flush interval has not elapsed. The default is False.
+        """
+        if self.path is None or (not force and time.monotonic()-self._flushed < self.interval):
+            return
+        if not self._lock.acquire(blocking=force):
+            return
+        try:
+            self._flushed = time.monotonic()
+            data = self.registry.snapshot()
+            temp = self._file(os.getpid())+".tmp"
+            try:  # Left over by a crashed process with the same PID
+                os.remove(temp)
+            except FileNotFoundError:
+                pass
+            with os.fdopen(os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_NOFOLLOW, 0o600), "w") as file:
+                json.dump(data, file)
+            os.replace(temp, self._file(os.getpid()))
+        except Exception as err:
+            logger.warning("Failed to write metrics: {}: {}".format(type(err).__name__, err))
+        finally:
+            self._lock.release()
+
+    @staticmethod
+    def _alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    @staticmethod
+    def _merge(target, data):
+        for name, labels, value in data.get("counters", ()):
+            key = _key(name, labels)
+            target["counters"][key] = target["counters"].get(key, 0)+value
+        for name, labels, buckets, total, count in data.get("histograms", ()):
+            key = _key(name, labels)
+            hist = target["histograms"].get(key)
+            if hist is None:
+                target["histograms"][key] = [list(buckets), total, count]
+            else:
+                hist[0] = [a+b for a, b in zip(hist[0], buckets)]
+                hist[1] += total
+                hist[2] += count
+        for name, labels, value in data.get("gauges", ()):
+            key = _key(name, labels)
+            target["gauges"][key] = target["gauges"].get(key, 0)+value
+
+    def _archive(self, dead):
+        """Fold counters and histograms of exited processes into the archive file."""
+        import fcntl
+        with open(os.path.join(self.path, "archive.json"), "a+") as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            file.seek(0)
+            content = file.read()
+            merged = {"counters": {}, "histograms": {}, "gauges": {}}
+            self._merge(merged, json.loads(content) if content else {})
+            for path in dead:
+                try:
+                    with open(path) as source:
+                        data = json.load(source)
+                except (OSError, ValueError):
+                    continue
+                data.pop("gauges", None)
+                self._merge(merged, data)
+            file.seek(0)
+            file.truncate()
+            json.dump({"counters": [[name, dict(labels), value]
+                                    for (name, labels), value in merged["counters"].items()],
+                       "histograms": [[name, dict(labels)]+hist
+                                      for (name, labels), hist in merged["histograms"].items()]}, file)
+            file.flush()
+            for path in dead:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def collect(self):
+        """Collect metrics of all processes.
+
+        Returns
+        -------
+        dict
+            Merged `counters`, `histograms` and `gauges`
+        """
+        merged = {"counters": {}, "histograms": {}, "gauges": {}}
+        self._merge(merged, self.registry.snapshot())
+        if self.path is None:
+            return merged
+        dead = []
+        ownFile = self._file(os.getpid())
+        for entry in os.scandir(self.path):
+            if not entry.name.startswith("metrics-") or not entry.name.endswith(".json") or entry.path == ownFile:
+                continue
+            try:
+                pid = int(entry.name[8:-5])
+            except ValueError:
+                continue
+            if not self._alive(pid):
+                dead.append(entry.path)
+                continue
+            try:
+                with open(entry.path) as file:
+                    self._merge(merged, json.load(file))
+            except (OSError, ValueError):
+                pass
+        if dead:
+            try:
+                self._archive(dead)
+            except Exception as err:
+                logger.warning("Failed to archive metrics: {}: {}".format(type(err).__name__, err))
+        try:
+            with open(os.path.join(self.path, "archive.json")) as file:
+                archive = json.load(file)
+            self._merge(merged, archive)
+        except (OSError, ValueError):
+            pass
+        return merged
+
+    def render(self):
+        """Render metrics of all processes in Prometheus text exposition format.
+
+        Returns
+        -------
+        str
+            Metrics text
+        """
+        def fmtLabels(labels, extra=()):
+            labels = tuple(labels)+tuple(extra)
+            if not labels:
+                return ""
+            return "{"+",".join('{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace("\"", "\\\"")
+                                                 .replace("\n", "\\n")) for key, value in labels)+"}"
+
+        merged = self.collect()
+        series = {}
+        for kind in ("counters", "gauges", "histograms"):
+            for (name, labels), value in merged[kind].items():
+                series.setdefault(name, []).append((labels, value))
+        lines = []
+        for name in sorted(series):
+            mtype, mhelp = _meta.get(name, ("untyped", ""))
+            lines += ["# HELP {} {}".format(name, mhelp), "# TYPE {} {}".format(name, mtype)]
+            for labels, value in sorted(series[name]):
+                if mtype != "histogram":
+                    lines.append("{}{} {}".format(name, fmtLabels(labels), value))
+                    continue
+                buckets, total, count = value
+                cumulative = 0
+                for bound, bucket in zip(BUCKETS+("+Inf",), buckets):
+                    cumulative += bucket
+                    lines.append("{}_bucket{} {}".format(name, fmtLabels(labels, (("le", bound),)), cumulative))
+                lines.append("{}_sum{} {}".format(name, fmtLabels(labels), total))
+                lines.append("{}_count{} {}".format(name, fmtLabels(labels), count))
+        return "\n".join(lines)+"\n"
+
+    def observeRequest(self, method, route, status, duration, queries=None):
+        """Record a handled API request.
+
+        Parameters
+        ----------
+        method : str
+            HTTP method
+        route : str
+            URL rule of the endpoint
+        status : int
+            HTTP status code of the response
+        duration : float
+            Processing time in seconds
+        queries : tuple, optional
+            Number and total duration of executed database queries. The default is None.
+        """
+        labels = {"method": method, "route": route}
+        self.registry.inc("grommunio_admin_requests_total", dict(labels, status=str(status)))
+        self.registry.observe("grommunio_admin_request_duration_seconds", labels, duration)
+        if queries is not None:
+            self.registry.inc("grommunio_admin_db_queries_total", labels, queries[0])
+            self.registry.inc("grommunio_admin_db_query_seconds_total", labels, queries[1])
+        self.flush()
+
+
+def _createStore():
+    conf = Config["metrics"]
+    if not conf["enabled"]:
+        return None
+    store = MetricsStore(conf["path"], conf["flushInterval"])
+    import atexit
+    atexit.register(store.flush, True)
+    return store
+
+
+Metrics = _createStore()
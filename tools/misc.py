@@ -81,6 +81,110 @@ class GenericObject:
         return getattr(self, item)
 
 
+class TTLCache:
+    """Thread-safe, size bounded cache with time based expiration.
+
+    Least recently used entries are evicted when the maximum size is reached.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60):
+        """Initialize cache.
+
+        Parameters
+        ----------
+        maxsize : int, optional
+            Maximum number of entries. The default is 1024.
+        ttl : float, optional
+            Time (in seconds) after which entries expire. A value of 0 disables the cache. The default is 60.
+        """
+        import threading
+        from collections import OrderedDict
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """Get cached value.
+
+        Parameters
+        ----------
+        key : Hashable
+            Key of the entry
+        default : Any, optional
+            Value to return if the key is not cached or has expired. The default is None.
+
+        Returns
+        -------
+        Any
+            Cached value or default
+        """
+        from time import monotonic
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value, ttl=None):
+        """Insert or replace cache entry.
+
+        Parameters
+        ----------
+        key : Hashable
+            Key of the entry
+        value : Any
+            Value to cache
+        ttl : float, optional
+            Override default expiration time. The default is None.
+
+        Returns
+        -------
+        Any
+            The cached value
+        """
+        from time import monotonic
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0 or self.maxsize <= 0:
+            return value
+        with self._lock:
+            self._data[key] = (monotonic()+ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(False)
+        return value
+
+    def pop(self, key, default=None):
+        """Remove entry from the cache."""
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def discard(self, predicate):
+        """Remove all entries for which predicate(key, value) returns True."""
+        with self._lock:
+            for key in [key for key, entry in self._data.items() if predicate(key, entry[1])]:
+                del self._data[key]
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """Return dictionary containing cache statistics."""
+        return dict(size=len(self._data), maxsize=self.maxsize, ttl=self.ttl, hits=self.hits, misses=self.misses)
+
+
 def setDirectoryOwner(path, uid=None, gid=None):
     """Recursively set directory ownership of path.
 
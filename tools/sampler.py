@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: 2026 grommunio GmbH
+
+import os
+import psutil
+import threading
+import time
+
+from collections import deque
+
+import logging
+logger = logging.getLogger("sampler")
+
+
+def sample():
+    """Collect current system metrics.
+
+    CPU percentages are calculated relative to the previous call.
+
+    Returns
+    -------
+    dict
+        Collected metrics
+    """
+    disks = []
+    for disk in psutil.disk_partitions():
+        try:
+            usage = psutil.disk_usage(disk.mountpoint)
+            stat = {"percent": usage.percent, "total": usage.total, "used": usage.used, "free": usage.free}
+            stat["device"] = disk.device
+            stat["mountpoint"] = disk.mountpoint
+            stat["filesystem"] = disk.fstype
+            disks.append(stat)
+        except:
+            pass
+    cpu = psutil.cpu_times_percent()
+    cpuPercent = dict(user=cpu.user, system=cpu.system, io=cpu.iowait, interrupt=cpu.irq+cpu.softirq, steal=cpu.steal,
+                      idle=cpu.idle)
+    vm = psutil.virtual_memory()
+    memory = dict(percent=vm.percent, total=vm.total, used=vm.used, buffer=vm.buffers, cache=vm.cached, free=vm.free,
+                  available=vm.available)
+    sm = psutil.swap_memory()
+    swap = dict(percent=sm.percent, total=sm.total, used=sm.used, free=sm.free)
+    return dict(timestamp=time.time(), disks=disks, load=os.getloadavg(), cpuPercent=cpuPercent, memory=memory,
+                swap=swap)
+
+
+class MetricsSampler:
+    """Background system metrics collector.
+
+    Samples system metrics at a fixed interval and stores them in a ring buffer.
+    The sampling thread is started on first access and restarted automatically after a fork.
+    """
+
+    def __init__(self, interval=5, size=720):
+        """Initialize sampler.
+
+        Parameters
+        ----------
+        interval : float, optional
+            Time (in seconds) between two samples. The default is 5.
+        size : int, optional
+            Number of samples to keep. The default is 720.
+        """
+        self.interval = interval
+        self.samples = deque(maxlen=max(1, size))
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.samples.append(sample())
+            except Exception as err:
+                logger.warning("Failed to collect metrics: {}: {}".format(type(err).__name__, err))
+
+    def start(self):
+        """Start the sampling thread if it is not running in the current process."""
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self.samples.clear()
+            self.samples.append(sample())
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="Metrics sampler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the sampling thread."""
+        self._stop.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join()
+        self._thread = None
+
+    def latest(self):
+        """Get most recent sample.
+
+        Returns
+        -------
+        dict
+            Latest metrics sample
+        """
+        self.start()
+        return self.samples[-1]
+
+    def history(self, limit=None):
+        """Get recent samples.
+
+        Parameters
+        ----------
+        limit : int, optional
+            Maximum number of samples to return. The default is None (all).
+
+        Returns
+        -------
+        list of dict
+            Samples in chronological order
+        """
+        self.start()
+        samples = list(self.samples)
+        return samples if limit is None else samples[-limit:] if limit > 0 else []
+
+
+def _createSampler():
+    from .config import Config
+    conf = Config["options"]["dashboard"]
+    return MetricsSampler(conf["sampleInterval"], conf["historySize"])
+
+
+Sampler = _createSampler()
@@ -0,0 +1,376 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: 2026 grommunio GmbH
+
+import os
+import sqlite3
+import threading
+import time
+
+from functools import lru_cache
+
+from .config import Config
+
+import logging
+logger = logging.getLogger("search")
+
+# Models that can be indexed, as name -> (module, class)
+indexable = {"users": ("orm.users", "Users"), "domains": ("orm.domains", "Domains")}
+
+
+def _model(name):
+    import importlib
+    module, cls = indexable[name]
+    return getattr(importlib.import_module(module), cls)
+
+
+@lru_cache(maxsize=None)
+def matchFields(Model):
+    """Get indexable match fields of a model.
+
+    Fields can be indexed if they are matched against a column of the model itself. Hybrid properties mapping directly
+    to a column (e.g. `Domains.domainname`) are indexed using the stored column value.
+
+    Parameters
+    ----------
+    Model : SQLAlchemy model with DataModel extension
+        Model to inspect
+
+    Returns
+    -------
+    dict
+        Mapping of field alias to column attribute name
+    bool
+        Whether all matchable fields can be indexed
+    """
+    from sqlalchemy.inspection import inspect
+    from sqlalchemy.orm import ColumnProperty
+    Model._init()
+    columns = {attr.key for attr in inspect(Model).column_attrs}
+
+    def column(attr):
+        prop = getattr(getattr(Model, attr, None), "property", None)
+        return prop.key if isinstance(prop, ColumnProperty) and prop.key in columns else None
+
+    indexed = {prop.alias: column(prop.attr) for prop in Model._meta.matchables
+               if prop.match == "default" and prop.proxy is None and prop.target is None and column(prop.attr)}
+    return indexed, len(indexed) == len(Model._meta.matchables)
+
+
+class SearchIndex:
+    """Trigram index over the match fields of DataModel classes.
+
+    Each field value is stored as a separate document in an SQLite FTS5 table using the trigram tokenizer, which
+    supports case-insensitive substring queries of three or more characters. Ranking is done by the BM25 score of the
+    best matching field.
+    """
+
+    _schema = """CREATE TABLE IF NOT EXISTS docs (
+                     rowid INTEGER PRIMARY KEY,
+                     model TEXT NOT NULL,
+                     id INTEGER NOT NULL,
+                     field TEXT NOT NULL,
+                     UNIQUE (model, id, field));
+                 CREATE VIRTUAL TABLE IF NOT EXISTS terms USING fts5(value, tokenize='trigram');
+                 CREATE TABLE IF NOT EXISTS models (
+                     model TEXT PRIMARY KEY,
+                     built REAL NOT NULL);"""
+
+    def __init__(self, path: str = None, readonly: bool = False):
+        """Open search index.
+
+        Parameters
+        ----------
+        path : str, optional
+            Path to the index file. The default is taken from the `options.search.indexPath` configuration value.
+        readonly : bool, optional
+            Whether to open the index in read-only mode. The default is False.
+
+        Raises
+        ------
+        sqlite3.OperationalError
+            Index file could not be opened or created
+        """
+        self.path = path or Config["options"]["search"]["indexPath"]
+        if readonly:
+            self.conn = sqlite3.connect("file:{}?mode=ro".format(self.path), uri=True)
+        else:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.conn = sqlite3.connect(self.path, timeout=30)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(self._schema)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Close the index file."""
+        self.conn.close()
+
+    def _remove(self, model, ID, field=None):
+        if field is None:
+            rows = self.conn.execute("SELECT rowid FROM docs WHERE model=? AND id=?", (model, ID)).fetchall()
+        else:
+            rows = self.conn.execute("SELECT rowid FROM docs WHERE model=? AND id=? AND field=?",
+                                     (model, ID, field)).fetchall()
+        self.conn.executemany("DELETE FROM terms WHERE rowid=?", rows)
+        self.conn.executemany("DELETE FROM docs WHERE rowid=?", rows)
+
+    def _insert(self, model, ID, values):
+        for field, value in values.items():
+            if value is None or value == "":
+                self._remove(model, ID, field)
+                continue
+            row = self.conn.execute("SELECT rowid FROM docs WHERE model=? AND id=? AND field=?",
+                                    (model, ID, field)).fetchone()
+            rowid = row[0] if row else self.conn.execute("INSERT INTO docs (model, id, field) VALUES (?, ?, ?)",
+                                                         (model, ID, field)).lastrowid
+            self.conn.execute("INSERT OR REPLACE INTO terms (rowid, value) VALUES (?, ?)", (rowid, str(value)))
+
+    def apply(self, changes):
+        """Apply object changes.
+
+        Parameters
+        ----------
+        changes : dict
+            Mapping of (model, ID) to a dict of changed field values or None if the object was deleted
+        """
+        with self.conn:
+            for (model, ID), values in changes.items():
+                if values is None:
+                    self._remove(model, ID)
+                else:
+                    self._insert(model, ID, values)
+
+    def rebuild(self, model: str, batch: int = 10000):
+        """Recreate index of a model from the database.
+
+        Parameters
+        ----------
+        model : str
+            Name of the model (see `indexable`)
+        batch : int, optional
+            Number of objects to load at once. The default is 10000.
+
+        Returns
+        -------
+        int
+            Number of indexed objects
+        """
+        from orm import DB
+        Model = _model(model)
+        indexed, _ = matchFields(Model)
+        aliases = tuple(indexed)
+        query = DB.session.query(Model.ID, *(getattr(Model, indexed[alias]) for alias in aliases))
+        count = 0
+        with self.conn:
+            self.conn.execute("DELETE FROM terms WHERE rowid IN (SELECT rowid FROM docs WHERE model=?)", (model,))
+            self.conn.execute("DELETE FROM docs WHERE model=?", (model,))
+            for row in query.yield_per(batch):
+                self._insert(model, row[0], dict(zip(aliases, row[1:])))
+                count += 1
+            self.conn.execute("INSERT OR REPLACE INTO models VALUES (?, ?)", (model, time.time()))
+        return count
+
+    def built(self, model: str):
+        """Get time of the last rebuild.
+
+        Parameters
+        ----------
+        model : str
+            Name of the model
+
+        Returns
+        -------
+        float
+            Timestamp of the last rebuild or None if the model was never indexed
+        """
+        row = self.conn.execute("SELECT built FROM models WHERE model=?", (model,)).fetchone()
+        return row[0] if row else None
+
+    def search(self, model: str, expr: str, fields=None, limit: int = 1000):
+        """Find best matching objects.
+
+        An object matches if any of the words in `expr` is contained in any of its fields.
+        The search is only performed if at most `limit` objects match, so that the result always contains all matching
+        objects.
+
+        Parameters
+        ----------
+        model : str
+            Name of the model
+        expr : str
+            Search expression
+        fields : Collection of str, optional
+            Only match against these fields. The default is None.
+        limit : int, optional
+            Maximum number of matching objects. The default is 1000.
+
+        Returns
+        -------
+        list of int
+            IDs of the matching objects, best match first, or None if more than `limit` objects match or `expr`
+            contains words shorter than three characters, which cannot be looked up in the index.
+        """
+        words = expr.split()
+        if not words or any(len(word) < 3 for word in words):
+            return None
+        match = " OR ".join('"{}"'.format(word.replace('"', '""')) for word in words)
+        if fields is not None:  # Bail out early if there are obviously too many matches
+            bound = limit*len(fields)
+            if self.conn.execute("SELECT COUNT(*) FROM (SELECT 1 FROM terms WHERE terms MATCH ? LIMIT ?)",
+                                 (match, bound+1)).fetchone()[0] > bound:
+                return None
+        fieldFilter, params = "", [match, model]
+        if fields is not None:
+            fieldFilter = " AND docs.field IN ({})".format(",".join("?"*len(fields)))
+            params += list(fields)
+        sql = "SELECT docs.id FROM terms CROSS JOIN docs ON docs.rowid=terms.rowid WHERE terms MATCH ? AND docs.model=?"+\
+              fieldFilter+" GROUP BY docs.id ORDER BY MIN(terms.rank), docs.id LIMIT ?"
+        IDs = [row[0] for row in self.conn.execute(sql, params+[limit+1])]
+        return IDs if len(IDs) <= limit else None
+
+    def stats(self):
+        """Get per-model index statistics.
+
+        Returns
+        -------
+        dict
+            Mapping of model name to number of `objects`, `documents` and time of the last rebuild
+        """
+        counts = {row[0]: (row[1], row[2]) for row in
+                  self.conn.execute("SELECT model, COUNT(DISTINCT id), COUNT(*) FROM docs GROUP BY model")}
+        return {model: {"objects": counts.get(model, (0, 0))[0], "documents": counts.get(model, (0, 0))[1],
+                        "built": built}
+                for model, built in self.conn.execute("SELECT model, built FROM models")}
+
+
+_local = threading.local()
+
+
+def _index():
+    """Get index connection of the current thread."""
+    if getattr(_local, "pid", None) != os.getpid():
+        _local.index = SearchIndex()
+        _local.pid = os.getpid()
+    return _local.index
+
+
+def _modelName(Model):
+    return next((name for name, (module, cls) in indexable.items()
+                 if Model.__module__ == module and Model.__name__ == cls), None)
+
+
+def rankedMatch(Model, expr, fields=None):
+    """Look up matching objects in the search index.
+
+    Only used if `options.search.engine` is set to "index".
+    If more than `options.search.candidates` objects match, the index is not used, as the candidates might not include
+    all objects passing additional filters of the query.
+
+    Parameters
+    ----------
+    Model : SQLAlchemy model with DataModel extension
+        Model to search
+    expr : str
+        Search expression
+    fields : Collection of str, optional
+        Only match against these fields. The default is None.
+
+    Returns
+    -------
+    list of int
+        IDs of all matching objects, best match first, or None if the index cannot be used for this query
+    """
+    conf = Config["options"]["search"]
+    name = _modelName(Model)
+    if conf["engine"] != "index" or name is None:
+        return None
+    indexed, complete = matchFields(Model)
+    if (fields is None and not complete) or (fields is not None and not set(fields) <= set(indexed)):
+        return None
+    try:
+        index = _index()
+        if index.built(name) is None:
+            return None
+        return index.search(name, expr, tuple(indexed) if fields is None else fields, conf["candidates"])
+    except sqlite3.Error as err:
+        logger.warning("Search index lookup failed: {}".format(" - ".join(str(arg) for arg in err.args)))
+        return None
+
+
+def _commit(session):
+    changes = session.info.pop("searchIndex", None)
+    if not changes:
+        return
+    try:
+        _index().apply(changes)
+    except sqlite3.Error as err:
+        logger.warning("Failed to update search index ({}), rebuild required"
+                       .format(" - ".join(str(arg) for arg in err.args)))
+
+
+def _rollback(session):
+    session.info.pop("searchIndex", None)
+
+
+_sessionTracked = False
+
+
+def track(Model):
+    """Keep search index of a model up to date.
+
+    Changes to objects made through the ORM are recorded and written to the index when the session is committed.
+    Bulk operations bypassing the ORM are not tracked and require an index rebuild.
+    Has no effect unless `options.search.engine` is set to "index".
+
+    Parameters
+    ----------
+    Model : SQLAlchemy model with DataModel extension
+        Model to track
+    """
+    global _sessionTracked
+    if Config["options"]["search"]["engine"] != "index":
+        return
+    from sqlalchemy import event
+    from sqlalchemy.orm import object_session
+    from sqlalchemy.orm.attributes import get_history
+    from orm import DB
+    name = _modelName(Model)
+
+    def record(target, values):
+        session = object_session(target)
+        if session is None:
+            return
+        changes = session.info.setdefault("searchIndex", {})
+        key = (name, target.ID)
+        if values is None or changes.get(key) is None:
+            changes[key] = values
+        else:
+            changes[key].update(values)
+
+    def inserted(mapper, connection, target):
+        indexed, _ = matchFields(Model)  # Resolved on first use, as mappers cannot be inspected during import
+        record(target, {alias: getattr(target, attr) for alias, attr in indexed.items()})
+
+    def updated(mapper, connection, target):
+        indexed, _ = matchFields(Model)
+        values = {alias: getattr(target, attr) for alias, attr in indexed.items()
+                  if get_history(target, attr).has_changes()}
+        if values:
+            record(target, values)
+
+    def deleted(mapper, connection, target):
+        record(target, None)
+
+    event.listen(Model, "after_insert", inserted)
+    event.listen(Model, "after_update", updated)
+    event.listen(Model, "after_delete", deleted)
+    if not _sessionTracked:
+        event.listen(DB.session, "after_commit", _commit)
+        event.listen(DB.session, "after_rollback", _rollback)
+        _sessionTracked = True
@@ -306,13 +306,17 @@ class UserSetup(SetupContext):
     contains a short error description and the `errorCode` attribute is set to an appropriate HTTP status code.
     """
 
-    def __init__(self, user, session):
+    def __init__(self, user, session, template=None):
         """Initialize context object.
 
         Parameters
         ----------
         user : orm.users.Users
             User to initialize.
+        session : sqlalchemy.orm.Session
+            Session to commit the home directory with, or None to leave committing to the caller.
+        template : UserTemplate, optional
+            Pre-initialized store to copy instead of running gromox-mkprivate. The default is None.
         """
         self.lastEid = Misc.ALLOCATED_EID_RANGE
         self.lastCn = Misc.CHANGE_NUMBER_BEGIN
@@ -320,6 +324,7 @@ class UserSetup(SetupContext):
 
         self.user = user
         self.session = session
+        self.template = template
 
         self.success = False
         self.error = self.errorCode = None
@@ -329,7 +334,8 @@ class UserSetup(SetupContext):
         try:
             fileUid, fileGid = Config["options"].get("fileUid"), Config["options"].get("fileGid")
             self.createHomedir(fileUid, fileGid)
-            self.session.commit()
+            if self.session is not None:
+                self.session.commit()
             self.createExmdb()
             self.createMidb()
             try:
@@ -344,7 +350,7 @@ class UserSetup(SetupContext):
             self.errorCode = 500
             self.user.maildir = ""
         except FileExistsError:
-            logger.error("Failed to create {}: Directory exists.".format(self.domain.homedir))
+            logger.error("Failed to create {}: Directory exists.".format(self.user.maildir))
             self.error = "Could not create home directory: File exists"
             self.errorCode = 500
             self.user.maildir = ""
@@ -405,9 +411,22 @@ class UserSetup(SetupContext):
 
         Database is placed under <homedir>/exmdb/exchange.sqlite3.
         """
+        dbPath = os.path.join(self.user.maildir, "exmdb", "exchange.sqlite3")
+        if self.template is not None:
+            self.template.instantiate(dbPath, self.user.ID)
+            return
         if self.mkext("gromox-mkprivate", self.user.username):
             return
-        dbPath = os.path.join(self.user.maildir, "exmdb", "exchange.sqlite3")
+        self.initExmdb(dbPath)
+
+    def initExmdb(self, dbPath):
+        """Initialize exchange SQLite database from the bundled schema.
+
+        Parameters
+        ----------
+        dbPath : str
+            Path of the database file to create
+        """
         shutil.copy("res/user.sqlite3", dbPath)
         self.exmdb = sqlite3.connect(dbPath)
         ntNow = ntTime()
@@ -463,3 +482,63 @@ class UserSetup(SetupContext):
         DB.execute("INSERT INTO configurations VALUES (1, ?)", (self.user.username,))
         DB.commit()
         DB.close()
+
+
+class UserTemplate:
+    """Pre-initialized private store database.
+
+    Creating a store from the template only requires copying the database file and patching the few values that
+    depend on the user (folder change keys and mailbox GUID), which is considerably faster than setting up every
+    store from scratch.
+
+    The template is stored in a temporary directory, which is removed when `close` is called.
+    """
+
+    def __init__(self):
+        """Create template database."""
+        import tempfile
+        from .misc import GenericObject
+        self._tmpdir = tempfile.TemporaryDirectory(prefix="grommunio-admin-")
+        self.path = os.path.join(self._tmpdir.name, "exchange.sqlite3")
+        setup = UserSetup(GenericObject(ID=0, username="", maildir=self._tmpdir.name), None)
+        setup.initExmdb(self.path)
+        db = sqlite3.connect(self.path)
+        self.changeKeys = [(folderID, int.from_bytes(changeKey[16:], "big")) for folderID, changeKey in
+                           db.execute("SELECT folder_id, propval FROM folder_properties WHERE proptag=?",
+                                      (PropTags.CHANGEKEY,))]
+        db.close()
+
+    @classmethod
+    def create(cls):
+        """Create template if stores are not created by gromox-mkprivate.
+
+        Returns
+        -------
+        UserTemplate
+            New template or None if gromox-mkprivate is available
+        """
+        return None if shutil.which("gromox-mkprivate") else cls()
+
+    def close(self):
+        """Remove template database."""
+        self._tmpdir.cleanup()
+
+    def instantiate(self, dbPath, userID):
+        """Create store database for a user.
+
+        Parameters
+        ----------
+        dbPath : str
+            Path of the database file to create
+        userID : int
+            ID of the user
+        """
+        shutil.copy(self.path, dbPath)
+        db = sqlite3.connect(dbPath)
+        stmt = "UPDATE folder_properties SET propval=? WHERE folder_id=? AND proptag=?"
+        xids = [(folderID, XID.fromDomainID(userID, changeNum).serialize()) for folderID, changeNum in self.changeKeys]
+        db.executemany(stmt, ((xid, folderID, PropTags.CHANGEKEY) for folderID, xid in xids))
+        db.executemany(stmt, ((b'\x16'+xid, folderID, PropTags.PREDECESSORCHANGELIST) for folderID, xid in xids))
+        db.execute("UPDATE configurations SET config_value=? WHERE config_id=?", (str(GUID.random()), ConfigIDs.MAILBOX_GUID))
+        db.commit()
+        db.close()
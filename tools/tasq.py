@@ -10,6 +10,8 @@ import queue
 
 logger = logging.getLogger("tasq")
 
+_procFinished = None  # Output queue of the current pool process
+
 
 class Task:
     QUEUED = 0  # Stored in database
@@ -41,8 +43,33 @@ class Task:
         return "<Task #{} ({}) '{}({})'>".format(self.ID, self.statename, self.command, self.params)
 
 
+def _processInit(finished):
+    """Initialize a pool process.
+
+    Detaches the inherited database connections and sets up the output queue.
+
+    Parameters
+    ----------
+    finished : multiprocessing.Queue
+        Queue to send control messages to.
+    """
+    global _procFinished
+    import signal
+    import sys
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _procFinished = finished
+    orm = sys.modules.get("orm")
+    if orm is not None and orm.DB is not None:
+        orm.DB.afterFork()
+
+
+def _processDispatch(task):
+    """Execute task in a pool process."""
+    return Worker(None, _procFinished).process(task)
+
+
 class Worker:
-    def __init__(self, _queued=None, _finished=None):
+    def __init__(self, _queued=None, _finished=None, _pool=None, _limits=None):
         """Start TasQ worker.
 
         Omitting in- and output queues will not start the main loop,
@@ -52,13 +79,19 @@ class Worker:
         ----------
         _queued : Queue, optional
             Input queue. The default is None.
-        _finished : TYPE, optional
+        _finished : Queue, optional
             Output queue. The default is None.
+        _pool : callable, optional
+            Function returning the process pool to execute tasks in (see `TasQServer._getPool`). If None, tasks are
+            executed in the current thread. The default is None.
+        _limits : dict, optional
+            Mapping of command name -> Semaphore restricting concurrent execution. The default is None.
         """
         self._queued, self._finished = _queued, _finished
+        self._pool, self._limits = _pool, _limits or {}
+        self.__current = None
         if None not in (_queued, _finished):
             self.run()
-        self.__current = None
 
     def log(self, level, message):
         if self._finished is None:
@@ -68,7 +101,9 @@ class Worker:
 
     def bump(self):
         if self._finished is not None:
-            self._finished.put(Task(self.__current.ID, "control", dict(cmd="bump"), message=self.__current.message))
+            self._finished.put(Task(self.__current.ID, "control",
+                                    dict(cmd="bump", progress=self.__current.params.get("progress")),
+                                    message=self.__current.message))
 
     def dispatch(self, task):
         from time import time
@@ -91,12 +126,55 @@ class Worker:
         task.message = task.message or "Completed ({:.1f}ms)".format(1000*duration)
         return task
 
+    def process(self, task):
+        """Dispatch task and track it as current task."""
+        self.__current = task
+        try:
+            return self.dispatch(task)
+        finally:
+            self.__current = None
+
+    def execute(self, task):
+        """Execute task, either locally or in the process pool.
+
+        Control commands are always executed locally.
+
+        Parameters
+        ----------
+        task : Task
+            Task to execute
+
+        Returns
+        -------
+        Task
+            The completed task
+        """
+        if self._pool is None or task.command == "control":
+            return self.process(task)
+        from concurrent.futures.process import BrokenProcessPool
+        pool = self._pool()
+        try:
+            return pool.submit(_processDispatch, task).result()
+        except BrokenProcessPool:
+            self._pool(pool)
+            task.state = Task.ERROR
+            task.message = "Process execution failed: pool process terminated unexpectedly"
+            return task
+        except Exception as err:
+            task.state = Task.ERROR
+            task.message = "Process execution failed: "+" - ".join(str(arg) for arg in err.args)[:120]
+            return task
+
     def run(self):
         while True:
-            self.__current = task = self._queued.get()
-            self.dispatch(task)
+            task = self._queued.get()
+            limit = self._limits.get(task.command)
+            if limit is None:
+                task = self.execute(task)
+            else:
+                with limit:
+                    task = self.execute(task)
             self._finished.put(task)
-            self.__current = None
 
     def control(self, task):
         command = task.params.get("cmd")
@@ -129,8 +207,7 @@ class Worker:
             raise Exception("Missing arguments for delFolder")
         from services import Service
         with Service("exmdb") as exmdb:
-            host = task.params.get("homeserver") or exmdb.host
-            client = exmdb.ExmdbQueries(host, exmdb.port, task.params["homedir"], task.params["private"])
+            client = exmdb.client(task.params["homedir"], task.params["private"], task.params.get("homeserver"))
             client.deleteFolder(task.params["homedir"], task.params["folderID"], task.params.get("clear", False))
 
     def _ldapSyncUser(self, user, ldap):
@@ -226,12 +303,173 @@ class Worker:
             syncStatus.append(status)
         return syncStatus
 
+    def _ldapSyncApply(self, user, results, ldap):
+        """Apply downloaded LDAP data to a user.
+
+        Changes are applied in a savepoint and must be committed by the caller.
+
+        Parameters
+        ----------
+        user : orm.users.Users
+            User to update
+        results : list of services.ldap.SearchResult
+            LDAP objects matching the user's external ID
+        ldap : services.ldap.LdapService
+            LDAP service the results were retrieved from
+
+        Returns
+        -------
+        dict
+            Synchronization status
+        """
+        from orm import DB
+        from sqlalchemy.exc import IntegrityError
+        from tools.DataModel import InvalidAttributeError, MismatchROError
+        import traceback
+        if not results:
+            return {"ID": user.ID, "username": user.username, "code": 404, "message": "LDAP object not found"}
+        if len(results) > 1:
+            return {"ID": user.ID, "username": user.username, "code": 500, "message": "Multiple entries found"}
+        try:
+            with DB.session.begin_nested():
+                user.fromdict(results[0].userdata(dict(user.properties.items())))
+            return {"ID": user.ID, "username": user.username, "code": 200, "message": "Synchronization successful"}
+        except (MismatchROError, InvalidAttributeError, ValueError):
+            self.log("ERROR", traceback.format_exc(2))
+            return {"ID": user.ID, "username": user.username, "code": 500, "message": "Synchronization error"}
+        except IntegrityError as err:
+            self.log("ERROR", traceback.format_exc(2))
+            return {"ID": user.ID, "username": user.username, "code": 400,
+                    "message": "Database integrity error: "+err.orig.args[1]}
+        except Exception:
+            self.log("ERROR", traceback.format_exc(2))
+            return {"ID": user.ID, "username": user.username, "code": 500, "message": "Unknown error"}
+
+    def _ldapSyncOrg(self, users, ldap, connections, batchSize, report):
+        """Synchronize linked users of a single organization.
+
+        Users are fetched from LDAP in batches, distributed over a pool of connections.
+        Each batch is applied to the database in a single commit.
+
+        Parameters
+        ----------
+        users : list of orm.users.Users
+            Users to synchronize
+        ldap : services.ldap.LdapService
+            LDAP service of the organization
+        connections : int
+            Maximum number of parallel LDAP connections
+        batchSize : int
+            Number of users to fetch and commit at once
+        report : function
+            Called with the list of status dicts after each batch
+
+        Returns
+        -------
+        str
+            Latest change mark of all fetched objects, or None if any batch could not be fetched
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        from orm import DB
+        from services import ServiceUnavailableError
+        batches = [users[i:i+batchSize] for i in range(0, len(users), batchSize)]
+        workers = ldap.growPool(connections)
+        mark = None
+        complete = True
+        with ThreadPoolExecutor(workers, thread_name_prefix="LDAP Sync") as executor:
+            futures = [executor.submit(ldap.getAll, [user.externID for user in batch], "sync") for batch in batches]
+            for batch, future in zip(batches, futures):
+                try:
+                    fetched = future.result()
+                except Exception as err:
+                    msg = err.args[0] if isinstance(err, ServiceUnavailableError) else "LDAP query failed"
+                    report([dict(ID=user.ID, username=user.username, code=503, message=msg) for user in batch])
+                    complete = False
+                    continue
+                results = {}
+                for result in fetched:
+                    results.setdefault(result.ID, []).append(result)
+                mark = ldap.syncMark(fetched, mark)
+                status = [self._ldapSyncApply(user, results.get(user.externID), ldap) for user in batch]
+                DB.session.commit()
+                report(status)
+        return mark if complete else None
+
+    def _ldapSyncOrgDelta(self, users, ldap, mark, batchSize, report):
+        """Synchronize linked users of a single organization modified since the last sync.
+
+        Only objects changed since `mark` are downloaded and applied. Deleted objects are not detected.
+
+        Parameters
+        ----------
+        users : list of orm.users.Users
+            Users to synchronize
+        ldap : services.ldap.LdapService
+            LDAP service of the organization
+        mark : str
+            Change mark of the last synchronization
+        batchSize : int
+            Number of users to commit at once
+        report : function
+            Called with the list of status dicts after each batch
+
+        Returns
+        -------
+        str
+            New change mark
+        """
+        from orm import DB
+        fetched = ldap.getChanged(mark)
+        changed = {}
+        for result in fetched:
+            changed.setdefault(result.ID, []).append(result)
+        modified = [user for user in users if user.externID in changed]
+        report([dict(ID=user.ID, username=user.username, code=200, message="Not modified")
+                for user in users if user.externID not in changed])
+        for i in range(0, len(modified), batchSize):
+            batch = modified[i:i+batchSize]
+            status = [self._ldapSyncApply(user, changed[user.externID], ldap) for user in batch]
+            DB.session.commit()
+            report(status)
+        return ldap.syncMark(fetched, mark)
+
+    @staticmethod
+    def _ldapSyncState(orgID, state=None):
+        """Load or save synchronization state of an organization.
+
+        Parameters
+        ----------
+        orgID : int
+            ID of the organization
+        state : dict, optional
+            State to save. If None, the current state is loaded. The default is None.
+
+        Returns
+        -------
+        dict
+            Synchronization state
+        """
+        from orm.misc import DB, DBConf
+        import json
+        if state is None:
+            try:
+                return json.loads(DBConf.getValue("grommunio-admin", "ldap-sync", str(orgID), "{}"))
+            except json.JSONDecodeError:
+                return {}
+        DBConf.setValue("grommunio-admin", "ldap-sync", str(orgID), json.dumps(state, separators=(",", ":")))
+        DB.session.commit()
+        return state
+
     def ldapSync(self, task):
-        def bump():
+        def bump(force=False):
             nonlocal last
-            if time.time()-last < updateInterval:
+            if time.time()-last < updateInterval and not force:
                 return
-            updateMessage()
+            updateMessage(task, counts)
+            elapsed = time.time()-start
+            processed = counts["synced"]+counts["created"]+counts["error"]
+            task.params["progress"] = dict(processed=processed, total=counts["sync"], elapsed=round(elapsed, 1),
+                                           rate=round(processed/elapsed, 1) if elapsed else 0)
             last = time.time()
             self.bump()
 
@@ -245,6 +483,14 @@ class Worker:
             if counts["error"]:
                 task.message += ", {} error{}".format(counts["error"], "" if counts["error"] == 1 else "s")
 
+        def report(status):
+            syncStatus.extend(status)
+            for s in status:
+                counts[statusCat(s["code"])] += 1
+                if s["code"] == 200:
+                    synced.add(s["username"])
+            bump()
+
         from orm.domains import Domains, OrgParam
         from orm.users import Aliases, Users
         from services import Service, ServiceUnavailableError
@@ -254,6 +500,10 @@ class Worker:
         orgID = task.params.get("orgID")
         domainID = task.params.get("domainID")
         updateInterval = task.params.get("updateInterval", 5)
+        connections = task.params.get("connections", 4)
+        batchSize = task.params.get("batchSize", 100)
+        delta = task.params.get("delta", False)
+        fullSyncInterval = task.params.get("fullSyncInterval", 86400)
         Aliases.NTactive(False)
         Users.NTactive(False)
 
@@ -275,22 +525,33 @@ class Worker:
         counts = dict(created=0, synced=0, error=0, create=0, sync=len(users))
         syncStatus = []
         synced = set()
+        orgUsers = {}
+        for user in users:
+            orgUsers.setdefault(user.orgID, []).append(user)
 
         Aliases.NTactive(True)
         Users.NTactive(True)
 
-        for user in users:
-            bump()
+        for userOrg, members in orgUsers.items():
             try:
-                with Service("ldap", user.orgID) as ldap:
-                    status = self._ldapSyncUser(user, ldap)
-                syncStatus.append(status)
-                counts[statusCat(status["code"])] += 1
-                if status["code"] == 200:
-                    synced.add(user.username)
+                with Service("ldap", userOrg) as ldap:
+                    state = self._ldapSyncState(userOrg)
+                    if delta and state.get("mark") and state.get("attr") == ldap.changeAttribute and \
+                       time.time()-state.get("full", 0) < fullSyncInterval:
+                        mark = self._ldapSyncOrgDelta(members, ldap, state["mark"], batchSize, report)
+                    else:
+                        mark = self._ldapSyncOrg(members, ldap, connections, batchSize, report)
+                        state["full"] = int(time.time())
+                    if domainID is None and mark is not None:  # Only advance after synchronizing the complete org
+                        state.update(attr=ldap.changeAttribute, mark=mark)
+                        self._ldapSyncState(userOrg, state)
             except ServiceUnavailableError as err:
-                syncStatus.append(dict(ID=user.ID, username=user.username, code=503, message=err.args[0]))
-                counts["error"] += 1
+                done = {s["ID"] for s in syncStatus if "ID" in s}
+                report([dict(ID=user.ID, username=user.username, code=503, message=err.args[0])
+                        for user in members if user.ID not in done])
+
+        Aliases.NTactive(True)
+        Users.NTactive(True)
 
         if task.params.get("import"):
             for orgID in orgIDs:
@@ -304,14 +565,29 @@ class Worker:
                 except ServiceUnavailableError:
                     pass
 
-        Aliases.NTactive(True)
-        Users.NTactive(True)
-
-        updateMessage(task, counts)
+        bump(True)
         task.message += " ({:.1f}s)".format(time.time()-start)
         task.params["result"] = syncStatus
 
-    cmap = {"control": control, "debug": debug, "delFolder": deleteFolder, "ldapSync": ldapSync}
+    def createUsers(self, task):
+        import time
+        from orm.users import Users
+
+        def progress(processed):
+            task.message = "{}/{} processed".format(processed, len(records))
+            task.params["progress"] = dict(processed=processed, total=len(records), elapsed=round(time.time()-start, 1))
+            self.bump()
+
+        start = time.time()
+        records = task.params.pop("data", [])
+        status = Users.createBulk(records, task.params.get("sync", True), task.params.get("batchSize", 100),
+                                  task.params.get("workers", 4), progress, task.params.pop("passwordHashes", None))
+        created = sum(1 for s in status if s["code"] == 201)
+        task.message = "{}/{} created ({:.1f}s)".format(created, len(records), time.time()-start)
+        task.params["result"] = status
+
+    cmap = {"control": control, "debug": debug, "delFolder": deleteFolder, "ldapSync": ldapSync,
+            "createUsers": createUsers}
 
 
 class TasQServer:
@@ -329,6 +605,9 @@ class TasQServer:
     _active_lock = threading.Lock()
     _localID = 0
     _workers = []
+    _pool = None
+    _poolLock = threading.Lock()
+    _relay = None
 
     @classmethod
     def _schedule(cls, task):
@@ -411,8 +690,14 @@ class TasQServer:
         atexit.register(cls.stop)
         conf = Config.get("tasq", {})
         workers = workers or conf.get("workers", 1)
-        logger.info("Starting TasQ server with {} worker{}".format(workers, "" if workers == 1 else "s"))
-        cls._workers = [threading.Thread(target=Worker, args=(cls._queued, cls._finished), name="TasQ Worker")
+        backend = conf.get("backend", "thread")
+        limits = {command: threading.BoundedSemaphore(limit) for command, limit in conf.get("limits", {}).items()}
+        logger.info("Starting TasQ server with {} {} worker{}".format(workers, backend, "" if workers == 1 else "s"))
+        if backend == "process":
+            cls._startPool(workers)
+        pool = cls._getPool if cls._pool is not None else None
+        cls._workers = [threading.Thread(target=Worker, args=(cls._queued, cls._finished, pool, limits),
+                                         name="TasQ Worker")
                         for _ in range(workers)]
         for worker in cls._workers:
             worker.start()
@@ -472,11 +757,115 @@ class TasQServer:
         logger.debug("Waiting for workers to exit")
         for proc in cls._workers:
             proc.join(max(timeout-time(), 0) if timeout is not None else None)
+        cls._stopPool(max(timeout-time(), 0) if timeout is not None else None)
         cls._finished.put(Task(0, "control", {"cmd": "exit", "dbg": "thread"}))
         cls._clerk.join()
         cls._state = cls.STOPPED
         logger.info("TasQ server stopped")
 
+    @classmethod
+    def _startPool(cls, processes):
+        """Start process pool and message relay.
+
+        Processes are forked, so the pool must be created before any worker threads are started.
+
+        Parameters
+        ----------
+        processes : int
+            Number of processes to start
+        """
+        import multiprocessing
+        messages = multiprocessing.get_context("fork").Queue()
+        cls._pool = cls._createPool(processes, messages)
+        cls._relay = threading.Thread(target=cls._relayMessages, args=(messages,), name="TasQ Relay", daemon=True)
+        cls._relay.messages = messages
+        cls._relay.start()
+
+    @staticmethod
+    def _createPool(processes, messages):
+        """Create a process pool and start its processes.
+
+        Parameters
+        ----------
+        processes : int
+            Number of processes to start
+        messages : multiprocessing.Queue
+            Queue for control messages of the pool processes
+
+        Returns
+        -------
+        concurrent.futures.ProcessPoolExecutor
+            The new process pool
+        """
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        pool = ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("fork"),
+                                   initializer=_processInit, initargs=(messages,))
+        pool.submit(int).result()  # Fork all processes now instead of on first use
+        return pool
+
+    @classmethod
+    def _getPool(cls, broken=None):
+        """Get the process pool.
+
+        If a pool process terminates unexpectedly, the pool fails all pending tasks and can not be used anymore.
+        Workers encountering a broken pool pass it back to have it replaced by a new one. Other than the initial
+        pool, the replacement is forked from a running worker thread.
+
+        Parameters
+        ----------
+        broken : concurrent.futures.ProcessPoolExecutor, optional
+            Pool that is broken and must be replaced. The default is None.
+
+        Returns
+        -------
+        concurrent.futures.ProcessPoolExecutor
+            The current process pool
+        """
+        with cls._poolLock:
+            if broken is not None and broken is cls._pool and cls._state != cls.STOPPING:
+                logger.warning("TasQ process pool broken, restarting")
+                broken.shutdown(wait=False)
+                cls._pool = cls._createPool(broken._max_workers, cls._relay.messages)
+            return cls._pool
+
+    @classmethod
+    def _stopPool(cls, timeout=None):
+        """Shut down process pool and message relay, if running.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum number of seconds to wait for the pool processes to exit before terminating them. The default is
+            None.
+        """
+        if cls._pool is None:
+            return
+        from time import time
+        with cls._poolLock:
+            pool, cls._pool = cls._pool, None
+        deadline = time()+timeout if timeout is not None else None
+        processes = list((pool._processes or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.join(max(deadline-time(), 0) if deadline is not None else None)
+            if process.is_alive():
+                logger.warning("Terminating TasQ pool process {}".format(process.pid))
+                process.terminate()
+                process.join(1)
+        cls._relay.messages.put(None)
+        cls._relay.join(1)
+        cls._relay = None
+
+    @classmethod
+    def _relayMessages(cls, messages):
+        """Forward control messages from pool processes to the clerk."""
+        while True:
+            task = messages.get()
+            if task is None:
+                return
+            cls._finished.put(task)
+
     @classmethod
     def online(cls):
         """Try to enable online mode.
@@ -546,6 +935,11 @@ class TasQServer:
         """Return number of active worker processes."""
         return sum(1 for proc in cls._workers if proc.is_alive())
 
+    @classmethod
+    def busy(cls):
+        """Return number of tasks currently being processed."""
+        return max(len(cls._active)-cls.queued(), 0)
+
     @classmethod
     def wait(cls, taskID, timeout=None):
         """Wait for a task to finish.
@@ -580,11 +974,15 @@ class TasQServer:
                     logger.debug("Clerk stopped")
                     return
                 elif cls._online and cmd == "bump":
+                    if task.ID not in cls._active:  # Relayed from a pool process after the task completed
+                        continue
                     from orm.misc import DB, TasQ
                     dbtask = TasQ.query.filter(TasQ.ID == task.ID).first()
                     if dbtask is not None:
                         dbtask.message = task.message
                         dbtask.updated = datetime.now()
+                        if task.params.get("progress") is not None:
+                            dbtask.params = dict(dbtask.params, progress=task.params["progress"])
                         DB.session.commit()
                 elif cmd == "log":
                     try: